@@ -0,0 +1,204 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import threading
+import time
+import tty
+from importlib import metadata
+from typing import Callable
+from typing import Dict
+from typing import Optional
+
+from serial import Serial
+
+from pych9329 import frame_utils
+from pych9329 import keyboard
+from pych9329 import mouse
+from pych9329.chip_command import ChipParameter
+
+GET_PARAMETERS_REPLY = bytes.fromhex(
+    "57ab0088328080000000258008000003861a29e100000001000d00000000000000000000"
+    "0000000000000000000000000000000000000024"
+)
+
+
+def measure(function: Callable[[], int], duration: float) -> Dict[str, float]:
+    # function runs one batch and returns the number of operations it did
+    operations = 0
+    start_time = time.perf_counter()
+    elapsed = 0.0
+    while elapsed < duration:
+        operations += function()
+        elapsed = time.perf_counter() - start_time
+    return {
+        "operations": operations,
+        "seconds": elapsed,
+        "ops_per_second": operations / elapsed,
+    }
+
+
+def bench_create_frame() -> int:
+    for _ in range(1000):
+        data_frame = frame_utils.DataFrame(b"\x57\xab", b"\x00", b"\x02")
+        data_frame.set_data(b"\x02\x00\x04\x00\x00\x00\x00\x00")
+        data_frame.create_frame()
+    return 1000
+
+
+def bench_parse_frame() -> int:
+    for _ in range(1000):
+        data_frame = frame_utils.DataFrame(b"", b"", b"")
+        data_frame.parse_frame(GET_PARAMETERS_REPLY)
+    return 1000
+
+
+def bench_frame_encoder() -> int:
+    encoder = keyboard.GENERAL_DATA_ENCODER
+    data = b"\x02\x00\x04\x00\x00\x00\x00\x00"
+    for _ in range(1000):
+        encoder.encode(data)
+    return 1000
+
+
+def bench_frame_decoder() -> int:
+    decoder = frame_utils.FrameDecoder()
+    frame_count = sum(1 for _ in decoder.decode(GET_PARAMETERS_REPLY * 1000))
+    return frame_count
+
+
+def bench_structure_load() -> int:
+    data = GET_PARAMETERS_REPLY
+    for _ in range(1000):
+        ChipParameter.from_buffer(data, 5)
+    return 1000
+
+
+def bench_structure_save() -> int:
+    parameter = ChipParameter.from_buffer(GET_PARAMETERS_REPLY, 5)
+    for _ in range(1000):
+        parameter.save()
+    return 1000
+
+
+class PtyDevice:
+    # Fake device on a pseudo terminal, everything written to it is discarded
+    def __init__(self):
+        self.master_fd, self.slave_fd = os.openpty()
+        tty.setraw(self.master_fd)
+        self.received = 0
+        self.running = True
+        self.thread = threading.Thread(target=self.drain, daemon=True)
+        self.thread.start()
+        self.serial_object = Serial(os.ttyname(self.slave_fd), 115200, timeout=0.5)
+
+    def drain(self) -> None:
+        while self.running:
+            try:
+                self.received += len(os.read(self.master_fd, 65536))
+            except OSError:
+                return
+
+    def close(self) -> None:
+        self.running = False
+        self.serial_object.close()
+        os.close(self.slave_fd)
+        os.close(self.master_fd)
+        self.thread.join()
+
+
+def bench_end_to_end(duration: float) -> Dict[str, Dict[str, float]]:
+    text = "The quick brown fox jumps over the lazy dog\n"
+    device = PtyDevice()
+    try:
+        serial_object = device.serial_object
+
+        def send_text() -> int:
+            keyboard.send_text(serial_object, text, 0.0, 0.0)
+            return len(text)
+
+        def send_text_batch() -> int:
+            keyboard.send_text_batch(serial_object, text)
+            return len(text)
+
+        def send_text_rollover() -> int:
+            keyboard.send_text_batch(serial_object, text, rollover=True)
+            return len(text)
+
+        def move() -> int:
+            for index in range(100):
+                mouse.move(serial_object, index, index)
+            return 100
+
+        def move_path() -> int:
+            points = [(index, index) for index in range(1000)]
+            mouse.move_path(serial_object, points)
+            return 1000
+
+        results = {
+            "keyboard_send_text_chars": measure(send_text, duration),
+            "keyboard_send_text_batch_chars": measure(send_text_batch, duration),
+            "keyboard_send_text_rollover_chars": measure(send_text_rollover, duration),
+            "mouse_move": measure(move, duration),
+            "mouse_move_path_points": measure(move_path, duration),
+        }
+    finally:
+        device.close()
+    return results
+
+
+def run(duration: float) -> Dict[str, object]:
+    results: Dict[str, Dict[str, float]] = {
+        "data_frame_create_frame": measure(bench_create_frame, duration),
+        "data_frame_parse_frame": measure(bench_parse_frame, duration),
+        "frame_encoder_encode": measure(bench_frame_encoder, duration),
+        "frame_decoder_decode": measure(bench_frame_decoder, duration),
+        "chip_parameter_load": measure(bench_structure_load, duration),
+        "chip_parameter_save": measure(bench_structure_save, duration),
+    }
+    if hasattr(os, "openpty"):
+        results.update(bench_end_to_end(duration))
+    try:
+        version = metadata.version("pych9329")
+    except metadata.PackageNotFoundError:
+        version = "unknown"
+    return {
+        "pych9329": version,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "results": results,
+    }
+
+
+def compare(report: Dict, baseline: Dict) -> None:
+    for name, result in report["results"].items():
+        base = baseline["results"].get(name)
+        if base is None:
+            continue
+        ratio = result["ops_per_second"] / base["ops_per_second"]
+        print("%-34s %12.0f ops/s %7.2fx" % (name, result["ops_per_second"], ratio))
+
+
+def main(argv: Optional[list] = None) -> None:
+    parser = argparse.ArgumentParser(description="pych9329 benchmark")
+    parser.add_argument("--duration", type=float, default=1.0)
+    parser.add_argument("--output", help="write the json report to this file")
+    parser.add_argument("--compare", help="json report of an earlier run")
+    args = parser.parse_args(argv)
+    report = run(args.duration)
+    report_text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report_text)
+    else:
+        print(report_text)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        compare(report, baseline)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,377 @@
+import asyncio
+import os
+import random
+import time
+from collections import defaultdict
+from collections import deque
+from typing import Deque
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+from serial import Serial
+
+import pych9329.capture as capture
+import pych9329.chip_command as chip_command
+import pych9329.exceptions as exceptions
+import pych9329.frame_utils as frame_utils
+import pych9329.instrumentation as instrumentation
+import pych9329.keyboard as keyboard
+import pych9329.mouse as mouse
+import pych9329.transport as transport
+from pych9329.chip_command import ChipParameter
+from pych9329.chip_command import USBStringSubCommand
+
+
+class ReplyWaiter:
+    # A request in flight. After a timeout it stays queued as stale until
+    # the next request of its command is written, so a late reply is
+    # dropped instead of answering that request. A lost reply is then
+    # only skipped, it does not make the following requests fail.
+    __slots__ = ("future", "echo")
+
+    def __init__(self, future: asyncio.Future, echo: bytes):
+        self.future = future
+        self.echo = echo
+
+
+class AsyncCH9329:
+    # Drive a CH9329 from an asyncio event loop without blocking it.
+    # Replies are matched to requests by their command byte,
+    # so one loop can serve any number of ports.
+    def __init__(
+        self,
+        serial_object: Serial,
+        timeout: float = 0.5,
+        loop: Optional[asyncio.AbstractEventLoop] = None,
+    ):
+        self.serial_object = serial_object
+        self.timeout = timeout
+        if loop is None:
+            loop = asyncio.get_running_loop()
+        self.loop = loop
+        self.fd = serial_object.fileno()
+        self.blocking = os.get_blocking(self.fd)
+        os.set_blocking(self.fd, False)
+        self.decoder = frame_utils.FrameDecoder()
+        self.waiters: Dict[int, Deque[ReplyWaiter]] = defaultdict(deque)
+        self.write_buffer = bytearray()
+        self.drain_waiters: List[asyncio.Future] = []
+        self.closed = False
+        self.keyboard = AsyncKeyboard(self)
+        self.mouse = AsyncMouse(self)
+        self.loop.add_reader(self.fd, self.handle_readable)
+
+    async def __aenter__(self) -> "AsyncCH9329":
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        self.loop.remove_reader(self.fd)
+        self.loop.remove_writer(self.fd)
+        if self.serial_object.is_open:
+            os.set_blocking(self.fd, self.blocking)
+        self.abort(exceptions.ProtocolError("connection closed"))
+
+    def abort(self, error: Exception) -> None:
+        for waiters in self.waiters.values():
+            while waiters:
+                future = waiters.popleft().future
+                if not future.done():
+                    future.set_exception(error)
+        for future in self.drain_waiters:
+            if not future.done():
+                future.set_exception(error)
+        self.drain_waiters.clear()
+
+    def handle_readable(self) -> None:
+        try:
+            data = os.read(self.fd, 4096)
+        except BlockingIOError:
+            return
+        except OSError as err:
+            self.abort(err)
+            self.close()
+            return
+        if not data:
+            self.close()
+            return
+        if capture.CAPTURE_WRITER is not None:
+            capture.CAPTURE_WRITER.record(
+                self.serial_object, capture.DIRECTION_IN, data
+            )
+        self.decoder.feed(data)
+        for data_frame in self.decoder:
+            command = frame_utils.get_request_command(data_frame.CMD[0])
+            waiters = self.waiters.get(command)
+            # Frames nobody waits for (e.g. replies to send commands) are
+            # dropped, replies arrive in request order so a frame that does
+            # not belong to the oldest waiter is a late one.
+            if not waiters:
+                continue
+            waiter = waiters[0]
+            if not transport.is_reply_to(data_frame, command, waiter.echo):
+                continue
+            waiters.popleft()
+            if not waiter.future.done():
+                waiter.future.set_result(data_frame)
+
+    def handle_writable(self) -> None:
+        try:
+            written = os.write(self.fd, self.write_buffer)
+        except BlockingIOError:
+            return
+        except OSError as err:
+            self.abort(err)
+            self.close()
+            return
+        del self.write_buffer[:written]
+        if not self.write_buffer:
+            self.loop.remove_writer(self.fd)
+            for future in self.drain_waiters:
+                if not future.done():
+                    future.set_result(None)
+            self.drain_waiters.clear()
+
+    def write(self, packet: bytes) -> None:
+        if self.closed:
+            raise exceptions.ProtocolError("connection closed")
+        if capture.CAPTURE_WRITER is not None:
+            capture.CAPTURE_WRITER.record(
+                self.serial_object, capture.DIRECTION_OUT, packet
+            )
+        if instrumentation.ENABLED:
+            start_time = time.perf_counter()
+            self.write_packet(packet)
+            instrumentation.record_write(
+                self.serial_object, packet, time.perf_counter() - start_time
+            )
+            return
+        self.write_packet(packet)
+
+    def write_packet(self, packet: bytes) -> None:
+        # queued behind earlier bytes, the rest is written when writable
+        if self.write_buffer:
+            self.write_buffer += packet
+            return
+        try:
+            written = os.write(self.fd, packet)
+        except BlockingIOError:
+            written = 0
+        if written < len(packet):
+            self.write_buffer += packet[written:]
+            self.loop.add_writer(self.fd, self.handle_writable)
+
+    async def drain(self) -> None:
+        if not self.write_buffer:
+            return
+        future = self.loop.create_future()
+        self.drain_waiters.append(future)
+        await future
+
+    async def request(
+        self, packet: bytes, timeout: Optional[float] = None
+    ) -> frame_utils.DataFrame:
+        if timeout is None:
+            timeout = self.timeout
+        command = packet[3]
+        waiter = ReplyWaiter(
+            self.loop.create_future(), transport.get_reply_echo(packet)
+        )
+        waiters = self.waiters[command]
+        start_time = time.perf_counter()
+        self.write(packet)
+        # a stale reply that did not arrive before this request is lost
+        while waiters and waiters[-1].future.done():
+            waiters.pop()
+        waiters.append(waiter)
+        try:
+            data_frame = await asyncio.wait_for(waiter.future, timeout)
+        except asyncio.TimeoutError:
+            if instrumentation.ENABLED:
+                instrumentation.record_error(self.serial_object, command, "timeout")
+            raise exceptions.ReplyTimeout("reply timeout")
+        finally:
+            # only the newest request of a command is kept as stale
+            if waiter in waiters and waiter is not waiters[-1]:
+                waiters.remove(waiter)
+        if instrumentation.ENABLED:
+            instrumentation.record_reply(
+                self.serial_object,
+                command,
+                data_frame,
+                time.perf_counter() - start_time,
+            )
+        return transport.check_reply(data_frame)
+
+    async def send(self, packet: bytes) -> None:
+        self.write(packet)
+        await self.drain()
+
+    async def get_chip_parameters(self) -> ChipParameter:
+        data_frame = await self.request(chip_command.create_get_parameters_frame())
+        return chip_command.parse_parameters_reply(data_frame)
+
+    async def set_chip_parameters(self, parameter: ChipParameter) -> bool:
+        data_frame = await self.request(
+            chip_command.create_set_parameters_frame(parameter)
+        )
+        return chip_command.parse_status_reply(data_frame)
+
+    async def get_usb_string_info(self, sub_command: bytes) -> str:
+        data_frame = await self.request(
+            chip_command.create_get_usb_string_frame(sub_command)
+        )
+        return chip_command.parse_usb_string_reply(data_frame, sub_command)
+
+    async def set_usb_string_info(self, sub_command: bytes, string_info: str) -> bool:
+        data_frame = await self.request(
+            chip_command.create_set_usb_string_frame(sub_command, string_info)
+        )
+        return chip_command.parse_status_reply(data_frame)
+
+    async def get_serial_number(self) -> str:
+        return await self.get_usb_string_info(USBStringSubCommand.SERIAL_NUMBER.value)
+
+    async def set_serial_number(self, string_data: str) -> bool:
+        return await self.set_usb_string_info(
+            USBStringSubCommand.SERIAL_NUMBER.value, string_data
+        )
+
+    async def get_manufacturer(self) -> str:
+        return await self.get_usb_string_info(USBStringSubCommand.MANUFACTURER.value)
+
+    async def set_manufacturer(self, string_data: str) -> bool:
+        return await self.set_usb_string_info(
+            USBStringSubCommand.MANUFACTURER.value, string_data
+        )
+
+    async def get_product(self) -> str:
+        return await self.get_usb_string_info(USBStringSubCommand.PRODUCT.value)
+
+    async def set_product(self, string_data: str) -> bool:
+        return await self.set_usb_string_info(
+            USBStringSubCommand.PRODUCT.value, string_data
+        )
+
+    async def send_command_reset(self) -> None:
+        await self.send(chip_command.create_reset_frame())
+
+    async def send_command_restore_factory_config(self) -> None:
+        await self.send(chip_command.create_restore_factory_config_frame())
+
+    async def receive_indicator_status(self) -> Tuple[bool, Dict[str, bool]]:
+        result_dict: Dict[str, bool] = {
+            "usb_connect_status": False,
+            "num_lock": False,
+            "caps_lock": False,
+            "scroll_lock": False,
+        }
+        try:
+            data_frame = await self.request(keyboard.create_indicator_status_frame())
+        except exceptions.ProtocolError:
+            return False, result_dict
+        return True, keyboard.parse_indicator_status(data_frame)
+
+
+class AsyncKeyboard:
+    def __init__(self, device: AsyncCH9329):
+        self.device = device
+
+    async def send_general_data(
+        self,
+        key_tuple: Tuple[str, str, str, str, str, str] = ("", "", "", "", "", ""),
+        modifiers: Optional[List[str]] = None,
+    ) -> None:
+        await self.device.send(keyboard.create_general_data_frame(key_tuple, modifiers))
+
+    async def trigger(
+        self, keys: list[str], modifiers: Optional[List[str]] = None
+    ) -> None:
+        await self.device.send(keyboard.create_trigger_frame(keys, modifiers))
+
+    async def press(self, key: str, modifiers: Optional[List[str]] = None) -> None:
+        await self.device.send(keyboard.create_press_frame(key, modifiers))
+
+    async def release(self) -> None:
+        await self.device.send(keyboard.create_release_frame())
+
+    async def click(
+        self, key: str, min_interval: float = 0.02, max_interval: float = 0.05
+    ) -> None:
+        sleep_time = random.uniform(min_interval, max_interval)
+        await self.press(key)
+        await asyncio.sleep(sleep_time)
+        await self.release()
+
+    async def send_text(
+        self, text: str, min_interval: float = 0.02, max_interval: float = 0.05
+    ) -> None:
+        for char in text:
+            await self.click(char, min_interval, max_interval)
+
+
+class AsyncMouse:
+    def __init__(self, device: AsyncCH9329):
+        self.device = device
+
+    async def send_absolute_data(
+        self,
+        x: int,
+        y: int,
+        button_name: str = "null",
+        x_max: int = 1920,
+        y_max: int = 1080,
+        wheel_value: int = 0,
+    ) -> None:
+        await self.device.send(
+            mouse.create_absolute_data_frame(
+                x, y, button_name, x_max, y_max, wheel_value
+            )
+        )
+
+    async def send_relative_data(
+        self, x: int, y: int, button_name: str = "null", wheel_value: int = 0
+    ) -> None:
+        await self.device.send(
+            mouse.create_relative_data_frame(x, y, button_name, wheel_value)
+        )
+
+    async def move(
+        self,
+        x: int,
+        y: int,
+        relative_mode: bool = False,
+        monitor_width: int = 1920,
+        monitor_height: int = 1080,
+    ) -> None:
+        if relative_mode:
+            await self.send_relative_data(x, y, "null")
+        else:
+            await self.send_absolute_data(x, y, "null", monitor_width, monitor_height)
+
+    async def press(self, button_name: str = "left") -> None:
+        await self.send_relative_data(0, 0, button_name, 0)
+
+    async def release(self) -> None:
+        await self.send_relative_data(0, 0, "null", 0)
+
+    async def click(self, button_name: str = "left") -> None:
+        await self.press(button_name)
+        # 100 to 400 milliseconds delay for simulating natural behavior
+        sleep_time = random.uniform(0.20, 0.40)
+        await asyncio.sleep(sleep_time)
+        await self.release()
+
+    async def wheel(self, wheel_value: int = 1) -> None:
+        await self.send_relative_data(0, 0, "null", wheel_value=wheel_value)
+
+
+if __name__ == "__main__":
+    pass
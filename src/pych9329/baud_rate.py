@@ -0,0 +1,173 @@
+import time
+from typing import Dict
+from typing import Iterable
+from typing import Optional
+
+from serial import Serial
+
+import pych9329.chip_command as chip_command
+import pych9329.exceptions as exceptions
+import pych9329.frame_utils as frame_utils
+import pych9329.keyboard as keyboard
+import pych9329.mouse as mouse
+
+# Baud rates supported by the CH9329, fastest first
+BAUD_RATE_CANDIDATES = (115200, 57600, 38400, 19200, 14400, 9600, 4800, 2400, 1200)
+# Time the chip needs to restart after the reset command
+RESET_DELAY = 0.1
+# Reply of a command acknowledged with a status byte
+STATUS_REPLY_LENGTH = frame_utils.FRAME_HEADER_SIZE + 2
+
+
+def get_wire_time_budget(baud_rate: int) -> Dict[str, Dict[str, float]]:
+    # Time each frame occupies the line and the frame rate it caps
+    frame_lengths = {
+        "keyboard_general_data": keyboard.GENERAL_DATA_ENCODER.frame_length,
+        "mouse_absolute_data": mouse.ABSOLUTE_DATA_ENCODER.frame_length,
+        "mouse_relative_data": mouse.RELATIVE_DATA_ENCODER.frame_length,
+        "status_reply": STATUS_REPLY_LENGTH,
+    }
+    budget = {}
+    for name, frame_length in frame_lengths.items():
+        wire_time = frame_utils.calc_wire_time(frame_length, baud_rate)
+        budget[name] = {
+            "frame_length": frame_length,
+            "wire_time": wire_time,
+            "frames_per_second": 1.0 / wire_time,
+        }
+    return budget
+
+
+def check_round_trip(
+    serial_object: Serial,
+    attempts: int = 3,
+    timeout: Optional[float] = None,
+    check_rate: bool = True,
+) -> Optional[chip_command.ChipParameter]:
+    # Every attempt has to read back the parameters, with check_rate they
+    # also have to report the rate the port is at
+    parameters = None
+    for _ in range(attempts):
+        serial_object.reset_input_buffer()
+        try:
+            parameters = chip_command.get_chip_parameters(serial_object, timeout)
+        except exceptions.ChipBaseException:
+            return None
+        if check_rate and parameters.get("serial_baud_rate") != serial_object.baudrate:
+            return None
+    return parameters
+
+
+def probe_baud_rate(
+    serial_object: Serial,
+    candidates: Iterable[int] = BAUD_RATE_CANDIDATES,
+    timeout: float = 0.1,
+) -> Optional[int]:
+    # Leaves the port at the rate the chip answered on,
+    # or at the original rate if no candidate worked.
+    original_rate = serial_object.baudrate
+    for baud_rate in candidates:
+        serial_object.baudrate = baud_rate
+        if check_round_trip(serial_object, 1, timeout) is not None:
+            return baud_rate
+    serial_object.baudrate = original_rate
+    return None
+
+
+def switch_baud_rate(
+    serial_object: Serial,
+    parameters: chip_command.ChipParameter,
+    baud_rate: int,
+    timeout: Optional[float] = None,
+    reset_delay: float = RESET_DELAY,
+) -> bool:
+    parameters.set("serial_baud_rate", baud_rate)
+    try:
+        if not chip_command.set_chip_parameters(serial_object, parameters, timeout):
+            return False
+    except exceptions.ChipBaseException:
+        return False
+    # the new rate takes effect once the chip restarts
+    chip_command.send_command_reset(serial_object)
+    serial_object.flush()
+    time.sleep(reset_delay)
+    serial_object.baudrate = baud_rate
+    return True
+
+
+def set_baud_rate(
+    serial_object: Serial,
+    baud_rate: int,
+    attempts: int = 3,
+    timeout: Optional[float] = None,
+    reset_delay: float = RESET_DELAY,
+) -> bool:
+    # Moves chip and port to baud_rate and verifies it with round trips.
+    # On failure both are rolled back to the rate they had before.
+    parameters = check_round_trip(serial_object, 1, timeout)
+    if parameters is None:
+        return False
+    original_rate = serial_object.baudrate
+    if baud_rate == original_rate:
+        return True
+    if not switch_baud_rate(serial_object, parameters, baud_rate, timeout, reset_delay):
+        parameters.set("serial_baud_rate", original_rate)
+        return False
+    if check_round_trip(serial_object, attempts, timeout) is not None:
+        return True
+    restore_baud_rate(serial_object, baud_rate, original_rate, timeout, reset_delay)
+    return False
+
+
+def restore_baud_rate(
+    serial_object: Serial,
+    baud_rate: int,
+    original_rate: int,
+    timeout: Optional[float] = None,
+    reset_delay: float = RESET_DELAY,
+) -> None:
+    # The chip may be flaky at the new rate or may have kept the old one,
+    # even with the new one stored, so any valid reply tells the rate it
+    # runs at and the stored rate is put back if it changed.
+    for current_rate in (baud_rate, original_rate):
+        serial_object.baudrate = current_rate
+        parameters = check_round_trip(serial_object, 1, timeout, check_rate=False)
+        if parameters is None:
+            continue
+        if current_rate != original_rate:
+            switch_baud_rate(
+                serial_object, parameters, original_rate, timeout, reset_delay
+            )
+        elif parameters.get("serial_baud_rate") != original_rate:
+            parameters.set("serial_baud_rate", original_rate)
+            try:
+                chip_command.set_chip_parameters(serial_object, parameters, timeout)
+            except exceptions.ChipBaseException:
+                pass
+        break
+    serial_object.baudrate = original_rate
+
+
+def maximize_baud_rate(
+    serial_object: Serial,
+    candidates: Iterable[int] = BAUD_RATE_CANDIDATES,
+    attempts: int = 3,
+    timeout: Optional[float] = None,
+    reset_delay: float = RESET_DELAY,
+) -> Optional[int]:
+    # Finds the chip, then tries faster rates from the fastest down,
+    # returns the rate chip and port are left at.
+    candidates = sorted(candidates, reverse=True)
+    current_rate = probe_baud_rate(serial_object, candidates)
+    if current_rate is None:
+        return None
+    for baud_rate in candidates:
+        if baud_rate <= current_rate:
+            break
+        if set_baud_rate(serial_object, baud_rate, attempts, timeout, reset_delay):
+            return baud_rate
+    return current_rate
+
+
+if __name__ == "__main__":
+    pass
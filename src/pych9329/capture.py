@@ -0,0 +1,207 @@
+import itertools
+import mmap
+import struct
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict
+from typing import List
+from typing import Optional
+
+from serial import Serial
+
+import pych9329.exceptions as exceptions
+import pych9329.frame_utils as frame_utils
+
+# File layout:
+#   header: magic, version, slot size, slot count,
+#           wall clock and monotonic time when the capture started
+#   port table: names of the captured ports, a record refers to its index
+#   slots: fixed size records, slot = sequence % slot count
+# Chunks longer than a slot continue in the following slots.
+CAPTURE_MAGIC = b"CH9329C\x00"
+CAPTURE_VERSION = 1
+CAPTURE_HEADER_STRUCT = struct.Struct("<8sHxxIIdd")
+CAPTURE_HEADER_SIZE = 64
+PORT_TABLE_SIZE = 32
+PORT_NAME_SIZE = 32
+SLOT_START = CAPTURE_HEADER_SIZE + PORT_TABLE_SIZE * PORT_NAME_SIZE
+# sequence, monotonic timestamp, direction, port index, payload length
+SLOT_HEADER_STRUCT = struct.Struct("<QdBBH")
+
+DIRECTION_OUT = 0
+DIRECTION_IN = 1
+
+# The active capture, checked by the transport on every read and write
+CAPTURE_WRITER: Optional["CaptureWriter"] = None
+
+
+class CaptureWriter:
+    # Appends every chunk to a memory mapped ring file,
+    # the oldest slots are overwritten once the ring is full.
+    def __init__(self, path: str, slot_count: int = 65536, slot_size: int = 128):
+        if slot_size <= SLOT_HEADER_STRUCT.size:
+            raise exceptions.InvalidDataLength("slot too small")
+        self.slot_count = slot_count
+        self.slot_size = slot_size
+        self.payload_size = slot_size - SLOT_HEADER_STRUCT.size
+        file_size = SLOT_START + slot_count * slot_size
+        with open(path, "w+b") as f:
+            f.truncate(file_size)
+            self.mapping = mmap.mmap(f.fileno(), file_size)
+        CAPTURE_HEADER_STRUCT.pack_into(
+            self.mapping,
+            0,
+            CAPTURE_MAGIC,
+            CAPTURE_VERSION,
+            slot_size,
+            slot_count,
+            time.time(),
+            time.monotonic(),
+        )
+        # sequence 0 marks an unused slot
+        self.sequence = itertools.count(1)
+        self.ports: Dict[str, int] = {}
+        self.lock = threading.Lock()
+
+    def __enter__(self) -> "CaptureWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def close(self) -> None:
+        global CAPTURE_WRITER
+        if CAPTURE_WRITER is self:
+            CAPTURE_WRITER = None
+        if not self.mapping.closed:
+            self.mapping.flush()
+            self.mapping.close()
+
+    def get_port_index(self, serial_object: Serial) -> int:
+        port = str(getattr(serial_object, "port", None))
+        index = self.ports.get(port)
+        if index is not None:
+            return index
+        with self.lock:
+            index = self.ports.get(port)
+            if index is None:
+                # ports beyond the table share its last entry
+                index = min(len(self.ports), PORT_TABLE_SIZE - 1)
+                offset = CAPTURE_HEADER_SIZE + index * PORT_NAME_SIZE
+                name = port.encode("utf-8")[:PORT_NAME_SIZE]
+                self.mapping[offset : offset + PORT_NAME_SIZE] = name.ljust(
+                    PORT_NAME_SIZE, b"\x00"
+                )
+                self.ports[port] = index
+        return index
+
+    def record(self, serial_object: Serial, direction: int, data: bytes) -> None:
+        timestamp = time.monotonic()
+        port_index = self.get_port_index(serial_object)
+        mapping = self.mapping
+        payload_size = self.payload_size
+        for start in range(0, len(data), payload_size):
+            chunk = data[start : start + payload_size]
+            sequence = next(self.sequence)
+            offset = SLOT_START + (sequence % self.slot_count) * self.slot_size
+            # the payload is written before the header which makes the slot valid
+            payload_offset = offset + SLOT_HEADER_STRUCT.size
+            mapping[payload_offset : payload_offset + len(chunk)] = chunk
+            SLOT_HEADER_STRUCT.pack_into(
+                mapping, offset, sequence, timestamp, direction, port_index, len(chunk)
+            )
+
+
+def start(path: str, slot_count: int = 65536, slot_size: int = 128) -> CaptureWriter:
+    global CAPTURE_WRITER
+    stop()
+    CAPTURE_WRITER = CaptureWriter(path, slot_count, slot_size)
+    return CAPTURE_WRITER
+
+
+def stop() -> None:
+    if CAPTURE_WRITER is not None:
+        CAPTURE_WRITER.close()
+
+
+@dataclass
+class CaptureRecord:
+    sequence: int
+    timestamp: float
+    direction: int
+    port: str
+    data: bytes
+
+
+@dataclass
+class CapturedFrame:
+    timestamp: float
+    direction: int
+    port: str
+    data_frame: frame_utils.DataFrame
+
+
+def read_capture(path: str) -> List[CaptureRecord]:
+    # every record still in the ring, oldest first
+    with open(path, "rb") as f:
+        buffer = f.read()
+    if len(buffer) < SLOT_START:
+        raise exceptions.InvalidCaptureFile("file too small")
+    magic, version, slot_size, slot_count, _, _ = CAPTURE_HEADER_STRUCT.unpack_from(
+        buffer
+    )
+    if magic != CAPTURE_MAGIC or version != CAPTURE_VERSION:
+        raise exceptions.InvalidCaptureFile("bad magic or version")
+    ports = []
+    for index in range(PORT_TABLE_SIZE):
+        offset = CAPTURE_HEADER_SIZE + index * PORT_NAME_SIZE
+        name = buffer[offset : offset + PORT_NAME_SIZE].rstrip(b"\x00")
+        ports.append(name.decode("utf-8", "replace"))
+    records = []
+    for index in range(slot_count):
+        offset = SLOT_START + index * slot_size
+        sequence, timestamp, direction, port_index, length = (
+            SLOT_HEADER_STRUCT.unpack_from(buffer, offset)
+        )
+        if sequence == 0:
+            continue
+        payload_offset = offset + SLOT_HEADER_STRUCT.size
+        data = buffer[payload_offset : payload_offset + length]
+        records.append(
+            CaptureRecord(sequence, timestamp, direction, ports[port_index], data)
+        )
+    records.sort(key=lambda record: record.sequence)
+    return records
+
+
+def get_capture_clock(path: str) -> tuple[float, float]:
+    # (wall clock, monotonic) at the start, to convert record timestamps
+    with open(path, "rb") as f:
+        buffer = f.read(CAPTURE_HEADER_STRUCT.size)
+    _, _, _, _, wall_time, monotonic_time = CAPTURE_HEADER_STRUCT.unpack(buffer)
+    return wall_time, monotonic_time
+
+
+def decode_capture(path: str) -> List[CapturedFrame]:
+    # Reassembles the frames of each port and direction. A frame gets the
+    # timestamp of the chunk which completed it.
+    decoders: Dict[tuple, frame_utils.FrameDecoder] = {}
+    frames = []
+    for record in read_capture(path):
+        key = (record.port, record.direction)
+        decoder = decoders.get(key)
+        if decoder is None:
+            decoder = frame_utils.FrameDecoder(verify_checksum=False)
+            decoders[key] = decoder
+        for data_frame in decoder.decode(record.data):
+            frames.append(
+                CapturedFrame(
+                    record.timestamp, record.direction, record.port, data_frame
+                )
+            )
+    return frames
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,237 @@
+import threading
+import time
+from collections import defaultdict
+from collections import deque
+from concurrent.futures import Future
+from typing import Any
+from typing import Deque
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+from serial import Serial
+
+import pych9329.chip_command as chip_command
+import pych9329.exceptions as exceptions
+import pych9329.frame_utils as frame_utils
+import pych9329.instrumentation as instrumentation
+import pych9329.transport as transport
+from pych9329.chip_command import USBStringSubCommand
+
+# How often the reader thread wakes up to expire timed out requests
+READ_POLL_INTERVAL = 0.01
+
+
+class CommandChannel:
+    # Pipelined requests on one port. Up to window requests are in flight,
+    # replies are matched by their command byte (cmd | 0x80 or cmd | 0xC0)
+    # in the order the requests were sent, the chip answers in order.
+    # Error replies fail the future with the ChipReplyError of their status.
+    # A timed out request stays queued as stale until the next request of
+    # its command, so its late reply is dropped instead of answering that.
+    def __init__(
+        self,
+        serial_object: Serial,
+        window: int = 4,
+        timeout: Optional[float] = None,
+    ):
+        self.serial_object = serial_object
+        self.window = window
+        if timeout is None:
+            timeout = transport.get_reply_timeout(serial_object)
+        self.timeout = timeout
+        self.slots = threading.BoundedSemaphore(window)
+        self.lock = threading.Lock()
+        # (future, start time, deadline, echo of the request) per command
+        self.waiters: Dict[int, Deque[Tuple[Future, float, float, bytes]]] = (
+            defaultdict(deque)
+        )
+        self.decoder = frame_utils.FrameDecoder()
+        self.serial_timeout = serial_object.timeout
+        serial_object.timeout = READ_POLL_INTERVAL
+        self.running = True
+        self.thread = threading.Thread(
+            target=self.run, name="pych9329-channel", daemon=True
+        )
+        self.thread.start()
+
+    def __enter__(self) -> "CommandChannel":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if not self.running:
+            return
+        self.running = False
+        self.thread.join()
+        self.serial_object.timeout = self.serial_timeout
+        self.abort(exceptions.ProtocolError("channel closed"))
+
+    def abort(self, error: Exception) -> None:
+        with self.lock:
+            waiters = [item for queue in self.waiters.values() for item in queue]
+            self.waiters.clear()
+        for future, _, _, _ in waiters:
+            self.finish(future, exception=error)
+
+    def finish(self, future: Future, result: Any = None, exception=None) -> None:
+        if future.done():
+            return
+        if exception is None:
+            future.set_result(result)
+        else:
+            future.set_exception(exception)
+        self.slots.release()
+
+    def run(self) -> None:
+        while self.running:
+            try:
+                data = transport.read_packet(
+                    self.serial_object, self.decoder.bytes_needed()
+                )
+            except Exception as err:
+                self.running = False
+                self.abort(err)
+                return
+            if data:
+                self.decoder.feed(data)
+                for data_frame in self.decoder:
+                    self.dispatch(data_frame)
+            self.expire()
+
+    def dispatch(self, data_frame: frame_utils.DataFrame) -> None:
+        command = frame_utils.get_request_command(data_frame.CMD[0])
+        with self.lock:
+            waiters = self.waiters.get(command)
+            # Frames nobody waits for (e.g. replies to send commands) are
+            # dropped, so is a frame that does not belong to the oldest
+            # request like the late reply to another usb string.
+            if not waiters:
+                return
+            future, start_time, _, echo = waiters[0]
+            if not transport.is_reply_to(data_frame, command, echo):
+                return
+            waiters.popleft()
+        if instrumentation.ENABLED and not future.done():
+            instrumentation.record_reply(
+                self.serial_object,
+                command,
+                data_frame,
+                time.monotonic() - start_time,
+            )
+        error = transport.get_reply_error(data_frame)
+        if error is not None:
+            self.finish(future, exception=error)
+        else:
+            self.finish(future, data_frame)
+
+    def expire(self) -> None:
+        now = time.monotonic()
+        expired = []
+        with self.lock:
+            for command, waiters in self.waiters.items():
+                # requests of one command are queued in deadline order
+                for item in list(waiters):
+                    future, _, deadline, _ = item
+                    if deadline > now:
+                        break
+                    if future.done():
+                        continue
+                    expired.append((future, command))
+                    # only the newest request of a command is kept as stale
+                    if item is not waiters[-1]:
+                        waiters.remove(item)
+        for future, command in expired:
+            if instrumentation.ENABLED:
+                instrumentation.record_error(self.serial_object, command, "timeout")
+            self.finish(future, exception=exceptions.ReplyTimeout("reply timeout"))
+
+    def register(
+        self, command: int, timeout: Optional[float], echo: bytes = b""
+    ) -> Future:
+        if timeout is None:
+            timeout = self.timeout
+        future: Future = Future()
+        with self.lock:
+            waiters = self.waiters[command]
+            # a stale reply that did not arrive before this request is lost
+            while waiters and waiters[-1][0].done():
+                waiters.pop()
+            now = time.monotonic()
+            waiters.append((future, now, now + timeout, echo))
+        return future
+
+    def request(self, packet: bytes, timeout: Optional[float] = None) -> Future:
+        return self.request_many([packet], timeout)[0]
+
+    def request_many(
+        self, packets: Iterable[bytes], timeout: Optional[float] = None
+    ) -> List[Future]:
+        # Packets are written back to back in as few writes as the window
+        # allows, the futures resolve to the reply DataFrame.
+        if not self.running:
+            raise exceptions.ProtocolError("channel closed")
+        futures = []
+        pending = bytearray()
+        for packet in packets:
+            if not self.slots.acquire(blocking=False):
+                if pending:
+                    transport.write_frame(self.serial_object, pending)
+                    pending = bytearray()
+                self.slots.acquire()
+            futures.append(
+                self.register(packet[3], timeout, transport.get_reply_echo(packet))
+            )
+            pending += packet
+        if pending:
+            transport.write_frame(self.serial_object, pending)
+        return futures
+
+    def get_chip_parameters(self, timeout: Optional[float] = None) -> Future:
+        return self.request(chip_command.create_get_parameters_frame(), timeout)
+
+    def get_usb_string_info(
+        self, sub_command: bytes, timeout: Optional[float] = None
+    ) -> Future:
+        return self.request(
+            chip_command.create_get_usb_string_frame(sub_command), timeout
+        )
+
+
+def get_inventory(
+    serial_object: Serial, timeout: Optional[float] = None
+) -> Dict[str, Any]:
+    # parameters and every usb string in about one round trip
+    packets = [
+        chip_command.create_get_parameters_frame(),
+        chip_command.create_get_usb_string_frame(
+            USBStringSubCommand.MANUFACTURER.value
+        ),
+        chip_command.create_get_usb_string_frame(USBStringSubCommand.PRODUCT.value),
+        chip_command.create_get_usb_string_frame(
+            USBStringSubCommand.SERIAL_NUMBER.value
+        ),
+    ]
+    with CommandChannel(serial_object, len(packets), timeout) as channel:
+        futures = channel.request_many(packets)
+        data_frames = [future.result() for future in futures]
+    return {
+        "parameters": chip_command.parse_parameters_reply(data_frames[0]),
+        "manufacturer": chip_command.parse_usb_string_reply(
+            data_frames[1], USBStringSubCommand.MANUFACTURER.value
+        ),
+        "product": chip_command.parse_usb_string_reply(
+            data_frames[2], USBStringSubCommand.PRODUCT.value
+        ),
+        "serial_number": chip_command.parse_usb_string_reply(
+            data_frames[3], USBStringSubCommand.SERIAL_NUMBER.value
+        ),
+    }
+
+
+if __name__ == "__main__":
+    pass
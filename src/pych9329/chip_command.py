@@ -1,9 +1,11 @@
 from enum import Enum
+from typing import Optional
 
 from serial import Serial
 
 import pych9329.exceptions as exceptions
 import pych9329.frame_utils as frame_utils
+import pych9329.transport as transport
 from pych9329.struct_utils import Structure
 
 
@@ -29,8 +31,7 @@ class ChipParameter(Structure):
     ]
 
 
-def get_chip_parameters(serial_object: Serial) -> ChipParameter:
-    # request frame
+def create_get_parameters_frame() -> bytes:
     data_frame = frame_utils.DataFrame(
         b"\x57\xab",
         b"\x00",
@@ -38,20 +39,33 @@ def get_chip_parameters(serial_object: Serial) -> ChipParameter:
         b"\x00",
         b"",
     )
-    request_packet = data_frame.create_frame()
-    serial_object.write(request_packet)
-    serial_object.flush()
+    return data_frame.create_frame()
+
+
+def parse_parameters_reply(data_frame: frame_utils.DataFrame) -> ChipParameter:
+    return ChipParameter.from_buffer(data_frame.get_data())
+
+
+def parse_status_reply(data_frame: frame_utils.DataFrame) -> bool:
+    reply_data = data_frame.get_data()
+    if reply_data == frame_utils.DataFrameStatus.SUCCESS.value:
+        return True
+    return False
+
+
+def get_chip_parameters(
+    serial_object: Serial,
+    timeout: Optional[float] = None,
+    retry_policy: Optional[transport.RetryPolicy] = None,
+) -> ChipParameter:
+    # request frame
+    request_packet = create_get_parameters_frame()
     # Reply frame should be 56 bytes
-    reply_length = 56
-    reply_buffer = serial_object.read(reply_length)
-    result = data_frame.parse_frame(reply_buffer)
-    if result is False:
-        raise exceptions.ProtocolError("parser buffer error")
-    chip_parameter = ChipParameter.from_buffer(data_frame.get_data())
-    return chip_parameter
+    data_frame = transport.request(serial_object, request_packet, timeout, retry_policy)
+    return parse_parameters_reply(data_frame)
 
 
-def set_chip_parameters(serial_object: Serial, parameter: ChipParameter) -> bool:
+def create_set_parameters_frame(parameter: ChipParameter) -> bytes:
     parameter.buffer_flush()
     parameter_buffer = parameter.buffer
     # request frame
@@ -63,19 +77,19 @@ def set_chip_parameters(serial_object: Serial, parameter: ChipParameter) -> bool
         b"\x00",
     )
     data_frame.set_data(parameter_buffer)
-    request_packet = data_frame.create_frame()
-    serial_object.write(request_packet)
-    serial_object.flush()
+    return data_frame.create_frame()
+
+
+def set_chip_parameters(
+    serial_object: Serial,
+    parameter: ChipParameter,
+    timeout: Optional[float] = None,
+    retry_policy: Optional[transport.RetryPolicy] = None,
+) -> bool:
+    request_packet = create_set_parameters_frame(parameter)
     # Reply frame should be 7 bytes
-    reply_length = 7
-    reply_buffer = serial_object.read(reply_length)
-    result = data_frame.parse_frame(reply_buffer)
-    if result is False:
-        raise exceptions.ProtocolError("parser buffer error")
-    reply_data = data_frame.get_data()
-    if reply_data == frame_utils.DataFrameStatus.SUCCESS.value:
-        return True
-    return False
+    data_frame = transport.request(serial_object, request_packet, timeout, retry_policy)
+    return parse_status_reply(data_frame)
 
 
 class USBStringSubCommand(Enum):
@@ -84,7 +98,7 @@ class USBStringSubCommand(Enum):
     SERIAL_NUMBER = b"\x02"
 
 
-def get_usb_string_info(serial_object: Serial, sub_command: bytes) -> str:
+def create_get_usb_string_frame(sub_command: bytes) -> bytes:
     data_frame = frame_utils.DataFrame(
         b"\x57\xab",
         b"\x00",
@@ -92,17 +106,18 @@ def get_usb_string_info(serial_object: Serial, sub_command: bytes) -> str:
         b"\x01",
         sub_command,
     )
-    request_packet = data_frame.create_frame()
-    serial_object.readall()
-    serial_object.write(request_packet)
-    serial_object.flush()
-    reply_buffer = serial_object.readall()
-    result = data_frame.parse_frame(reply_buffer)
-    if result is False:
-        raise exceptions.ProtocolError("parser buffer error")
+    return data_frame.create_frame()
+
+
+def parse_usb_string_reply(
+    data_frame: frame_utils.DataFrame, sub_command: bytes
+) -> str:
     if data_frame.get_data_length() < 2:
         raise exceptions.ProtocolError("parser buffer error")
     data_buffer = data_frame.get_data()
+    # the reply names the string it carries
+    if data_buffer[:1] != sub_command:
+        raise exceptions.ProtocolError("reply to another usb string")
     # string_length = data_buffer[1]
     string_bytes = data_buffer[2:]
     # usb_info = string_bytes.decode('utf-8', 'ignore')
@@ -113,12 +128,21 @@ def get_usb_string_info(serial_object: Serial, sub_command: bytes) -> str:
     return usb_info
 
 
-def set_usb_string_info(
-    serial_object: Serial, sub_command: bytes, string_info: str
-) -> bool:
+def get_usb_string_info(
+    serial_object: Serial,
+    sub_command: bytes,
+    timeout: Optional[float] = None,
+    retry_policy: Optional[transport.RetryPolicy] = None,
+) -> str:
+    request_packet = create_get_usb_string_frame(sub_command)
+    data_frame = transport.request(serial_object, request_packet, timeout, retry_policy)
+    return parse_usb_string_reply(data_frame, sub_command)
+
+
+def create_set_usb_string_frame(sub_command: bytes, string_info: str) -> bytes:
     info_data = string_info.encode("utf-8")
     if len(info_data) > 23:
-        raise InvalidStringLength("string too long")
+        raise exceptions.InvalidStringLength("string too long")
     data_buffer = (
         sub_command + int.to_bytes(len(info_data), byteorder="big") + info_data
     )
@@ -130,18 +154,19 @@ def set_usb_string_info(
         b"",
     )
     data_frame.set_data(data_buffer)
-    request_packet = data_frame.create_frame()
-    serial_object.readall()
-    serial_object.write(request_packet)
-    serial_object.flush()
-    reply_buffer = serial_object.readall()
-    result = data_frame.parse_frame(reply_buffer)
-    if result is False:
-        raise exceptions.ProtocolError("parser buffer error")
-    reply_data = data_frame.get_data()
-    if reply_data == frame_utils.DataFrameStatus.SUCCESS.value:
-        return True
-    return False
+    return data_frame.create_frame()
+
+
+def set_usb_string_info(
+    serial_object: Serial,
+    sub_command: bytes,
+    string_info: str,
+    timeout: Optional[float] = None,
+    retry_policy: Optional[transport.RetryPolicy] = None,
+) -> bool:
+    request_packet = create_set_usb_string_frame(sub_command, string_info)
+    data_frame = transport.request(serial_object, request_packet, timeout, retry_policy)
+    return parse_status_reply(data_frame)
 
 
 def get_serial_number(serial_object: Serial) -> str:
@@ -174,7 +199,7 @@ def set_product(serial_object: Serial, string_data: str):
     )
 
 
-def send_command_reset(serial_object: Serial) -> None:
+def create_reset_frame() -> bytes:
     data_frame = frame_utils.DataFrame(
         b"\x57\xab",
         b"\x00",
@@ -182,11 +207,15 @@ def send_command_reset(serial_object: Serial) -> None:
         b"\x00",
         b"",
     )
-    request_packet = data_frame.create_frame()
-    serial_object.write(request_packet)
+    return data_frame.create_frame()
 
 
-def send_command_restore_factory_config(serial_object: Serial) -> None:
+def send_command_reset(serial_object: Serial) -> None:
+    request_packet = create_reset_frame()
+    transport.write_packet(serial_object, request_packet)
+
+
+def create_restore_factory_config_frame() -> bytes:
     data_frame = frame_utils.DataFrame(
         b"\x57\xab",
         b"\x00",
@@ -194,8 +223,12 @@ def send_command_restore_factory_config(serial_object: Serial) -> None:
         b"\x00",
         b"",
     )
-    request_packet = data_frame.create_frame()
-    serial_object.write(request_packet)
+    return data_frame.create_frame()
+
+
+def send_command_restore_factory_config(serial_object: Serial) -> None:
+    request_packet = create_restore_factory_config_frame()
+    transport.write_packet(serial_object, request_packet)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,337 @@
+import os
+import select
+import termios
+import threading
+import time
+import tty
+from dataclasses import dataclass
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+from serial import Serial
+
+import pych9329.frame_utils as frame_utils
+from pych9329.chip_command import ChipParameter
+from pych9329.chip_command import USBStringSubCommand
+from pych9329.frame_utils import CommandCode
+from pych9329.frame_utils import DataFrameStatus
+
+# Factory configuration as reported by a CH9329
+DEFAULT_PARAMETER_DATA = bytes.fromhex(
+    "8080000000258008000003861a29e100000001000d00000000000000000000000000000000"
+    "00000000000000000000000000"
+)
+
+# Exact data length of the commands which carry HID reports
+HID_REPORT_DATA_LENGTH: Dict[bytes, Tuple[int, ...]] = {
+    CommandCode.SEND_KB_GENERAL_DATA.value: (8,),
+    CommandCode.SEND_KB_MEDIA_DATA.value: (2, 4),
+    CommandCode.SEND_MS_ABS_DATA.value: (7,),
+    CommandCode.SEND_MS_REL_DATA.value: (5,),
+}
+
+
+@dataclass
+class HIDReport:
+    timestamp: float
+    command: int
+    data: bytes
+
+
+class CH9329Emulator:
+    # The chip side of the serial protocol on a pseudo terminal.
+    # Open the port with open_serial() or Serial(emulator.port).
+    def __init__(
+        self,
+        manufacturer: str = "WWW.WCH.CN",
+        product: str = "WCH UART TO KB-MS_V1.8",
+        serial_number: str = "2019A152BB40",
+        simulate_wire_time: bool = True,
+        response_delay: float = 0.0,
+        frame_timeout: float = 0.1,
+        check_baud_rate: bool = True,
+    ):
+        self.parameters = ChipParameter.from_buffer(DEFAULT_PARAMETER_DATA)
+        self.usb_strings: Dict[bytes, bytes] = {
+            USBStringSubCommand.MANUFACTURER.value: manufacturer.encode("utf-8"),
+            USBStringSubCommand.PRODUCT.value: product.encode("utf-8"),
+            USBStringSubCommand.SERIAL_NUMBER.value: serial_number.encode("utf-8"),
+        }
+        # a changed baud rate takes effect after a reset, like on the chip
+        self.baud_rate: int = self.parameters.get("serial_baud_rate")
+        self.simulate_wire_time = simulate_wire_time
+        self.response_delay = response_delay
+        # an incomplete frame is answered with ERROR_TIMEOUT after this time
+        self.frame_timeout = frame_timeout
+        self.last_receive_time = 0.0
+        # bytes sent at another baud rate than the chip uses are garbage
+        self.check_baud_rate = check_baud_rate
+        self.line_errors = 0
+        self.version = 0x30
+        self.usb_connected = True
+        self.indicator = 0x00
+        self.reports: List[HIDReport] = []
+        self.received_frames = 0
+        self.error_count = 0
+        self.decoder = frame_utils.FrameDecoder(verify_checksum=False)
+        self.receive_clock = 0.0
+        self.master_fd, self.slave_fd = os.openpty()
+        tty.setraw(self.master_fd)
+        tty.setraw(self.slave_fd)
+        self.port = os.ttyname(self.slave_fd)
+        self.handlers = {
+            CommandCode.GET_INFO.value: self.handle_get_info,
+            CommandCode.SEND_KB_GENERAL_DATA.value: self.handle_hid_report,
+            CommandCode.SEND_KB_MEDIA_DATA.value: self.handle_hid_report,
+            CommandCode.SEND_MS_ABS_DATA.value: self.handle_hid_report,
+            CommandCode.SEND_MS_REL_DATA.value: self.handle_hid_report,
+            CommandCode.SEND_MY_HID_DATA.value: self.handle_hid_report,
+            CommandCode.GET_PARA_CFG.value: self.handle_get_parameters,
+            CommandCode.SET_PARA_CFG.value: self.handle_set_parameters,
+            CommandCode.GET_USB_STRING.value: self.handle_get_usb_string,
+            CommandCode.SET_USB_STRING.value: self.handle_set_usb_string,
+            CommandCode.SET_DEFAULT_CFG.value: self.handle_set_default,
+            CommandCode.RESET.value: self.handle_reset,
+        }
+        # notified whenever a report is stored
+        self.lock = threading.Condition()
+        self.running = False
+        self.thread: Optional[threading.Thread] = None
+
+    def __enter__(self) -> "CH9329Emulator":
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(
+            target=self.run, name="pych9329-emulator", daemon=True
+        )
+        self.thread.start()
+
+    def stop(self) -> None:
+        self.running = False
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def close(self) -> None:
+        self.stop()
+        os.close(self.slave_fd)
+        os.close(self.master_fd)
+
+    def open_serial(self, timeout: float = 0.5) -> Serial:
+        return Serial(self.port, self.baud_rate, timeout=timeout)
+
+    def run(self) -> None:
+        while self.running:
+            readable, _, _ = select.select([self.master_fd], [], [], 0.01)
+            if not readable:
+                self.check_frame_timeout()
+                continue
+            try:
+                data = os.read(self.master_fd, 4096)
+            except OSError:
+                # no process has the port open
+                time.sleep(0.01)
+                continue
+            if self.check_baud_rate and not self.is_line_speed_matched():
+                self.line_errors += len(data)
+                continue
+            if self.simulate_wire_time:
+                # the bytes arrive one after the other at the line rate
+                now = time.monotonic()
+                self.receive_clock = max(self.receive_clock, now)
+                self.receive_clock += frame_utils.calc_wire_time(
+                    len(data), self.baud_rate
+                )
+                self.sleep_until(self.receive_clock)
+            self.last_receive_time = time.monotonic()
+            self.decoder.feed(data)
+            for data_frame in self.decoder:
+                self.handle_frame(data_frame)
+
+    def is_line_speed_matched(self) -> bool:
+        line_speed = termios.tcgetattr(self.slave_fd)[4]
+        return line_speed == getattr(termios, "B%d" % self.baud_rate, None)
+
+    def check_frame_timeout(self) -> None:
+        decoder = self.decoder
+        pending = decoder.buffer[decoder.offset :]
+        if not pending:
+            return
+        if time.monotonic() - self.last_receive_time < self.frame_timeout:
+            return
+        decoder.reset()
+        if len(pending) >= frame_utils.FRAME_HEADER_SIZE:
+            self.send_status(pending[3], DataFrameStatus.ERROR_TIMEOUT)
+
+    @staticmethod
+    def sleep_until(deadline: float) -> None:
+        delay = deadline - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def send_reply(self, command: int, data: bytes) -> None:
+        data_frame = frame_utils.DataFrame(
+            frame_utils.FRAME_HEAD,
+            self.parameters.get("serial_address"),
+            bytes([command]),
+        )
+        data_frame.set_data(data)
+        packet = data_frame.create_frame()
+        if self.response_delay > 0:
+            time.sleep(self.response_delay)
+        if self.simulate_wire_time:
+            time.sleep(frame_utils.calc_wire_time(len(packet), self.baud_rate))
+        os.write(self.master_fd, packet)
+
+    def send_status(self, command: int, status: DataFrameStatus) -> None:
+        if status is DataFrameStatus.SUCCESS:
+            reply_command = command | frame_utils.REPLY_SUCCESS_MASK
+        else:
+            self.error_count += 1
+            reply_command = command | frame_utils.REPLY_ERROR_MASK
+        self.send_reply(reply_command, status.value)
+
+    def handle_frame(self, data_frame: frame_utils.DataFrame) -> None:
+        self.received_frames += 1
+        command = data_frame.CMD[0]
+        if data_frame.ADDR not in (self.parameters.get("serial_address"), b"\xff"):
+            return
+        if not data_frame.verify_checksum():
+            self.send_status(command, DataFrameStatus.ERROR_SUM)
+            return
+        handler = self.handlers.get(data_frame.CMD)
+        if handler is None:
+            self.send_status(command, DataFrameStatus.ERROR_CMD)
+            return
+        handler(command, data_frame.get_data())
+
+    def handle_get_info(self, command: int, data: bytes) -> None:
+        reply_data = bytes([self.version, int(self.usb_connected), self.indicator])
+        self.send_reply(command | frame_utils.REPLY_SUCCESS_MASK, reply_data + bytes(5))
+
+    def handle_hid_report(self, command: int, data: bytes) -> None:
+        data_lengths = HID_REPORT_DATA_LENGTH.get(bytes([command]))
+        if data_lengths is not None and len(data) not in data_lengths:
+            self.send_status(command, DataFrameStatus.ERROR_PARA)
+            return
+        if command == CommandCode.SEND_MY_HID_DATA.value[0] and len(data) > 64:
+            self.send_status(command, DataFrameStatus.ERROR_PARA)
+            return
+        with self.lock:
+            self.reports.append(HIDReport(time.monotonic(), command, data))
+            self.lock.notify_all()
+        self.send_status(command, DataFrameStatus.SUCCESS)
+
+    def handle_get_parameters(self, command: int, data: bytes) -> None:
+        self.parameters.save()
+        self.send_reply(
+            command | frame_utils.REPLY_SUCCESS_MASK, bytes(self.parameters.buffer)
+        )
+
+    def handle_set_parameters(self, command: int, data: bytes) -> None:
+        if len(data) != ChipParameter._fields_struct_size_:
+            self.send_status(command, DataFrameStatus.ERROR_PARA)
+            return
+        self.parameters = ChipParameter.from_buffer(data)
+        self.send_status(command, DataFrameStatus.SUCCESS)
+
+    def handle_get_usb_string(self, command: int, data: bytes) -> None:
+        string_bytes = self.usb_strings.get(data[:1])
+        if len(data) != 1 or string_bytes is None:
+            self.send_status(command, DataFrameStatus.ERROR_PARA)
+            return
+        reply_data = data + bytes([len(string_bytes)]) + string_bytes
+        self.send_reply(command | frame_utils.REPLY_SUCCESS_MASK, reply_data)
+
+    def handle_set_usb_string(self, command: int, data: bytes) -> None:
+        sub_command = data[:1]
+        if (
+            len(data) < 2
+            or sub_command not in self.usb_strings
+            or data[1] > 23
+            or len(data) != data[1] + 2
+        ):
+            self.send_status(command, DataFrameStatus.ERROR_PARA)
+            return
+        self.usb_strings[sub_command] = data[2:]
+        self.send_status(command, DataFrameStatus.SUCCESS)
+
+    def handle_set_default(self, command: int, data: bytes) -> None:
+        self.parameters = ChipParameter.from_buffer(DEFAULT_PARAMETER_DATA)
+        self.send_status(command, DataFrameStatus.SUCCESS)
+
+    def handle_reset(self, command: int, data: bytes) -> None:
+        self.send_status(command, DataFrameStatus.SUCCESS)
+        self.baud_rate = self.parameters.get("serial_baud_rate")
+
+    def send_hid_data(self, data: bytes) -> None:
+        # custom HID data from the USB host arrives as 0x87 frames
+        max_length = frame_utils.MAX_DATA_LENGTH
+        for start in range(0, len(data), max_length):
+            self.send_reply(
+                CommandCode.READ_MY_HID_DATA.value[0], data[start : start + max_length]
+            )
+
+    def get_reports(self, command: Optional[bytes] = None) -> List[HIDReport]:
+        with self.lock:
+            if command is None:
+                return list(self.reports)
+            return [report for report in self.reports if report.command == command[0]]
+
+    def wait_reports(self, count: int, timeout: float = 1.0) -> bool:
+        # False if fewer than count reports arrived within timeout
+        with self.lock:
+            return self.lock.wait_for(lambda: len(self.reports) >= count, timeout)
+
+    def get_keyboard_reports(self) -> List[Tuple[int, Tuple[int, ...]]]:
+        # (modifier byte, pressed key codes) of every keyboard report
+        keyboard_reports = []
+        for report in self.get_reports(CommandCode.SEND_KB_GENERAL_DATA.value):
+            keys = tuple(code for code in report.data[2:8] if code != 0)
+            keyboard_reports.append((report.data[0], keys))
+        return keyboard_reports
+
+    def get_mouse_reports(self) -> List[Dict[str, int]]:
+        mouse_reports = []
+        for report in self.get_reports():
+            data = report.data
+            if report.command == CommandCode.SEND_MS_ABS_DATA.value[0]:
+                x = int.from_bytes(data[2:4], byteorder="little")
+                y = int.from_bytes(data[4:6], byteorder="little")
+                wheel = int.from_bytes(data[6:7], byteorder="little", signed=True)
+                relative = False
+            elif report.command == CommandCode.SEND_MS_REL_DATA.value[0]:
+                x = int.from_bytes(data[2:3], byteorder="little", signed=True)
+                y = int.from_bytes(data[3:4], byteorder="little", signed=True)
+                wheel = int.from_bytes(data[4:5], byteorder="little", signed=True)
+                relative = True
+            else:
+                continue
+            mouse_reports.append(
+                {
+                    "relative": relative,
+                    "button": data[1],
+                    "x": x,
+                    "y": y,
+                    "wheel": wheel,
+                }
+            )
+        return mouse_reports
+
+    def clear_reports(self) -> None:
+        with self.lock:
+            self.reports.clear()
+
+
+if __name__ == "__main__":
+    pass
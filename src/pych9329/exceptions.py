@@ -7,6 +7,46 @@ class ProtocolError(ChipBaseException):
     pass
 
 
+# 等待应答超时
+class ReplyTimeout(ProtocolError):
+    pass
+
+
+# 芯片返回错误应答
+class ChipReplyError(ProtocolError):
+    pass
+
+
+# 芯片串口接收一个字节超时
+class ReceiveTimeoutError(ChipReplyError):
+    pass
+
+
+# 芯片串口接收包头字节出错
+class HeadError(ChipReplyError):
+    pass
+
+
+# 芯片串口接收命令码错误
+class CommandError(ChipReplyError):
+    pass
+
+
+# 累加和检验值不匹配
+class ChecksumError(ChipReplyError):
+    pass
+
+
+# 参数错误
+class ParameterError(ChipReplyError):
+    pass
+
+
+# 帧正常，执行失败
+class OperateError(ChipReplyError):
+    pass
+
+
 # 无效的字符串编码
 class InvalidStringEncoding(ChipBaseException):
     pass
@@ -47,5 +87,35 @@ class BufferTooSmall(ChipBaseException):
     pass
 
 
+# 无效的数据长度
+class InvalidDataLength(ChipBaseException):
+    pass
+
+
+# 设备队列已满
+class DeviceBusy(ChipBaseException):
+    pass
+
+
+# 无效的宏文件
+class InvalidMacroFile(ChipBaseException):
+    pass
+
+
+# 无效的抓包文件
+class InvalidCaptureFile(ChipBaseException):
+    pass
+
+
+# 无效的字段名
+class InvalidFieldName(ChipBaseException):
+    pass
+
+
+# 无效的延迟
+class InvalidDelay(ChipBaseException):
+    pass
+
+
 if __name__ == "__main__":
     pass
@@ -1,5 +1,55 @@
+import time
 from dataclasses import dataclass
 from enum import Enum
+from typing import Callable
+from typing import Iterator
+from typing import Optional
+
+import pych9329.exceptions as exceptions
+
+FRAME_HEAD = b"\x57\xab"
+FRAME_HEADER_SIZE = 5
+# CH9329 never sends or accepts more than 64 bytes of data in one frame
+MAX_DATA_LENGTH = 64
+# 1 start bit + 8 data bits + 1 stop bit
+SERIAL_BITS_PER_BYTE = 10
+# Called as ENCODE_HOOK(command, frame length, seconds) after every encode,
+# set by pych9329.instrumentation while it is enabled.
+ENCODE_HOOK: Optional[Callable[[int, int, float], None]] = None
+
+
+def calc_wire_time(length: int, baud_rate: int) -> float:
+    return length * SERIAL_BITS_PER_BYTE / baud_rate
+
+
+class CommandCode(Enum):
+    GET_INFO = b"\x01"
+    SEND_KB_GENERAL_DATA = b"\x02"
+    SEND_KB_MEDIA_DATA = b"\x03"
+    SEND_MS_ABS_DATA = b"\x04"
+    SEND_MS_REL_DATA = b"\x05"
+    SEND_MY_HID_DATA = b"\x06"
+    READ_MY_HID_DATA = b"\x87"
+    GET_PARA_CFG = b"\x08"
+    SET_PARA_CFG = b"\x09"
+    GET_USB_STRING = b"\x0a"
+    SET_USB_STRING = b"\x0b"
+    SET_DEFAULT_CFG = b"\x0c"
+    RESET = b"\x0f"
+
+
+# The chip answers command CMD with CMD | 0x80,
+# or with CMD | 0xC0 followed by an error status.
+REPLY_SUCCESS_MASK = 0x80
+REPLY_ERROR_MASK = 0xC0
+
+
+def get_request_command(reply_cmd: int) -> int:
+    return reply_cmd & 0x3F
+
+
+def is_error_reply(reply_cmd: int) -> bool:
+    return reply_cmd & REPLY_ERROR_MASK == REPLY_ERROR_MASK
 
 
 class DataFrameStatus(Enum):
@@ -19,6 +69,8 @@ class DataFrame:
     CMD: bytes
     LEN: bytes = b"\x00"
     DATA: bytes = b""
+    # checksum of a received frame
+    SUM: bytes = b""
 
     def create_frame(self) -> bytes:
         checksum = self.calc_checksum()
@@ -76,6 +128,11 @@ class DataFrame:
         )
         return checksum
 
+    def verify_checksum(self) -> bool:
+        if len(self.SUM) != 1:
+            return False
+        return self.SUM[0] == self.calc_checksum()
+
     def parse_frame(self, buffer: bytes) -> bool:
         header_size = 5
         parse_result = False
@@ -88,12 +145,166 @@ class DataFrame:
         data_length = self.get_data_length()
         if data_length >= 0:
             self.DATA = buffer[header_size : header_size + data_length]
-            _checksum = buffer[
-                header_size + data_length : header_size + data_length + 1
-            ]
-            parse_result = True
+            self.SUM = buffer[header_size + data_length : header_size + data_length + 1]
+            parse_result = self.verify_checksum()
         return parse_result
 
 
+class FrameEncoder:
+    def __init__(
+        self,
+        cmd: bytes,
+        data_length: int,
+        addr: bytes = b"\x00",
+        head: bytes = FRAME_HEAD,
+    ):
+        # HEAD + ADDR + CMD + LEN never change for a given command,
+        # so their part of the checksum is calculated only once.
+        self.data_length = data_length
+        self.frame_length = FRAME_HEADER_SIZE + data_length + 1
+        self.template = (
+            head + addr + cmd + int.to_bytes(data_length, 1, byteorder="big")
+        )
+        self.header_sum = sum(self.template)
+
+    def check_data(self, data: bytes) -> None:
+        if len(data) != self.data_length:
+            raise exceptions.InvalidDataLength(
+                "data length should be %d bytes" % self.data_length
+            )
+
+    def encode(self, data: bytes) -> bytes:
+        # a new frame from the template, use encode_into to fill
+        # a preallocated buffer instead
+        encode_hook = ENCODE_HOOK
+        if encode_hook is not None:
+            start_time = time.perf_counter()
+        self.check_data(data)
+        frame = self.template + data + bytes(((self.header_sum + sum(data)) & 0xFF,))
+        if encode_hook is not None:
+            encode_hook(
+                self.template[3], self.frame_length, time.perf_counter() - start_time
+            )
+        return frame
+
+    def encode_into(self, buffer: bytearray, offset: int, data: bytes) -> int:
+        # Write a complete frame into buffer at offset,
+        # return the offset of the next frame.
+        encode_hook = ENCODE_HOOK
+        if encode_hook is not None:
+            start_time = time.perf_counter()
+        self.check_data(data)
+        data_offset = offset + FRAME_HEADER_SIZE
+        end_offset = offset + self.frame_length
+        if len(buffer) < end_offset:
+            raise exceptions.BufferTooSmall()
+        buffer[offset:data_offset] = self.template
+        buffer[data_offset : end_offset - 1] = data
+        buffer[end_offset - 1] = (self.header_sum + sum(data)) & 0xFF
+        if encode_hook is not None:
+            encode_hook(
+                self.template[3], self.frame_length, time.perf_counter() - start_time
+            )
+        return end_offset
+
+
+class FrameDecoder:
+    def __init__(
+        self,
+        head: bytes = FRAME_HEAD,
+        max_data_length: int = MAX_DATA_LENGTH,
+        verify_checksum: bool = True,
+    ):
+        self.head = head
+        self.max_data_length = max_data_length
+        self.verify_checksum = verify_checksum
+        # Consumed bytes are only dropped from the front of the buffer,
+        # bytearray does that without moving the remaining data.
+        self.buffer = bytearray()
+        self.offset = 0
+        self.checksum_errors = 0
+        self.discarded_bytes = 0
+
+    def reset(self) -> None:
+        self.buffer.clear()
+        self.offset = 0
+
+    def feed(self, data: bytes) -> None:
+        self.buffer += data
+
+    def decode(self, data: bytes) -> Iterator[DataFrame]:
+        self.feed(data)
+        yield from self
+
+    def __iter__(self) -> Iterator[DataFrame]:
+        while True:
+            data_frame = self.next_frame()
+            if data_frame is None:
+                return
+            yield data_frame
+
+    def bytes_needed(self) -> int:
+        # Minimum number of bytes required to complete the pending frame
+        available = len(self.buffer) - self.offset
+        if available < FRAME_HEADER_SIZE:
+            return FRAME_HEADER_SIZE - available
+        frame_length = FRAME_HEADER_SIZE + self.buffer[self.offset + 4] + 1
+        return max(frame_length - available, 1)
+
+    def compact(self) -> None:
+        if self.offset > 0:
+            del self.buffer[: self.offset]
+            self.offset = 0
+
+    def next_frame(self) -> Optional[DataFrame]:
+        buffer = self.buffer
+        head = self.head
+        while True:
+            start = buffer.find(head, self.offset)
+            if start < 0:
+                # keep a trailing partial header for the next chunk
+                end = len(buffer)
+                if buffer.endswith(head[:1]):
+                    end -= 1
+                self.discarded_bytes += end - self.offset
+                self.offset = end
+                self.compact()
+                return None
+            self.discarded_bytes += start - self.offset
+            self.offset = start
+            if len(buffer) - start < FRAME_HEADER_SIZE:
+                self.compact()
+                return None
+            data_length = buffer[start + 4]
+            if data_length > self.max_data_length:
+                # not a real frame header, resynchronize
+                self.offset = start + 1
+                self.discarded_bytes += 1
+                continue
+            data_start = start + FRAME_HEADER_SIZE
+            end = data_start + data_length + 1
+            if len(buffer) < end:
+                self.compact()
+                return None
+            with memoryview(buffer) as view:
+                if self.verify_checksum:
+                    checksum = sum(view[start : end - 1]) & 0xFF
+                    if checksum != buffer[end - 1]:
+                        self.checksum_errors += 1
+                        self.offset = start + 1
+                        self.discarded_bytes += 1
+                        continue
+                data_frame = DataFrame(
+                    bytes(view[start : start + 2]),
+                    bytes(view[start + 2 : start + 3]),
+                    bytes(view[start + 3 : start + 4]),
+                    bytes(view[start + 4 : data_start]),
+                    bytes(view[data_start : end - 1]),
+                    bytes(view[end - 1 : end]),
+                )
+            self.offset = end
+            return data_frame
+
+
 if __name__ == "__main__":
     pass
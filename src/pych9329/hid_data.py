@@ -0,0 +1,286 @@
+import asyncio
+import functools
+import io
+import threading
+import time
+from collections import deque
+from typing import Deque
+from typing import Dict
+from typing import Optional
+
+from serial import Serial
+
+import pych9329.exceptions as exceptions
+import pych9329.frame_utils as frame_utils
+import pych9329.instrumentation as instrumentation
+import pych9329.transport as transport
+from pych9329.frame_utils import CommandCode
+
+SEND_COMMAND = CommandCode.SEND_MY_HID_DATA.value
+RECEIVE_COMMAND = CommandCode.READ_MY_HID_DATA.value[0]
+# Serial timeout of the reader thread, how often it checks for expired frames
+READ_POLL_INTERVAL = 0.01
+
+
+@functools.lru_cache(maxsize=frame_utils.MAX_DATA_LENGTH)
+def get_hid_data_encoder(data_length: int) -> frame_utils.FrameEncoder:
+    return frame_utils.FrameEncoder(SEND_COMMAND, data_length)
+
+
+def create_hid_data_frames(data: bytes) -> bytearray:
+    # data split into frames of at most 64 bytes, back to back
+    max_length = frame_utils.MAX_DATA_LENGTH
+    frame_count = -(-len(data) // max_length)
+    overhead = frame_utils.FRAME_HEADER_SIZE + 1
+    buffer = bytearray(len(data) + frame_count * overhead)
+    view = memoryview(data)
+    offset = 0
+    for start in range(0, len(data), max_length):
+        chunk = view[start : start + max_length]
+        offset = get_hid_data_encoder(len(chunk)).encode_into(buffer, offset, chunk)
+    return buffer
+
+
+class HIDDataChannel(io.RawIOBase):
+    # Custom HID data in both directions. Written bytes are sent as 0x06
+    # frames of up to 64 bytes with at most window frames unacknowledged,
+    # 0x87 frames from the host are reassembled into a readable stream.
+    def __init__(
+        self,
+        serial_object: Serial,
+        window: int = 4,
+        timeout: Optional[float] = None,
+    ):
+        # close() runs from IOBase.__del__ even if __init__ fails
+        self.running = False
+        super().__init__()
+        self.serial_object = serial_object
+        self.window = window
+        if timeout is None:
+            timeout = transport.get_reply_timeout(serial_object)
+        self.timeout = timeout
+        self.slots = threading.BoundedSemaphore(window)
+        # send times of the frames waiting for their acknowledgement
+        self.pending: Deque[float] = deque()
+        self.lock = threading.Lock()
+        self.write_lock = threading.Lock()
+        self.receive_buffer = bytearray()
+        self.receive_condition = threading.Condition()
+        self.error: Optional[Exception] = None
+        self.decoder = frame_utils.FrameDecoder()
+        # throughput is measured from the first transfer in each direction
+        self.send_start_time: Optional[float] = None
+        self.receive_start_time: Optional[float] = None
+        self.bytes_sent = 0
+        self.frames_sent = 0
+        self.bytes_received = 0
+        self.frames_received = 0
+        self.error_count = 0
+        self.serial_timeout = serial_object.timeout
+        serial_object.timeout = READ_POLL_INTERVAL
+        self.running = True
+        self.thread = threading.Thread(
+            target=self.run, name="pych9329-hid-data", daemon=True
+        )
+        self.thread.start()
+
+    def readable(self) -> bool:
+        return True
+
+    def writable(self) -> bool:
+        return True
+
+    def close(self) -> None:
+        if self.running:
+            try:
+                self.flush()
+            finally:
+                self.running = False
+                self.thread.join()
+                self.serial_object.timeout = self.serial_timeout
+                with self.receive_condition:
+                    self.receive_condition.notify_all()
+        super().close()
+
+    def run(self) -> None:
+        while self.running:
+            try:
+                data = transport.read_packet(
+                    self.serial_object, self.decoder.bytes_needed()
+                )
+            except Exception as err:
+                self.fail(err)
+                return
+            if data:
+                self.decoder.feed(data)
+                for data_frame in self.decoder:
+                    self.dispatch(data_frame)
+            self.expire()
+
+    def fail(self, error: Exception) -> None:
+        self.error = error
+        self.running = False
+        with self.lock:
+            pending_count = len(self.pending)
+            self.pending.clear()
+        for _ in range(pending_count):
+            self.slots.release()
+        with self.receive_condition:
+            self.receive_condition.notify_all()
+
+    def dispatch(self, data_frame: frame_utils.DataFrame) -> None:
+        command = data_frame.CMD[0]
+        if command == RECEIVE_COMMAND:
+            data = data_frame.get_data()
+            if self.receive_start_time is None:
+                self.receive_start_time = time.monotonic()
+            with self.receive_condition:
+                self.receive_buffer += data
+                self.bytes_received += len(data)
+                self.frames_received += 1
+                self.receive_condition.notify_all()
+            return
+        if frame_utils.get_request_command(command) != SEND_COMMAND[0]:
+            return
+        with self.lock:
+            if not self.pending:
+                return
+            start_time = self.pending.popleft()
+        if instrumentation.ENABLED:
+            instrumentation.record_reply(
+                self.serial_object,
+                SEND_COMMAND[0],
+                data_frame,
+                time.monotonic() - start_time,
+            )
+        error = transport.get_reply_error(data_frame)
+        if error is not None:
+            self.error_count += 1
+            self.error = error
+        self.slots.release()
+
+    def expire(self) -> None:
+        # frames sent before this are overdue
+        sent_before = time.monotonic() - self.timeout
+        expired = 0
+        with self.lock:
+            while self.pending and self.pending[0] <= sent_before:
+                self.pending.popleft()
+                expired += 1
+        if instrumentation.ENABLED and expired:
+            instrumentation.record_error(
+                self.serial_object, SEND_COMMAND[0], "timeout", expired
+            )
+        for _ in range(expired):
+            self.error_count += 1
+            self.error = exceptions.ReplyTimeout("reply timeout")
+            self.slots.release()
+
+    def check_error(self) -> None:
+        error = self.error
+        if error is not None:
+            self.error = None
+            raise error
+
+    def acquire_slot(self) -> None:
+        if not self.slots.acquire(timeout=self.timeout):
+            raise exceptions.ReplyTimeout("reply timeout")
+
+    def write(self, data: bytes) -> int:
+        # Blocks while the window is full, frames that fit the window
+        # are written together.
+        self.check_error()
+        if not self.running:
+            raise exceptions.ProtocolError("channel closed")
+        buffer = create_hid_data_frames(data)
+        view = memoryview(buffer)
+        with self.write_lock:
+            if self.send_start_time is None:
+                self.send_start_time = time.monotonic()
+            start = offset = 0
+            while offset < len(buffer):
+                if not self.slots.acquire(blocking=False):
+                    if offset > start:
+                        transport.write_packet(self.serial_object, view[start:offset])
+                        start = offset
+                    self.acquire_slot()
+                with self.lock:
+                    self.pending.append(time.monotonic())
+                offset += frame_utils.FRAME_HEADER_SIZE + buffer[offset + 4] + 1
+                self.frames_sent += 1
+            if offset > start:
+                transport.write_packet(self.serial_object, view[start:offset])
+        self.bytes_sent += len(data)
+        return len(data)
+
+    def flush(self) -> None:
+        # wait until every written frame is acknowledged
+        if not self.running:
+            return
+        acquired = 0
+        try:
+            for _ in range(self.window):
+                self.acquire_slot()
+                acquired += 1
+        finally:
+            for _ in range(acquired):
+                self.slots.release()
+        self.check_error()
+
+    def readinto(self, buffer) -> Optional[int]:
+        # Waits up to timeout for data, returns 0 once closed and drained
+        # and None when nothing arrived in time.
+        with self.receive_condition:
+            if not self.receive_buffer and self.running:
+                self.receive_condition.wait_for(
+                    lambda: self.receive_buffer or not self.running, self.timeout
+                )
+            if not self.receive_buffer:
+                return 0 if not self.running else None
+            length = min(len(buffer), len(self.receive_buffer))
+            buffer[:length] = self.receive_buffer[:length]
+            del self.receive_buffer[:length]
+            return length
+
+    def read_available(self) -> bytes:
+        with self.receive_condition:
+            data = bytes(self.receive_buffer)
+            self.receive_buffer.clear()
+            return data
+
+    def __aiter__(self) -> "HIDDataChannel":
+        return self
+
+    async def __anext__(self) -> bytes:
+        # chunks as they arrive, until the channel is closed
+        while True:
+            data = await asyncio.to_thread(self.read, frame_utils.MAX_DATA_LENGTH)
+            if data:
+                return data
+            if data is not None:
+                raise StopAsyncIteration
+
+    @staticmethod
+    def get_throughput(byte_count: int, start_time: Optional[float]) -> float:
+        if start_time is None:
+            return 0.0
+        return byte_count / max(time.monotonic() - start_time, 1e-9)
+
+    def get_statistics(self) -> Dict[str, float]:
+        return {
+            "bytes_sent": self.bytes_sent,
+            "frames_sent": self.frames_sent,
+            "bytes_received": self.bytes_received,
+            "frames_received": self.frames_received,
+            "error_count": self.error_count,
+            "send_throughput": self.get_throughput(
+                self.bytes_sent, self.send_start_time
+            ),
+            "receive_throughput": self.get_throughput(
+                self.bytes_received, self.receive_start_time
+            ),
+        }
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,218 @@
+import threading
+from collections import defaultdict
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+from serial import Serial
+
+import pych9329.frame_utils as frame_utils
+
+# Checked by the send and receive path before recording anything,
+# while it is False instrumentation costs one global lookup.
+ENABLED = False
+# Reply latencies are counted in buckets of [2 ** (n - 1), 2 ** n) microseconds
+HISTOGRAM_BUCKETS = 32
+# Encoding happens before a frame belongs to any port
+ENCODE_DEVICE = "<encode>"
+
+STATUS_NAMES = {status.value[0]: status.name for status in frame_utils.DataFrameStatus}
+
+
+class CommandStatistics:
+    __slots__ = (
+        "frames_out",
+        "bytes_out",
+        "write_time",
+        "frames_in",
+        "bytes_in",
+        "encode_count",
+        "encode_time",
+        "latency_count",
+        "latency_total",
+        "latency_max",
+        "latency_histogram",
+        "status_counts",
+        "error_counts",
+    )
+
+    def __init__(self):
+        self.frames_out = 0
+        self.bytes_out = 0
+        self.write_time = 0.0
+        self.frames_in = 0
+        self.bytes_in = 0
+        self.encode_count = 0
+        self.encode_time = 0.0
+        self.latency_count = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+        self.latency_histogram = [0] * HISTOGRAM_BUCKETS
+        self.status_counts: Dict[str, int] = defaultdict(int)
+        self.error_counts: Dict[str, int] = defaultdict(int)
+
+    def add_latency(self, latency: float) -> None:
+        self.latency_count += 1
+        self.latency_total += latency
+        self.latency_max = max(self.latency_max, latency)
+        bucket = int(latency * 1000000).bit_length()
+        self.latency_histogram[min(bucket, HISTOGRAM_BUCKETS - 1)] += 1
+
+    def get_latency_percentile(self, percentile: float) -> float:
+        # upper bound of the bucket holding the percentile, in seconds
+        if not self.latency_count:
+            return 0.0
+        target = self.latency_count * percentile
+        total = 0
+        for bucket, count in enumerate(self.latency_histogram):
+            total += count
+            if total >= target:
+                return (1 << bucket) / 1000000
+        return self.latency_max
+
+    def to_dict(self) -> Dict[str, Any]:
+        histogram: List[Tuple[float, int]] = [
+            ((1 << bucket) / 1000000, count)
+            for bucket, count in enumerate(self.latency_histogram)
+            if count
+        ]
+        if self.latency_count:
+            latency_mean = self.latency_total / self.latency_count
+        else:
+            latency_mean = 0.0
+        return {
+            "frames_out": self.frames_out,
+            "bytes_out": self.bytes_out,
+            "write_time": self.write_time,
+            "frames_in": self.frames_in,
+            "bytes_in": self.bytes_in,
+            "encode_count": self.encode_count,
+            "encode_time": self.encode_time,
+            "latency_count": self.latency_count,
+            "latency_mean": latency_mean,
+            "latency_max": self.latency_max,
+            "latency_p50": self.get_latency_percentile(0.5),
+            "latency_p99": self.get_latency_percentile(0.99),
+            "latency_histogram": histogram,
+            "status_counts": dict(self.status_counts),
+            "error_counts": dict(self.error_counts),
+        }
+
+
+LOCK = threading.Lock()
+STATISTICS: Dict[str, Dict[int, CommandStatistics]] = defaultdict(
+    lambda: defaultdict(CommandStatistics)
+)
+
+
+def get_device_name(serial_object: Serial) -> str:
+    # statistics are grouped by port, so slow devices stand out
+    port = getattr(serial_object, "port", None)
+    if port is None:
+        return "<%s at 0x%x>" % (type(serial_object).__name__, id(serial_object))
+    return str(port)
+
+
+def enable() -> None:
+    global ENABLED
+    frame_utils.ENCODE_HOOK = record_encode
+    ENABLED = True
+
+
+def disable() -> None:
+    global ENABLED
+    ENABLED = False
+    frame_utils.ENCODE_HOOK = None
+
+
+def reset() -> None:
+    with LOCK:
+        STATISTICS.clear()
+
+
+def record_encode(command: int, frame_length: int, elapsed: float) -> None:
+    with LOCK:
+        statistics = STATISTICS[ENCODE_DEVICE][command]
+        statistics.encode_count += 1
+        statistics.encode_time += elapsed
+
+
+def record_write(
+    serial_object: Serial,
+    buffer: bytes,
+    elapsed: float,
+    frame_length: Optional[int] = None,
+) -> None:
+    # buffer holds frames back to back, with frame_length they all belong
+    # to one command and are counted without reading their headers
+    if len(buffer) < frame_utils.FRAME_HEADER_SIZE:
+        return
+    if frame_length is None:
+        counts = count_frames(buffer)
+    else:
+        counts = {buffer[3]: (len(buffer) // frame_length, len(buffer))}
+    with LOCK:
+        commands = STATISTICS[get_device_name(serial_object)]
+        for command, (frame_count, byte_count) in counts.items():
+            statistics = commands[command]
+            statistics.frames_out += frame_count
+            statistics.bytes_out += byte_count
+            # the write time is shared by the bytes of each command
+            statistics.write_time += elapsed * byte_count / len(buffer)
+
+
+def count_frames(buffer: bytes) -> Dict[int, Tuple[int, int]]:
+    # {command: (frame count, byte count)}, frames of a pipelined write
+    # may belong to different commands
+    counts: Dict[int, Tuple[int, int]] = {}
+    offset = 0
+    while offset + frame_utils.FRAME_HEADER_SIZE <= len(buffer):
+        length = frame_utils.FRAME_HEADER_SIZE + buffer[offset + 4] + 1
+        frame_count, byte_count = counts.get(buffer[offset + 3], (0, 0))
+        counts[buffer[offset + 3]] = (frame_count + 1, byte_count + length)
+        offset += length
+    return counts
+
+
+def record_reply(
+    serial_object: Serial,
+    command: int,
+    data_frame: frame_utils.DataFrame,
+    latency: float,
+) -> None:
+    data = data_frame.get_data()
+    with LOCK:
+        statistics = STATISTICS[get_device_name(serial_object)][command]
+        statistics.frames_in += 1
+        statistics.bytes_in += frame_utils.FRAME_HEADER_SIZE + len(data) + 1
+        statistics.add_latency(latency)
+        if len(data) == 1 and data[0] in STATUS_NAMES:
+            statistics.status_counts[STATUS_NAMES[data[0]]] += 1
+        elif frame_utils.is_error_reply(data_frame.CMD[0]):
+            statistics.status_counts["UNKNOWN"] += 1
+
+
+def record_error(
+    serial_object: Serial, command: int, error_name: str, count: int = 1
+) -> None:
+    with LOCK:
+        statistics = STATISTICS[get_device_name(serial_object)][command]
+        statistics.error_counts[error_name] += count
+
+
+def snapshot() -> Dict[str, Dict[str, Dict[str, Any]]]:
+    # {device: {"0x08": {...}}}, plain data ready for json.dumps
+    with LOCK:
+        return {
+            device: {
+                "0x%02x" % command: statistics.to_dict()
+                for command, statistics in sorted(commands.items())
+            }
+            for device, commands in STATISTICS.items()
+        }
+
+
+if __name__ == "__main__":
+    pass
@@ -1,15 +1,26 @@
+import functools
 import random
 import time
 from collections import OrderedDict
 from typing import Dict
+from typing import Iterable
 from typing import List
 from typing import Optional
+from typing import Set
 from typing import Tuple
 
 from serial import Serial
 
+import pych9329.exceptions as exceptions
 import pych9329.frame_utils as frame_utils
+import pych9329.transport as transport
 from pych9329.hid_code_map import HID_CODE_MAP
+from pych9329.scheduler import FrameScheduler
+
+GENERAL_DATA_ENCODER = frame_utils.FrameEncoder(b"\x02", 8)
+RELEASE_FRAME = GENERAL_DATA_ENCODER.encode(bytes(8))
+# Upper bound of cached press and trigger frames
+FRAME_CACHE_SIZE = 1024
 
 MODIFIER_KEY_NAME_MAP = {
     "": 0b00000000,
@@ -38,14 +49,7 @@ def deduplicate_list(lt: List) -> List:
     return list(OrderedDict.fromkeys(lt))
 
 
-def receive_indicator_status(serial_object: Serial) -> Tuple[bool, Dict[str, bool]]:
-    result_dict: Dict[str, bool] = {
-        "usb_connect_status": False,
-        "num_lock": False,
-        "caps_lock": False,
-        "scroll_lock": False,
-    }
-    result_value = False
+def create_indicator_status_frame() -> bytes:
     data_frame = frame_utils.DataFrame(
         b"\x57\xab",
         b"\x00",
@@ -53,21 +57,20 @@ def receive_indicator_status(serial_object: Serial) -> Tuple[bool, Dict[str, boo
         b"\x00",
         b"",
     )
-    frame_packet = data_frame.create_frame()
-    # clear connection buffer
-    serial_object.readall()
-    # write command
-    serial_object.write(frame_packet)
-    serial_object.flush()
-    # read packet
-    reply_packet: bytes = serial_object.readall()
-    parse_result = data_frame.parse_frame(reply_packet)
-    if parse_result is False:
-        return result_value, result_dict
+    return data_frame.create_frame()
+
+
+def parse_indicator_status(data_frame: frame_utils.DataFrame) -> Dict[str, bool]:
+    result_dict: Dict[str, bool] = {
+        "usb_connect_status": False,
+        "num_lock": False,
+        "caps_lock": False,
+        "scroll_lock": False,
+    }
     reply_data = data_frame.get_data()
     # 获取USB连接状态
     usb_connect_status: bytes = reply_data[1:2]
-    if usb_connect_status == b"0x00":
+    if usb_connect_status == b"\x00":
         result_dict["usb_connect_status"] = False
     else:
         result_dict["usb_connect_status"] = True
@@ -86,21 +89,30 @@ def receive_indicator_status(serial_object: Serial) -> Tuple[bool, Dict[str, boo
         result_dict["scroll_lock"] = True
     else:
         result_dict["scroll_lock"] = False
-    result_value = True
-    return result_value, result_dict
+    return result_dict
 
 
-def send_general_data(
-    serial_object: Serial,
-    key_tuple: Tuple[str, str, str, str, str, str] = ("", "", "", "", "", ""),
-    modifiers: Optional[List[str]] = None,
-) -> None:
-    if modifiers is None:
-        modifiers = []
+def receive_indicator_status(
+    serial_object: Serial, timeout: Optional[float] = None
+) -> Tuple[bool, Dict[str, bool]]:
+    result_dict: Dict[str, bool] = {
+        "usb_connect_status": False,
+        "num_lock": False,
+        "caps_lock": False,
+        "scroll_lock": False,
+    }
+    result_value = False
+    frame_packet = create_indicator_status_frame()
+    try:
+        data_frame = transport.request(serial_object, frame_packet, timeout)
+    except exceptions.ProtocolError:
+        return result_value, result_dict
+    result_dict = parse_indicator_status(data_frame)
+    result_value = True
+    return result_value, result_dict
 
-    # CMD_SEND_KB_GENERAL_DATA data has exactly 8 bytes
-    data = b""
 
+def get_modifier_value(modifiers: List[str]) -> int:
     # first byte modifiers key, each bit represents 1 key
     #
     # BIT0 - ctrl_left
@@ -114,56 +126,59 @@ def send_general_data(
     modifier_value: int = 0x00
     for key_name in modifiers:
         if key_name not in MODIFIER_KEY_NAME_MAP:
-            raise InvalidModifierKey(key_name)
+            raise exceptions.InvalidModifierKey(key_name)
         modifier_value |= MODIFIER_KEY_NAME_MAP[key_name]
-    data += modifier_value.to_bytes(1, byteorder="little")
+    return modifier_value
 
-    # second byte must be 0x00
-    data += b"\x00"
 
+def create_general_data_frame(
+    key_tuple: Tuple[str, str, str, str, str, str] = ("", "", "", "", "", ""),
+    modifiers: Optional[List[str]] = None,
+) -> bytes:
+    if modifiers is None:
+        modifiers = []
+
+    # CMD_SEND_KB_GENERAL_DATA data has exactly 8 bytes
+    # first byte is modifiers key
+    # second byte must be 0x00
     # third to eighth bytes are keys
     # we can press upto 6 buttons
-    for key in key_tuple:
+    data = bytearray(8)
+    data[0] = get_modifier_value(modifiers)
+    for index, key in enumerate(key_tuple):
         if key not in HID_CODE_MAP:
-            raise InvalidKey(key)
-        hid_code, _ = HID_CODE_MAP[key]
-        data += hid_code
-
-    # create packet and send
-    data_frame = frame_utils.DataFrame(
-        b"\x57\xab",
-        b"\x00",
-        b"\x02",
-        b"",
-        b"",
-    )
-    data_frame.set_data(data)
-    frame_packet = data_frame.create_frame()
-    serial_object.write(frame_packet)
-    serial_object.flush()
+            raise exceptions.InvalidKey(key)
+        data[2 + index] = HID_CODE_MAP[key][0][0]
+    return GENERAL_DATA_ENCODER.encode(data)
 
 
-def trigger(
+def send_general_data(
     serial_object: Serial,
-    keys: list[str],
+    key_tuple: Tuple[str, str, str, str, str, str] = ("", "", "", "", "", ""),
     modifiers: Optional[List[str]] = None,
 ) -> None:
-    trigger_keys = keys.copy()
-    trigger_modifiers = modifiers.copy()
-    trigger_keys = deduplicate_list(trigger_keys)
-    trigger_modifiers = deduplicate_list(trigger_modifiers)
+    frame_packet = create_general_data_frame(key_tuple, modifiers)
+    transport.write_packet(serial_object, frame_packet)
+    serial_object.flush()
+
+
+@functools.lru_cache(maxsize=FRAME_CACHE_SIZE)
+def get_trigger_frame(keys: Tuple[str, ...], modifiers: Tuple[str, ...]) -> bytes:
+    trigger_keys = deduplicate_list(list(keys))
+    trigger_modifiers = deduplicate_list(list(modifiers))
     # Supports press to 6 normal buttons at the same time
     if len(trigger_keys) > 6:
-        raise TooManyKeys("CH9329 supports maximum of 6 keys to be pressed at once.")
+        raise exceptions.TooManyKeys(
+            "CH9329 supports maximum of 6 keys to be pressed at once."
+        )
     if len(trigger_modifiers) > 8:
-        raise TooManyKeys(
+        raise exceptions.TooManyKeys(
             "CH9329 supports maximum of 8 control keys to be pressed at once."
         )
     # if len(keys) < 6, add empty keys
     while len(trigger_keys) < 6:
         trigger_keys.append("")
-    send_general_data(
-        serial_object,
+    return create_general_data_frame(
         (
             trigger_keys[0],
             trigger_keys[1],
@@ -176,25 +191,62 @@ def trigger(
     )
 
 
-def press(
-    serial_object: Serial, key: str, modifiers: Optional[List[str]] = None
-) -> None:
+def create_trigger_frame(
+    keys: list[str],
+    modifiers: Optional[List[str]] = None,
+) -> bytes:
     if modifiers is None:
-        modifiers_copy = []
-    elif isinstance(modifiers, list):
-        modifiers_copy = modifiers.copy()
-    else:
-        modifiers_copy = []
+        modifiers = []
+    return get_trigger_frame(tuple(keys), tuple(modifiers))
+
+
+def trigger(
+    serial_object: Serial,
+    keys: list[str],
+    modifiers: Optional[List[str]] = None,
+) -> None:
+    frame_packet = create_trigger_frame(keys, modifiers)
+    transport.write_packet(serial_object, frame_packet)
+    serial_object.flush()
+
+
+@functools.lru_cache(maxsize=FRAME_CACHE_SIZE)
+def get_press_frame(key: str, modifier_value: int = 0) -> bytes:
     if key not in HID_CODE_MAP:
-        raise InvalidKey(key)
-    _, shift = HID_CODE_MAP[key]
+        raise exceptions.InvalidKey(key)
+    hid_code, shift = HID_CODE_MAP[key]
+    data = bytearray(8)
+    data[0] = modifier_value
     if shift:
-        modifiers_copy.append("shift")
-    send_general_data(serial_object, (key, "", "", "", "", ""), modifiers_copy)
+        data[0] |= MODIFIER_KEY_NAME_MAP["shift"]
+    data[2] = hid_code[0]
+    return GENERAL_DATA_ENCODER.encode(data)
+
+
+def create_press_frame(key: str, modifiers: Optional[List[str]] = None) -> bytes:
+    if isinstance(modifiers, list):
+        modifier_value = get_modifier_value(modifiers)
+    else:
+        modifier_value = 0
+    return get_press_frame(key, modifier_value)
+
+
+def press(
+    serial_object: Serial, key: str, modifiers: Optional[List[str]] = None
+) -> None:
+    frame_packet = create_press_frame(key, modifiers)
+    transport.write_packet(serial_object, frame_packet)
+    serial_object.flush()
+
+
+def create_release_frame() -> bytes:
+    return RELEASE_FRAME
 
 
 def release(serial_object: Serial) -> None:
-    send_general_data(serial_object, ("", "", "", "", "", ""))
+    frame_packet = create_release_frame()
+    transport.write_packet(serial_object, frame_packet)
+    serial_object.flush()
 
 
 def click(
@@ -202,8 +254,15 @@ def click(
     key: str,
     min_interval: float = 0.02,
     max_interval: float = 0.05,
+    scheduler: Optional[FrameScheduler] = None,
 ) -> None:
     sleep_time = random.uniform(min_interval, max_interval)
+    if scheduler is not None:
+        # queue both reports and return immediately
+        scheduler.schedule_sequence(
+            serial_object, [(0.0, get_press_frame(key)), (sleep_time, RELEASE_FRAME)]
+        )
+        return
     press(serial_object, key)
     time.sleep(sleep_time)
     release(serial_object)
@@ -214,10 +273,202 @@ def send_text(
     text: str,
     min_interval: float = 0.02,
     max_interval: float = 0.05,
+    scheduler: Optional[FrameScheduler] = None,
 ) -> None:
+    if scheduler is not None:
+        # one timeline for the whole text, intervals can not add up drift
+        timeline = []
+        offset = 0.0
+        for char in text:
+            timeline.append((offset, get_press_frame(char)))
+            offset += random.uniform(min_interval, max_interval)
+            timeline.append((offset, RELEASE_FRAME))
+        scheduler.schedule_sequence(ser, timeline)
+        return
     for char in text:
         click(ser, char, min_interval, max_interval)
 
 
+def create_text_frames(text: str) -> bytearray:
+    # press and release report for every character in one buffer
+    frame_length = GENERAL_DATA_ENCODER.frame_length
+    buffer = bytearray(len(text) * frame_length * 2)
+    offset = 0
+    for char in text:
+        buffer[offset : offset + frame_length] = get_press_frame(char)
+        offset += frame_length
+        buffer[offset : offset + frame_length] = RELEASE_FRAME
+        offset += frame_length
+    return buffer
+
+
+def create_rollover_text_frames(text: str) -> bytearray:
+    # Goes straight from the report of one character to the next,
+    # a release is only needed before a repeated key or a shift change.
+    buffer = bytearray()
+    last_key = None
+    for char in text:
+        if char not in HID_CODE_MAP:
+            raise exceptions.InvalidKey(char)
+        hid_code, shift = HID_CODE_MAP[char]
+        if last_key is not None and (last_key[0] == hid_code or last_key[1] != shift):
+            buffer += RELEASE_FRAME
+        buffer += get_press_frame(char)
+        last_key = (hid_code, shift)
+    if last_key is not None:
+        buffer += RELEASE_FRAME
+    return buffer
+
+
+def send_text_batch(
+    serial_object: Serial,
+    text: str,
+    upload_interval: int = 0,
+    frames_per_write: Optional[int] = None,
+    rollover: bool = False,
+) -> None:
+    # upload_interval is ChipParameter.keyboard_upload_interval in milliseconds,
+    # reports are paced by it or by the baud rate, whichever is slower.
+    # rollover skips the releases which are not needed, see
+    # create_rollover_text_frames.
+    if rollover:
+        buffer = create_rollover_text_frames(text)
+    else:
+        buffer = create_text_frames(text)
+    transport.send_frames(
+        serial_object,
+        buffer,
+        GENERAL_DATA_ENCODER.frame_length,
+        upload_interval / 1000,
+        frames_per_write,
+    )
+
+
+class KeyboardState:
+    # Tracks the keys held on one port: the modifier byte and six key slots.
+    # key_down / key_up change single slots and a frame is only sent
+    # when the resulting report differs from the last one sent.
+    def __init__(self, serial_object: Serial):
+        self.serial_object = serial_object
+        self.modifier_value = 0
+        # modifiers added by keys like "A" which need shift
+        self.shifted_codes: Set[int] = set()
+        self.slots = [0] * 6
+        self.last_report: Optional[bytes] = None
+        self.sent_count = 0
+        self.suppressed_count = 0
+
+    def get_report(self) -> bytes:
+        modifier_value = self.modifier_value
+        if self.shifted_codes:
+            modifier_value |= MODIFIER_KEY_NAME_MAP["shift"]
+        return bytes([modifier_value, 0x00, *self.slots])
+
+    def is_pressed(self, key: str) -> bool:
+        if key in MODIFIER_KEY_NAME_MAP:
+            modifier_value = MODIFIER_KEY_NAME_MAP[key]
+            return modifier_value != 0 and (
+                self.modifier_value & modifier_value == modifier_value
+            )
+        if key not in HID_CODE_MAP:
+            raise exceptions.InvalidKey(key)
+        return HID_CODE_MAP[key][0][0] in self.slots
+
+    def update(self) -> bool:
+        report = self.get_report()
+        if report == self.last_report:
+            self.suppressed_count += 1
+            return False
+        transport.write_packet(self.serial_object, GENERAL_DATA_ENCODER.encode(report))
+        self.serial_object.flush()
+        self.last_report = report
+        self.sent_count += 1
+        return True
+
+    def change_key(self, key: str, pressed: bool) -> None:
+        if key in MODIFIER_KEY_NAME_MAP:
+            if pressed:
+                self.modifier_value |= MODIFIER_KEY_NAME_MAP[key]
+            else:
+                self.modifier_value &= ~MODIFIER_KEY_NAME_MAP[key]
+            return
+        if key not in HID_CODE_MAP:
+            raise exceptions.InvalidKey(key)
+        hid_code, shift = HID_CODE_MAP[key]
+        code = hid_code[0]
+        if code == 0:
+            return
+        if pressed:
+            if code not in self.slots:
+                if 0 not in self.slots:
+                    raise exceptions.TooManyKeys(
+                        "CH9329 supports maximum of 6 keys to be pressed at once."
+                    )
+                # the other keys keep their slots
+                self.slots[self.slots.index(0)] = code
+            if shift:
+                self.shifted_codes.add(code)
+        else:
+            if code in self.slots:
+                self.slots[self.slots.index(code)] = 0
+            self.shifted_codes.discard(code)
+
+    @staticmethod
+    def check_keys(keys: Iterable[str], slots: List[int]) -> None:
+        # raise before any state changes if keys do not fit the free slots
+        codes = set()
+        for key in keys:
+            if key in MODIFIER_KEY_NAME_MAP:
+                continue
+            if key not in HID_CODE_MAP:
+                raise exceptions.InvalidKey(key)
+            code = HID_CODE_MAP[key][0][0]
+            if code != 0 and code not in slots:
+                codes.add(code)
+        if len(codes) > slots.count(0):
+            raise exceptions.TooManyKeys(
+                "CH9329 supports maximum of 6 keys to be pressed at once."
+            )
+
+    def key_down(self, *keys: str) -> bool:
+        # returns whether a frame was sent
+        self.check_keys(keys, self.slots)
+        for key in keys:
+            self.change_key(key, True)
+        return self.update()
+
+    def key_up(self, *keys: str) -> bool:
+        # releasing frees slots, so only the names need checking first
+        for key in keys:
+            if key not in MODIFIER_KEY_NAME_MAP and key not in HID_CODE_MAP:
+                raise exceptions.InvalidKey(key)
+        for key in keys:
+            self.change_key(key, False)
+        return self.update()
+
+    def set_keys(self, keys: List[str], modifiers: Optional[List[str]] = None) -> bool:
+        # replace the whole state, like trigger but suppressed when unchanged
+        modifier_value = get_modifier_value(modifiers or [])
+        keys = deduplicate_list(keys)
+        self.check_keys(keys, [0] * 6)
+        self.modifier_value = modifier_value
+        self.shifted_codes.clear()
+        self.slots = [0] * 6
+        for key in keys:
+            self.change_key(key, True)
+        return self.update()
+
+    def release_all(self) -> bool:
+        self.modifier_value = 0
+        self.shifted_codes.clear()
+        self.slots = [0] * 6
+        return self.update()
+
+    def resend(self) -> bool:
+        # send the current report even if the device should already have it
+        self.last_report = None
+        return self.update()
+
+
 if __name__ == "__main__":
     pass
@@ -0,0 +1,279 @@
+import mmap
+import struct
+import time
+from typing import BinaryIO
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+from serial import Serial
+
+import pych9329.exceptions as exceptions
+import pych9329.frame_utils as frame_utils
+import pych9329.keyboard as keyboard
+import pych9329.mouse as mouse
+import pych9329.transport as transport
+from pych9329.scheduler import FrameScheduler
+from pych9329.scheduler import sleep_until
+
+# File layout:
+#   header: magic, version, frame count
+#   index: per frame the microseconds since the previous frame and its length
+#   data: all frames back to back, so frames sent together are contiguous
+MACRO_MAGIC = b"CH9329M\x00"
+MACRO_VERSION = 1
+MACRO_HEADER_STRUCT = struct.Struct("<8sHI")
+MACRO_RECORD_STRUCT = struct.Struct("<IB")
+# Longest delay between two frames, about 71 minutes
+MAX_DELAY = 0xFFFFFFFF / 1000000
+
+
+class MacroBuilder:
+    # Compiles keyboard, mouse and delay operations into finished frames,
+    # everything is validated and encoded once here instead of on replay.
+    def __init__(self):
+        self.index = bytearray()
+        self.data = bytearray()
+        self.frame_count = 0
+        self.pending_delay = 0.0
+
+    def delay(self, seconds: float) -> "MacroBuilder":
+        if seconds < 0:
+            raise exceptions.InvalidDelay("negative delay")
+        self.pending_delay += seconds
+        return self
+
+    def add_frame(self, frame: bytes) -> "MacroBuilder":
+        if self.pending_delay > MAX_DELAY:
+            raise exceptions.InvalidDelay("delay too long")
+        delta_us = round(self.pending_delay * 1000000)
+        self.index += MACRO_RECORD_STRUCT.pack(delta_us, len(frame))
+        self.data += frame
+        self.frame_count += 1
+        self.pending_delay = 0.0
+        return self
+
+    def add_frames(
+        self, buffer: bytes, frame_length: int, interval: float = 0.0
+    ) -> "MacroBuilder":
+        # buffer holds frames of equal length sent interval seconds apart
+        for offset in range(0, len(buffer), frame_length):
+            if offset:
+                self.delay(interval)
+            self.add_frame(bytes(buffer[offset : offset + frame_length]))
+        return self
+
+    def key_press(
+        self, key: str, modifiers: Optional[List[str]] = None
+    ) -> "MacroBuilder":
+        return self.add_frame(keyboard.create_press_frame(key, modifiers))
+
+    def key_trigger(
+        self, keys: List[str], modifiers: Optional[List[str]] = None
+    ) -> "MacroBuilder":
+        return self.add_frame(keyboard.create_trigger_frame(keys, modifiers))
+
+    def key_release(self) -> "MacroBuilder":
+        return self.add_frame(keyboard.RELEASE_FRAME)
+
+    def key_click(
+        self, key: str, modifiers: Optional[List[str]] = None, duration: float = 0.05
+    ) -> "MacroBuilder":
+        self.key_press(key, modifiers)
+        return self.delay(duration).key_release()
+
+    def text(
+        self, text: str, interval: float = 0.0, rollover: bool = False
+    ) -> "MacroBuilder":
+        if rollover:
+            buffer = keyboard.create_rollover_text_frames(text)
+        else:
+            buffer = keyboard.create_text_frames(text)
+        return self.add_frames(
+            buffer,
+            keyboard.GENERAL_DATA_ENCODER.frame_length,
+            interval,
+        )
+
+    def mouse_move(
+        self,
+        x: int,
+        y: int,
+        button_name: str = "null",
+        monitor_width: int = 1920,
+        monitor_height: int = 1080,
+    ) -> "MacroBuilder":
+        return self.add_frame(
+            mouse.create_absolute_data_frame(
+                x, y, button_name, monitor_width, monitor_height
+            )
+        )
+
+    def mouse_move_relative(
+        self, dx: int, dy: int, button_name: str = "null", interval: float = 0.0
+    ) -> "MacroBuilder":
+        return self.add_frames(
+            mouse.create_relative_move_frames(dx, dy, button_name),
+            mouse.RELATIVE_DATA_ENCODER.frame_length,
+            interval,
+        )
+
+    def mouse_press(self, button_name: str = "left") -> "MacroBuilder":
+        return self.add_frame(mouse.create_relative_data_frame(0, 0, button_name))
+
+    def mouse_release(self) -> "MacroBuilder":
+        return self.add_frame(mouse.create_relative_data_frame(0, 0, "null"))
+
+    def mouse_click(
+        self, button_name: str = "left", duration: float = 0.05
+    ) -> "MacroBuilder":
+        self.mouse_press(button_name)
+        return self.delay(duration).mouse_release()
+
+    def mouse_wheel(self, wheel_value: int = 1) -> "MacroBuilder":
+        return self.add_frame(
+            mouse.create_relative_data_frame(0, 0, "null", wheel_value)
+        )
+
+    def to_bytes(self) -> bytes:
+        header = MACRO_HEADER_STRUCT.pack(MACRO_MAGIC, MACRO_VERSION, self.frame_count)
+        return header + self.index + self.data
+
+    def save(self, path: str) -> None:
+        with open(path, "wb") as f:
+            f.write(self.to_bytes())
+
+
+class MacroRecorder:
+    # Stands in for a Serial object, every frame the existing API writes
+    # is recorded with the time since the previous one, e.g.
+    # keyboard.send_text(recorder, "hello") or mouse.click(recorder).
+    def __init__(self, baudrate: int = 9600, real_time: bool = True):
+        self.builder = MacroBuilder()
+        self.decoder = frame_utils.FrameDecoder()
+        self.baudrate = baudrate
+        self.timeout: Optional[float] = None
+        self.port = "<macro>"
+        # with real_time the delays are measured, otherwise only
+        # those added with delay() end up in the macro
+        self.real_time = real_time
+        self.last_write_time: Optional[float] = None
+
+    def write(self, data: bytes) -> int:
+        now = time.monotonic()
+        if self.real_time and self.last_write_time is not None:
+            self.builder.delay(now - self.last_write_time)
+        self.last_write_time = now
+        for data_frame in self.decoder.decode(bytes(data)):
+            self.builder.add_frame(data_frame.create_frame())
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def read(self, size: int = 1) -> bytes:
+        # nothing ever answers a recording
+        return b""
+
+    def reset_input_buffer(self) -> None:
+        pass
+
+    def delay(self, seconds: float) -> None:
+        self.builder.delay(seconds)
+
+    def to_bytes(self) -> bytes:
+        return self.builder.to_bytes()
+
+    def save(self, path: str) -> None:
+        self.builder.save(path)
+
+
+class MacroPlayer:
+    # Replays a compiled macro from a memory mapped file. The index is
+    # read once, frames without a delay between them are sent in one write.
+    def __init__(self, source: BinaryIO):
+        try:
+            self.mapping = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # an empty file can not be mapped
+            raise exceptions.InvalidMacroFile("file too small")
+        try:
+            self.frame_count = self.check_header()
+            self.writes = self.build_writes()
+        except Exception:
+            self.close()
+            raise
+        self.duration = self.writes[-1][0] if self.writes else 0.0
+
+    def __enter__(self) -> "MacroPlayer":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    @classmethod
+    def from_file(cls, path: str) -> "MacroPlayer":
+        with open(path, "rb") as f:
+            # the mapping stays valid after the file is closed
+            return cls(f)
+
+    def close(self) -> None:
+        self.mapping.close()
+
+    def check_header(self) -> int:
+        if len(self.mapping) < MACRO_HEADER_STRUCT.size:
+            raise exceptions.InvalidMacroFile("file too small")
+        magic, version, frame_count = MACRO_HEADER_STRUCT.unpack_from(self.mapping)
+        if magic != MACRO_MAGIC:
+            raise exceptions.InvalidMacroFile("bad magic")
+        if version != MACRO_VERSION:
+            raise exceptions.InvalidMacroFile("unsupported version %d" % version)
+        return frame_count
+
+    def build_writes(self) -> List[Tuple[float, int, int]]:
+        # (offset from the start in seconds, start, end) of every write
+        index_start = MACRO_HEADER_STRUCT.size
+        data_start = index_start + self.frame_count * MACRO_RECORD_STRUCT.size
+        if data_start > len(self.mapping):
+            raise exceptions.InvalidMacroFile("truncated index")
+        writes: List[Tuple[float, int, int]] = []
+        elapsed_us = 0
+        position = data_start
+        for delta_us, length in MACRO_RECORD_STRUCT.iter_unpack(
+            self.mapping[index_start:data_start]
+        ):
+            elapsed_us += delta_us
+            end = position + length
+            if writes and delta_us == 0:
+                writes[-1] = (writes[-1][0], writes[-1][1], end)
+            else:
+                writes.append((elapsed_us / 1000000, position, end))
+            position = end
+        if position > len(self.mapping):
+            raise exceptions.InvalidMacroFile("truncated data")
+        return writes
+
+    def get_frames(self) -> List[Tuple[float, bytes]]:
+        return [(offset, self.mapping[start:end]) for offset, start, end in self.writes]
+
+    def play(self, serial_object: Serial, speed: float = 1.0) -> None:
+        # slicing the mapping copies the frames, like pyserial would anyway
+        mapping = self.mapping
+        start_time = time.monotonic()
+        for offset, start, end in self.writes:
+            sleep_until(start_time + offset / speed)
+            transport.write_packet(serial_object, mapping[start:end])
+        serial_object.flush()
+
+    def schedule(
+        self,
+        scheduler: FrameScheduler,
+        serial_object: Serial,
+        start_time: Optional[float] = None,
+    ) -> float:
+        # queue the whole macro and return its last deadline
+        return scheduler.schedule_sequence(serial_object, self.get_frames(), start_time)
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,127 @@
+import functools
+import random
+import time
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+from serial import Serial
+
+import pych9329.exceptions as exceptions
+import pych9329.frame_utils as frame_utils
+import pych9329.transport as transport
+from pych9329.media_code_map import MEDIA_CODE_MAP
+from pych9329.media_code_map import MEDIA_REPORT_ACPI
+from pych9329.media_code_map import MEDIA_REPORT_MULTIMEDIA
+from pych9329.scheduler import FrameScheduler
+
+# CMD_SEND_KB_MEDIA_DATA carries 2 bytes for ACPI keys
+# and 4 bytes for multimedia keys
+ACPI_DATA_ENCODER = frame_utils.FrameEncoder(b"\x03", 2)
+MULTIMEDIA_DATA_ENCODER = frame_utils.FrameEncoder(b"\x03", 4)
+RELEASE_FRAMES: Dict[bytes, bytes] = {
+    MEDIA_REPORT_ACPI: ACPI_DATA_ENCODER.encode(MEDIA_REPORT_ACPI + bytes(1)),
+    MEDIA_REPORT_MULTIMEDIA: MULTIMEDIA_DATA_ENCODER.encode(
+        MEDIA_REPORT_MULTIMEDIA + bytes(3)
+    ),
+}
+
+
+def encode_media_data(report_id: bytes, key_data: bytes) -> bytes:
+    if report_id == MEDIA_REPORT_ACPI:
+        return ACPI_DATA_ENCODER.encode(report_id + key_data)
+    return MULTIMEDIA_DATA_ENCODER.encode(report_id + key_data)
+
+
+# Every key has exactly one press frame, they are all built at import
+PRESS_FRAMES: Dict[str, bytes] = {
+    key: encode_media_data(report_id, key_data)
+    for key, (report_id, key_data) in MEDIA_CODE_MAP.items()
+}
+
+
+def get_press_frame(key: str) -> bytes:
+    if key not in PRESS_FRAMES:
+        raise exceptions.InvalidKey(key)
+    return PRESS_FRAMES[key]
+
+
+def get_release_frame(key: str) -> bytes:
+    # release of the report the key belongs to
+    if key not in MEDIA_CODE_MAP:
+        raise exceptions.InvalidKey(key)
+    return RELEASE_FRAMES[MEDIA_CODE_MAP[key][0]]
+
+
+@functools.lru_cache(maxsize=256)
+def get_trigger_frame(keys: Tuple[str, ...]) -> bytes:
+    # All keys are pressed at the same time, they have to share one report
+    if not keys:
+        raise exceptions.InvalidKey("no media key")
+    report_id = None
+    key_value = 0
+    for key in keys:
+        if key not in MEDIA_CODE_MAP:
+            raise exceptions.InvalidKey(key)
+        key_report_id, key_data = MEDIA_CODE_MAP[key]
+        if report_id is not None and key_report_id != report_id:
+            raise exceptions.InvalidKey(
+                "ACPI and multimedia keys can not be pressed at once"
+            )
+        report_id = key_report_id
+        key_value |= int.from_bytes(key_data, byteorder="little")
+    key_data = key_value.to_bytes(len(MEDIA_CODE_MAP[keys[0]][1]), byteorder="little")
+    return encode_media_data(report_id, key_data)
+
+
+def press(serial_object: Serial, key: str) -> None:
+    transport.write_packet(serial_object, get_press_frame(key))
+    serial_object.flush()
+
+
+def release(serial_object: Serial, key: str) -> None:
+    # ACPI and multimedia keys are released separately, every key
+    # of the report the key belongs to is released with it.
+    transport.write_packet(serial_object, get_release_frame(key))
+    serial_object.flush()
+
+
+def release_all(serial_object: Serial) -> None:
+    transport.write_packet(
+        serial_object,
+        RELEASE_FRAMES[MEDIA_REPORT_ACPI] + RELEASE_FRAMES[MEDIA_REPORT_MULTIMEDIA],
+    )
+    serial_object.flush()
+
+
+def trigger(serial_object: Serial, keys: List[str]) -> None:
+    transport.write_packet(serial_object, get_trigger_frame(tuple(keys)))
+    serial_object.flush()
+
+
+def click(
+    serial_object: Serial,
+    key: str,
+    min_interval: float = 0.02,
+    max_interval: float = 0.05,
+    scheduler: Optional[FrameScheduler] = None,
+) -> None:
+    press_frame = get_press_frame(key)
+    release_frame = get_release_frame(key)
+    sleep_time = random.uniform(min_interval, max_interval)
+    if scheduler is not None:
+        # queue both reports and return immediately
+        scheduler.schedule_sequence(
+            serial_object, [(0.0, press_frame), (sleep_time, release_frame)]
+        )
+        return
+    transport.write_packet(serial_object, press_frame)
+    serial_object.flush()
+    time.sleep(sleep_time)
+    transport.write_packet(serial_object, release_frame)
+    serial_object.flush()
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,39 @@
+# CMD_SEND_KB_MEDIA_DATA reports
+# ACPI keys: report id 0x01 + 1 byte
+# multimedia keys: report id 0x02 + 3 bytes, each bit represents 1 key
+MEDIA_REPORT_ACPI = b"\x01"
+MEDIA_REPORT_MULTIMEDIA = b"\x02"
+
+MEDIA_CODE_MAP = {
+    # ACPI
+    "power": (MEDIA_REPORT_ACPI, b"\x01"),
+    "sleep": (MEDIA_REPORT_ACPI, b"\x02"),
+    "wake_up": (MEDIA_REPORT_ACPI, b"\x04"),
+    # multimedia, first byte
+    "volume_up": (MEDIA_REPORT_MULTIMEDIA, b"\x01\x00\x00"),
+    "volume_down": (MEDIA_REPORT_MULTIMEDIA, b"\x02\x00\x00"),
+    "mute": (MEDIA_REPORT_MULTIMEDIA, b"\x04\x00\x00"),
+    "play_pause": (MEDIA_REPORT_MULTIMEDIA, b"\x08\x00\x00"),
+    "next_track": (MEDIA_REPORT_MULTIMEDIA, b"\x10\x00\x00"),
+    "prev_track": (MEDIA_REPORT_MULTIMEDIA, b"\x20\x00\x00"),
+    "stop": (MEDIA_REPORT_MULTIMEDIA, b"\x40\x00\x00"),
+    "eject": (MEDIA_REPORT_MULTIMEDIA, b"\x80\x00\x00"),
+    # multimedia, second byte
+    "email": (MEDIA_REPORT_MULTIMEDIA, b"\x00\x01\x00"),
+    "www_search": (MEDIA_REPORT_MULTIMEDIA, b"\x00\x02\x00"),
+    "www_favorites": (MEDIA_REPORT_MULTIMEDIA, b"\x00\x04\x00"),
+    "www_home": (MEDIA_REPORT_MULTIMEDIA, b"\x00\x08\x00"),
+    "www_back": (MEDIA_REPORT_MULTIMEDIA, b"\x00\x10\x00"),
+    "www_forward": (MEDIA_REPORT_MULTIMEDIA, b"\x00\x20\x00"),
+    "www_stop": (MEDIA_REPORT_MULTIMEDIA, b"\x00\x40\x00"),
+    "refresh": (MEDIA_REPORT_MULTIMEDIA, b"\x00\x80\x00"),
+    # multimedia, third byte
+    "media": (MEDIA_REPORT_MULTIMEDIA, b"\x00\x00\x01"),
+    "explorer": (MEDIA_REPORT_MULTIMEDIA, b"\x00\x00\x02"),
+    "calculator": (MEDIA_REPORT_MULTIMEDIA, b"\x00\x00\x04"),
+    "screen_save": (MEDIA_REPORT_MULTIMEDIA, b"\x00\x00\x08"),
+    "my_computer": (MEDIA_REPORT_MULTIMEDIA, b"\x00\x00\x10"),
+    "minimize": (MEDIA_REPORT_MULTIMEDIA, b"\x00\x00\x20"),
+    "record": (MEDIA_REPORT_MULTIMEDIA, b"\x00\x00\x40"),
+    "rewind": (MEDIA_REPORT_MULTIMEDIA, b"\x00\x00\x80"),
+}
@@ -1,11 +1,23 @@
 import random
+import struct
 import time
 import typing
+from typing import List
+from typing import Optional
+from typing import Tuple
 
 from serial import Serial
 
 import pych9329.exceptions as exceptions
 import pych9329.frame_utils as frame_utils
+import pych9329.transport as transport
+from pych9329.scheduler import FrameScheduler
+
+try:
+    import numpy
+except ImportError:
+    # numpy is optional, paths are encoded in python without it
+    numpy = None
 
 MOUSE_BUTTON_NAME_MAP: typing.Final[dict[str, bytes]] = {
     "null": b"\x00",
@@ -26,6 +38,13 @@ MOUSE_BUTTON_NAME_MAP: typing.Final[dict[str, bytes]] = {
     "center": b"\x04",
 }
 
+ABSOLUTE_DATA_STRUCT = struct.Struct("<BBHHb")
+ABSOLUTE_DATA_ENCODER = frame_utils.FrameEncoder(b"\x04", ABSOLUTE_DATA_STRUCT.size)
+RELATIVE_DATA_STRUCT = struct.Struct("<BBbbb")
+RELATIVE_DATA_ENCODER = frame_utils.FrameEncoder(b"\x05", RELATIVE_DATA_STRUCT.size)
+# Largest distance a single relative report can move on each axis
+RELATIVE_STEP_LIMIT = 127
+
 
 def check_integer_range(value: int, minimum: int, maximum: int) -> bool:
     if value < minimum or value > maximum:
@@ -33,15 +52,14 @@ def check_integer_range(value: int, minimum: int, maximum: int) -> bool:
     return True
 
 
-def send_absolute_data(
-    serial_object: Serial,
+def create_absolute_data_frame(
     x: int,
     y: int,
     button_name: str = "null",
     x_max: int = 1920,
     y_max: int = 1080,
     wheel_value: int = 0,
-) -> None:
+) -> bytes:
     if not check_integer_range(x_max, 0, 4096):
         raise exceptions.InvalidCoordinateValue(
             "Max coordinate value should be between 0 and 4096"
@@ -50,27 +68,16 @@ def send_absolute_data(
         raise exceptions.InvalidCoordinateValue(
             "Max coordinate value should be between 0 and 4096"
         )
-    data_frame = frame_utils.DataFrame(
-        b"\x57\xab",
-        b"\x00",
-        b"\x04",
-        b"",
-        b"",
-    )
     # CMD_SEND_MS_ABS_DATA requires 7 bytes data
     # first byte is always 0x02
-    buffer = b"\x02"
-
     # second byte is mouse button value
-    buffer += MOUSE_BUTTON_NAME_MAP[button_name]
+    button_value = MOUSE_BUTTON_NAME_MAP[button_name][0]
 
     # third and fourth bytes are x-coordinates
     x_value = (4096 * x) // x_max
-    buffer += x_value.to_bytes(2, byteorder="little")
 
     # fifth and sixth bytes are y-coordinates
     y_value = (4096 * y) // y_max
-    buffer += y_value.to_bytes(2, byteorder="little")
 
     # seventh byte contains wheel data
     # If it is 0x00, it means there is no scrolling action
@@ -78,52 +85,62 @@ def send_absolute_data(
     # 0x81-0xFF, means scroll down
     if not check_integer_range(wheel_value, -128, 127):
         raise exceptions.InvalidWheelValue("Wheel value should be between -127 and 128")
-    buffer += wheel_value.to_bytes(1, byteorder="little", signed=True)
-    data_frame.set_data(buffer)
-    request_packet = data_frame.create_frame()
-    serial_object.write(request_packet)
+    data = ABSOLUTE_DATA_STRUCT.pack(0x02, button_value, x_value, y_value, wheel_value)
+    return ABSOLUTE_DATA_ENCODER.encode(data)
 
 
-def send_relative_data(
+def send_absolute_data(
     serial_object: Serial,
     x: int,
     y: int,
     button_name: str = "null",
+    x_max: int = 1920,
+    y_max: int = 1080,
     wheel_value: int = 0,
 ) -> None:
-    data_frame = frame_utils.DataFrame(
-        b"\x57\xab",
-        b"\x00",
-        b"\x05",
-        b"",
-        b"",
+    request_packet = create_absolute_data_frame(
+        x, y, button_name, x_max, y_max, wheel_value
     )
+    transport.write_packet(serial_object, request_packet)
+
+
+def create_relative_data_frame(
+    x: int,
+    y: int,
+    button_name: str = "null",
+    wheel_value: int = 0,
+) -> bytes:
     # CMD_SEND_MS_REL_DATA requires 5 bytes data
     # first byte is always 0x01
-    buffer = b"\x01"
-    buffer += MOUSE_BUTTON_NAME_MAP[button_name]
+    button_value = MOUSE_BUTTON_NAME_MAP[button_name][0]
 
     # x value
     if not check_integer_range(x, -128, 127):
         raise exceptions.InvalidCoordinateValue(
             "Coordinate value should be between -127 and 128"
         )
-    buffer += x.to_bytes(1, byteorder="little", signed=True)
     # y value
     if not check_integer_range(y, -128, 127):
         raise exceptions.InvalidCoordinateValue(
             "Coordinate value should be between -127 and 128"
         )
-    buffer += y.to_bytes(1, byteorder="little", signed=True)
-
     # wheel value
     if not check_integer_range(wheel_value, -128, 127):
         raise exceptions.InvalidWheelValue("Wheel value should be between -127 and 128")
-    buffer += wheel_value.to_bytes(1, byteorder="little", signed=True)
 
-    data_frame.set_data(buffer)
-    request_packet = data_frame.create_frame()
-    serial_object.write(request_packet)
+    data = RELATIVE_DATA_STRUCT.pack(0x01, button_value, x, y, wheel_value)
+    return RELATIVE_DATA_ENCODER.encode(data)
+
+
+def send_relative_data(
+    serial_object: Serial,
+    x: int,
+    y: int,
+    button_name: str = "null",
+    wheel_value: int = 0,
+) -> None:
+    request_packet = create_relative_data_frame(x, y, button_name, wheel_value)
+    transport.write_packet(serial_object, request_packet)
 
 
 def move(
@@ -135,11 +152,146 @@ def move(
     monitor_height: int = 1080,
 ) -> None:
     if relative_mode:
-        send_relative_data(serial_object, x, y, "null")
+        move_relative(serial_object, x, y, "null")
     else:
         send_absolute_data(serial_object, x, y, "null", monitor_width, monitor_height)
 
 
+def create_absolute_path_frames_numpy(
+    xs: typing.Any, ys: typing.Any, button_value: int, x_max: int, y_max: int
+) -> bytearray:
+    x = numpy.clip(numpy.asarray(xs).astype(numpy.int64), 0, x_max)
+    y = numpy.clip(numpy.asarray(ys).astype(numpy.int64), 0, y_max)
+    x_value = (4096 * x) // x_max
+    y_value = (4096 * y) // y_max
+    encoder = ABSOLUTE_DATA_ENCODER
+    buffer = bytearray(len(x) * encoder.frame_length)
+    # rows of the array are the frames inside buffer
+    frames = numpy.frombuffer(buffer, dtype=numpy.uint8).reshape(
+        len(x), encoder.frame_length
+    )
+    frames[:, :5] = numpy.frombuffer(encoder.template, dtype=numpy.uint8)
+    frames[:, 5] = 0x02
+    frames[:, 6] = button_value
+    frames[:, 7] = x_value & 0xFF
+    frames[:, 8] = x_value >> 8
+    frames[:, 9] = y_value & 0xFF
+    frames[:, 10] = y_value >> 8
+    frames[:, 11] = 0
+    checksum = frames[:, 5:12].sum(axis=1, dtype=numpy.uint32) + encoder.header_sum
+    frames[:, 12] = checksum & 0xFF
+    return buffer
+
+
+def create_absolute_path_frames(
+    xs: typing.Any,
+    ys: typing.Any = None,
+    button_name: str = "null",
+    x_max: int = 1920,
+    y_max: int = 1080,
+) -> bytearray:
+    # xs and ys are sequences or numpy arrays of coordinates,
+    # without ys xs is a sequence of (x, y) points.
+    # Coordinates outside the screen are clamped to its border.
+    if not check_integer_range(x_max, 0, 4096):
+        raise exceptions.InvalidCoordinateValue(
+            "Max coordinate value should be between 0 and 4096"
+        )
+    if not check_integer_range(y_max, 0, 4096):
+        raise exceptions.InvalidCoordinateValue(
+            "Max coordinate value should be between 0 and 4096"
+        )
+    button_value = MOUSE_BUTTON_NAME_MAP[button_name][0]
+    if ys is None:
+        points = list(xs)
+        xs = [point[0] for point in points]
+        ys = [point[1] for point in points]
+    if len(xs) != len(ys):
+        raise exceptions.InvalidCoordinateValue(
+            "x and y coordinates should have the same length"
+        )
+    if numpy is not None:
+        return create_absolute_path_frames_numpy(xs, ys, button_value, x_max, y_max)
+    encoder = ABSOLUTE_DATA_ENCODER
+    buffer = bytearray(len(xs) * encoder.frame_length)
+    offset = 0
+    for x, y in zip(xs, ys):
+        x_value = (4096 * min(max(int(x), 0), x_max)) // x_max
+        y_value = (4096 * min(max(int(y), 0), y_max)) // y_max
+        data = ABSOLUTE_DATA_STRUCT.pack(0x02, button_value, x_value, y_value, 0)
+        offset = encoder.encode_into(buffer, offset, data)
+    return buffer
+
+
+def move_path(
+    serial_object: Serial,
+    xs: typing.Any,
+    ys: typing.Any = None,
+    button_name: str = "null",
+    monitor_width: int = 1920,
+    monitor_height: int = 1080,
+    interval: float = 0.0,
+    frames_per_write: Optional[int] = None,
+) -> None:
+    # Move through every point of the path, one point per interval seconds
+    buffer = create_absolute_path_frames(
+        xs, ys, button_name, monitor_width, monitor_height
+    )
+    transport.send_frames(
+        serial_object,
+        buffer,
+        ABSOLUTE_DATA_ENCODER.frame_length,
+        interval,
+        frames_per_write,
+    )
+
+
+def split_relative_move(dx: int, dy: int) -> List[Tuple[int, int]]:
+    # Fewest steps that keep both axes within a relative report,
+    # the distance is spread evenly over the steps.
+    step_count = max(
+        -(-abs(dx) // RELATIVE_STEP_LIMIT), -(-abs(dy) // RELATIVE_STEP_LIMIT), 1
+    )
+    steps = []
+    for index in range(step_count):
+        step_x = dx * (index + 1) // step_count - dx * index // step_count
+        step_y = dy * (index + 1) // step_count - dy * index // step_count
+        steps.append((step_x, step_y))
+    return steps
+
+
+def create_relative_move_frames(
+    dx: int, dy: int, button_name: str = "null"
+) -> bytearray:
+    steps = split_relative_move(dx, dy)
+    encoder = RELATIVE_DATA_ENCODER
+    button_value = MOUSE_BUTTON_NAME_MAP[button_name][0]
+    buffer = bytearray(len(steps) * encoder.frame_length)
+    offset = 0
+    for step_x, step_y in steps:
+        data = RELATIVE_DATA_STRUCT.pack(0x01, button_value, step_x, step_y, 0)
+        offset = encoder.encode_into(buffer, offset, data)
+    return buffer
+
+
+def move_relative(
+    serial_object: Serial,
+    dx: int,
+    dy: int,
+    button_name: str = "null",
+    interval: float = 0.0,
+    frames_per_write: Optional[int] = None,
+) -> None:
+    buffer = create_relative_move_frames(dx, dy, button_name)
+    transport.send_frames(
+        serial_object,
+        buffer,
+        RELATIVE_DATA_ENCODER.frame_length,
+        interval,
+        frames_per_write,
+    )
+
+
 def press(serial_object: Serial, button_name: str = "left") -> None:
     send_relative_data(serial_object, 0, 0, button_name, 0)
 
@@ -148,10 +300,24 @@ def release(serial_object: Serial) -> None:
     send_relative_data(serial_object, 0, 0, "null", 0)
 
 
-def click(serial_object: Serial, button_name: str = "left") -> None:
-    press(serial_object, button_name)
+def click(
+    serial_object: Serial,
+    button_name: str = "left",
+    scheduler: Optional[FrameScheduler] = None,
+) -> None:
     # 100 to 400 milliseconds delay for simulating natural behavior
     sleep_time = random.uniform(0.20, 0.40)
+    if scheduler is not None:
+        # queue both reports and return immediately
+        scheduler.schedule_sequence(
+            serial_object,
+            [
+                (0.0, create_relative_data_frame(0, 0, button_name, 0)),
+                (sleep_time, create_relative_data_frame(0, 0, "null", 0)),
+            ],
+        )
+        return
+    press(serial_object, button_name)
     time.sleep(sleep_time)
     release(serial_object)
 
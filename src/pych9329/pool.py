@@ -0,0 +1,214 @@
+import concurrent.futures
+import queue
+import threading
+from concurrent.futures import Future
+from dataclasses import dataclass
+from dataclasses import field
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Optional
+
+from serial import Serial
+
+import pych9329.exceptions as exceptions
+import pych9329.transport as transport
+
+
+@dataclass
+class PoolResult:
+    completed: Dict[str, Any] = field(default_factory=dict)
+    failed: Dict[str, BaseException] = field(default_factory=dict)
+    # devices whose work was still pending when the wait timed out
+    pending: List[str] = field(default_factory=list)
+
+    @property
+    def success(self) -> bool:
+        return not self.failed and not self.pending
+
+
+class DeviceWorker:
+    # One writer thread per port, so a slow port only delays its own queue
+    def __init__(self, name: str, serial_object: Serial, queue_size: int = 256):
+        self.name = name
+        self.serial_object = serial_object
+        self.queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.thread = threading.Thread(
+            target=self.run, name="pych9329-pool-%s" % name, daemon=True
+        )
+        self.completed_count = 0
+        self.failed_count = 0
+        self.thread.start()
+
+    def submit(
+        self,
+        function: Callable[..., Any],
+        args: tuple,
+        block: bool = False,
+        timeout: Optional[float] = None,
+    ) -> Future:
+        future: Future = Future()
+        try:
+            self.queue.put((future, function, args), block, timeout)
+        except queue.Full:
+            future.set_exception(exceptions.DeviceBusy(self.name))
+        return future
+
+    def run(self) -> None:
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            future, function, args = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                result = function(self.serial_object, *args)
+            except BaseException as err:
+                self.failed_count += 1
+                future.set_exception(err)
+            else:
+                self.completed_count += 1
+                future.set_result(result)
+
+    def stop(self) -> None:
+        # work queued before stop is still done
+        self.queue.put(None)
+        self.thread.join()
+
+
+class DevicePool:
+    def __init__(self, queue_size: int = 256):
+        self.queue_size = queue_size
+        self.workers: Dict[str, DeviceWorker] = {}
+        self.lock = threading.Lock()
+
+    def __enter__(self) -> "DevicePool":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self.workers)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.workers
+
+    def add(self, name: str, serial_object: Serial) -> None:
+        with self.lock:
+            if name in self.workers:
+                raise KeyError("device %s already exists" % name)
+            self.workers[name] = DeviceWorker(name, serial_object, self.queue_size)
+
+    def remove(self, name: str) -> Serial:
+        with self.lock:
+            worker = self.workers.pop(name)
+        worker.stop()
+        return worker.serial_object
+
+    def get_names(self) -> List[str]:
+        return list(self.workers)
+
+    def get_serial(self, name: str) -> Serial:
+        return self.workers[name].serial_object
+
+    def select(self, names: Optional[Iterable[str]] = None) -> List[DeviceWorker]:
+        with self.lock:
+            if names is None:
+                return list(self.workers.values())
+            return [self.workers[name] for name in names]
+
+    def submit(
+        self,
+        name: str,
+        function: Callable[..., Any],
+        *args: Any,
+        block: bool = False,
+        timeout: Optional[float] = None,
+    ) -> Future:
+        # function is called as function(serial_object, *args) on the
+        # writer thread of the device, e.g. keyboard.trigger
+        return self.select([name])[0].submit(function, args, block, timeout)
+
+    def send(self, name: str, frame: bytes, **kwargs: Any) -> Future:
+        return self.submit(name, transport.write_frame, frame, **kwargs)
+
+    def broadcast_call(
+        self,
+        function: Callable[..., Any],
+        *args: Any,
+        names: Optional[Iterable[str]] = None,
+        block: bool = False,
+        timeout: Optional[float] = None,
+    ) -> Dict[str, Future]:
+        # A full queue fails the future of that device with DeviceBusy
+        # instead of blocking the others, unless block is set.
+        return {
+            worker.name: worker.submit(function, args, block, timeout)
+            for worker in self.select(names)
+        }
+
+    def broadcast(
+        self,
+        frame: bytes,
+        names: Optional[Iterable[str]] = None,
+        block: bool = False,
+        timeout: Optional[float] = None,
+    ) -> Dict[str, Future]:
+        # frame is written as is, precompile it once with e.g.
+        # keyboard.get_trigger_frame or mouse.create_absolute_data_frame
+        return self.broadcast_call(
+            transport.write_frame, frame, names=names, block=block, timeout=timeout
+        )
+
+    def broadcast_frames(
+        self,
+        buffer: bytes,
+        frame_length: int,
+        interval: float = 0.0,
+        names: Optional[Iterable[str]] = None,
+    ) -> Dict[str, Future]:
+        return self.broadcast_call(
+            transport.send_frames, buffer, frame_length, interval, names=names
+        )
+
+    @staticmethod
+    def gather(
+        futures: Dict[str, Future], timeout: Optional[float] = None
+    ) -> PoolResult:
+        result = PoolResult()
+        concurrent.futures.wait(futures.values(), timeout)
+        for name, future in futures.items():
+            if not future.done():
+                result.pending.append(name)
+            elif future.exception() is not None:
+                result.failed[name] = future.exception()
+            else:
+                result.completed[name] = future.result()
+        return result
+
+    def get_statistics(self) -> Dict[str, Dict[str, int]]:
+        return {
+            worker.name: {
+                "queued_count": worker.queue.qsize(),
+                "completed_count": worker.completed_count,
+                "failed_count": worker.failed_count,
+            }
+            for worker in self.select()
+        }
+
+    def close(self, close_serial: bool = False) -> None:
+        with self.lock:
+            workers = list(self.workers.values())
+            self.workers.clear()
+        for worker in workers:
+            worker.stop()
+            if close_serial:
+                worker.serial_object.close()
+
+
+if __name__ == "__main__":
+    pass
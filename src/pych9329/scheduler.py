@@ -0,0 +1,183 @@
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+from serial import Serial
+
+import pych9329.transport as transport
+
+# The last SPIN_THRESHOLD seconds before a deadline are busy waited,
+# sleeping alone wakes up too late on most systems.
+SPIN_THRESHOLD = 0.002
+
+
+def spin_until(deadline: float) -> None:
+    # yields the GIL while spinning so other threads keep running
+    while time.monotonic() < deadline:
+        time.sleep(0)
+
+
+def sleep_until(deadline: float, spin_threshold: float = SPIN_THRESHOLD) -> None:
+    remaining = deadline - time.monotonic()
+    if remaining > spin_threshold:
+        time.sleep(remaining - spin_threshold)
+    spin_until(deadline)
+
+
+class FrameScheduler:
+    # A timeline of (monotonic deadline, frame) events sent by one
+    # dispatcher thread, callers enqueue and return immediately.
+    def __init__(self, spin_threshold: float = SPIN_THRESHOLD, sample_size: int = 1024):
+        self.spin_threshold = spin_threshold
+        self.events: List[Tuple[float, int, Serial, bytes]] = []
+        self.sequence = itertools.count()
+        self.condition = threading.Condition()
+        self.thread: Optional[threading.Thread] = None
+        self.running = False
+        self.busy = False
+        self.sent_count = 0
+        self.error_count = 0
+        self.last_error: Optional[Exception] = None
+        self.lateness_total = 0.0
+        self.lateness_max = 0.0
+        self.lateness_samples: deque = deque(maxlen=sample_size)
+
+    def __enter__(self) -> "FrameScheduler":
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.stop()
+
+    def start(self) -> None:
+        with self.condition:
+            if self.running:
+                return
+            self.running = True
+        self.thread = threading.Thread(
+            target=self.run, name="pych9329-scheduler", daemon=True
+        )
+        self.thread.start()
+
+    def stop(self, drain: bool = True) -> None:
+        # With drain the pending events are still sent before stopping
+        if drain:
+            self.wait_idle()
+        with self.condition:
+            self.running = False
+            self.events.clear()
+            self.condition.notify_all()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def schedule(self, serial_object: Serial, frame: bytes, deadline: float) -> None:
+        with self.condition:
+            heapq.heappush(
+                self.events, (deadline, next(self.sequence), serial_object, frame)
+            )
+            self.condition.notify_all()
+
+    def schedule_after(
+        self, serial_object: Serial, frame: bytes, delay: float = 0.0
+    ) -> float:
+        deadline = time.monotonic() + delay
+        self.schedule(serial_object, frame, deadline)
+        return deadline
+
+    def schedule_sequence(
+        self,
+        serial_object: Serial,
+        timeline: Iterable[Tuple[float, bytes]],
+        start_time: Optional[float] = None,
+    ) -> float:
+        # timeline holds (offset from start_time, frame) pairs,
+        # returns the deadline of the last frame.
+        if start_time is None:
+            start_time = time.monotonic()
+        deadline = start_time
+        with self.condition:
+            for offset, frame in timeline:
+                deadline = start_time + offset
+                heapq.heappush(
+                    self.events, (deadline, next(self.sequence), serial_object, frame)
+                )
+            self.condition.notify_all()
+        return deadline
+
+    def pending(self) -> int:
+        with self.condition:
+            return len(self.events)
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        with self.condition:
+            return self.condition.wait_for(
+                lambda: (not self.events and not self.busy) or not self.running,
+                timeout,
+            )
+
+    def run(self) -> None:
+        while True:
+            with self.condition:
+                while self.running and not self.events:
+                    self.condition.wait()
+                if not self.running:
+                    return
+                deadline = self.events[0][0]
+                remaining = deadline - time.monotonic()
+                if remaining > self.spin_threshold:
+                    # an earlier event may be scheduled meanwhile
+                    self.condition.wait(remaining - self.spin_threshold)
+                    continue
+            spin_until(deadline)
+            with self.condition:
+                if not self.events:
+                    continue
+                deadline, _, serial_object, frame = heapq.heappop(self.events)
+                self.busy = True
+            lateness = time.monotonic() - deadline
+            try:
+                transport.write_packet(serial_object, frame)
+            except Exception as err:
+                # failed writes are not part of the lateness statistics
+                self.error_count += 1
+                self.last_error = err
+            else:
+                self.sent_count += 1
+                self.lateness_total += lateness
+                self.lateness_max = max(self.lateness_max, lateness)
+                self.lateness_samples.append(lateness)
+            with self.condition:
+                self.busy = False
+                if not self.events:
+                    self.condition.notify_all()
+
+    def get_statistics(self) -> Dict[str, float]:
+        samples = sorted(self.lateness_samples)
+        if samples:
+            lateness_p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+        else:
+            lateness_p99 = 0.0
+        if self.sent_count:
+            lateness_mean = self.lateness_total / self.sent_count
+        else:
+            lateness_mean = 0.0
+        return {
+            "sent_count": self.sent_count,
+            "error_count": self.error_count,
+            "pending_count": len(self.events),
+            "lateness_mean": lateness_mean,
+            "lateness_max": self.lateness_max,
+            "lateness_p99": lateness_p99,
+        }
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,137 @@
+import threading
+import time
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import Optional
+from typing import Tuple
+
+from serial import Serial
+
+import pych9329.chip_command as chip_command
+from pych9329.chip_command import ChipParameter
+from pych9329.chip_command import USBStringSubCommand
+
+PARAMETERS_CACHE_KEY = "parameters"
+
+
+class CH9329Session:
+    # Wraps a port and caches what the chip only changes when told to:
+    # the parameter block and the usb strings. Entries expire after ttl
+    # seconds, None keeps them until invalidate() or a reset.
+    def __init__(
+        self,
+        serial_object: Serial,
+        ttl: Optional[float] = None,
+        timeout: Optional[float] = None,
+    ):
+        self.serial_object = serial_object
+        self.ttl = ttl
+        self.timeout = timeout
+        self.cache: Dict[Any, Tuple[float, Any]] = {}
+        self.lock = threading.RLock()
+        self.hit_count = 0
+        self.miss_count = 0
+
+    def lookup(self, key: Any, load: Callable[[], Any]) -> Any:
+        with self.lock:
+            entry = self.cache.get(key)
+            if entry is not None:
+                stored_time, value = entry
+                if self.ttl is None or time.monotonic() - stored_time < self.ttl:
+                    self.hit_count += 1
+                    return value
+            self.miss_count += 1
+            value = load()
+            self.store(key, value)
+            return value
+
+    def store(self, key: Any, value: Any) -> None:
+        with self.lock:
+            self.cache[key] = (time.monotonic(), value)
+
+    def invalidate(self, key: Any = None) -> None:
+        with self.lock:
+            if key is None:
+                self.cache.clear()
+            else:
+                self.cache.pop(key, None)
+
+    def get_statistics(self) -> Dict[str, int]:
+        return {
+            "hit_count": self.hit_count,
+            "miss_count": self.miss_count,
+            "cached_count": len(self.cache),
+        }
+
+    def get_chip_parameters(self) -> ChipParameter:
+        # The same object is returned on every hit, pass changes to
+        # set_chip_parameters or call invalidate() after editing it.
+        return self.lookup(
+            PARAMETERS_CACHE_KEY,
+            lambda: chip_command.get_chip_parameters(self.serial_object, self.timeout),
+        )
+
+    def set_chip_parameters(self, parameter: ChipParameter) -> bool:
+        with self.lock:
+            result = chip_command.set_chip_parameters(
+                self.serial_object, parameter, self.timeout
+            )
+            if result:
+                self.store(PARAMETERS_CACHE_KEY, parameter)
+            else:
+                self.invalidate(PARAMETERS_CACHE_KEY)
+            return result
+
+    def get_usb_string_info(self, sub_command: bytes) -> str:
+        return self.lookup(
+            sub_command,
+            lambda: chip_command.get_usb_string_info(
+                self.serial_object, sub_command, self.timeout
+            ),
+        )
+
+    def set_usb_string_info(self, sub_command: bytes, string_info: str) -> bool:
+        with self.lock:
+            result = chip_command.set_usb_string_info(
+                self.serial_object, sub_command, string_info, self.timeout
+            )
+            if result:
+                self.store(sub_command, string_info)
+            else:
+                self.invalidate(sub_command)
+            return result
+
+    def get_serial_number(self) -> str:
+        return self.get_usb_string_info(USBStringSubCommand.SERIAL_NUMBER.value)
+
+    def set_serial_number(self, string_data: str) -> bool:
+        return self.set_usb_string_info(
+            USBStringSubCommand.SERIAL_NUMBER.value, string_data
+        )
+
+    def get_manufacturer(self) -> str:
+        return self.get_usb_string_info(USBStringSubCommand.MANUFACTURER.value)
+
+    def set_manufacturer(self, string_data: str) -> bool:
+        return self.set_usb_string_info(
+            USBStringSubCommand.MANUFACTURER.value, string_data
+        )
+
+    def get_product(self) -> str:
+        return self.get_usb_string_info(USBStringSubCommand.PRODUCT.value)
+
+    def set_product(self, string_data: str) -> bool:
+        return self.set_usb_string_info(USBStringSubCommand.PRODUCT.value, string_data)
+
+    def send_command_reset(self) -> None:
+        self.invalidate()
+        chip_command.send_command_reset(self.serial_object)
+
+    def send_command_restore_factory_config(self) -> None:
+        self.invalidate()
+        chip_command.send_command_restore_factory_config(self.serial_object)
+
+
+if __name__ == "__main__":
+    pass
@@ -1,80 +1,230 @@
+import keyword
 import struct
 import typing
-import pych9329.exceptions as exceptions
+from collections.abc import MutableMapping
 from typing import Any
+from typing import Iterator
+
+import pych9329.exceptions as exceptions
+
+BYTE_ORDER_CHARS = "<>!@="
+# Format characters whose layout does not depend on byte order
+BYTE_ORDER_NEUTRAL_CHARS = "xcbB?sp0123456789"
+
+
+def split_byte_order(field_format: str) -> tuple[str, str]:
+    if field_format.startswith(tuple(BYTE_ORDER_CHARS)):
+        return field_format[0], field_format[1:]
+    return "@", field_format
+
+
+def group_fields(fields: list) -> list[tuple[str, list]]:
+    # Consecutive fields with the same byte order share one struct.Struct
+    groups: list[tuple[str, list]] = []
+    group_order = None
+    group_list: list = []
+
+    def flush_group():
+        nonlocal group_order, group_list
+        if group_list:
+            groups.append((group_order or "=", group_list))
+        group_order = None
+        group_list = []
+
+    for field_format, field_name in fields:
+        byte_order, body = split_byte_order(field_format)
+        field_size = struct.calcsize(byte_order + body)
+        value_count = len(struct.unpack(byte_order + body, bytes(field_size)))
+        # e.g. "4c" is loaded as one bytes value
+        join = value_count > 1 and value_count == field_size
+        field = (body, field_name, value_count, join)
+        if all(char in BYTE_ORDER_NEUTRAL_CHARS for char in body):
+            # joins any group, fields are never padded against each other
+            group_list.append(field)
+            continue
+        if byte_order == "@":
+            # native fields are aligned inside a format,
+            # keep them alone so no padding is added between fields
+            flush_group()
+            group_order = byte_order
+            group_list.append(field)
+            flush_group()
+            continue
+        if group_order is not None and group_order != byte_order:
+            flush_group()
+        group_order = byte_order
+        group_list.append(field)
+    flush_group()
+    return groups
+
+
+def compile_fields(fields: list) -> tuple[int, Any, Any]:
+    # Generate load and save functions doing one unpack_from
+    # and one pack_into per group, like dataclasses generates __init__.
+    namespace: dict[str, Any] = {}
+    load_lines = ["def load(obj, buffer, offset):"]
+    save_lines = ["def save(obj, buffer, offset):"]
+    offset = 0
+    groups = group_fields(fields)
+    for group_index, (byte_order, group_list) in enumerate(groups):
+        codec_name = "codec_%d" % group_index
+        codec = struct.Struct(byte_order + "".join(f[0] for f in group_list))
+        namespace[codec_name] = codec
+        unpack = "%s.unpack_from(buffer, offset + %d)" % (codec_name, offset)
+        if all(value_count == 1 for _, _, value_count, _ in group_list):
+            targets = "".join("obj.%s, " % f[1] for f in group_list)
+            load_lines.append("    %s= %s" % (targets, unpack))
+        else:
+            load_lines.append("    values = %s" % unpack)
+            index = 0
+            for _, field_name, value_count, join in group_list:
+                if value_count == 1:
+                    value = "values[%d]" % index
+                elif join:
+                    value = 'b"".join(values[%d:%d])' % (index, index + value_count)
+                else:
+                    value = "values[%d:%d]" % (index, index + value_count)
+                load_lines.append("    obj.%s = %s" % (field_name, value))
+                index += value_count
+        arguments = []
+        for _, field_name, value_count, join in group_list:
+            if value_count == 1:
+                arguments.append("obj.%s" % field_name)
+            elif join:
+                arguments.append("*split_bytes(obj.%s)" % field_name)
+            else:
+                arguments.append("*obj.%s" % field_name)
+        save_lines.append(
+            "    %s.pack_into(buffer, offset + %d, %s)"
+            % (codec_name, offset, ", ".join(arguments))
+        )
+        offset += codec.size
+    load_lines.append("    pass")
+    save_lines.append("    pass")
+    namespace["split_bytes"] = split_bytes
+    exec("\n".join(load_lines + save_lines), namespace)
+    return offset, namespace["load"], namespace["save"]
+
+
+def split_bytes(value: bytes) -> list[bytes]:
+    return [value[index : index + 1] for index in range(len(value))]
+
+
+def check_field_names(bases: tuple[type, ...], cls_dict: dict[str, Any]) -> None:
+    # Fields are slots of the instance, a field named like a method or
+    # like buffer and offset would replace it.
+    field_names = [field_name for _, field_name in cls_dict.get("_fields_", [])]
+    reserved = set(cls_dict) - {"_fields_"}
+    for base in bases:
+        for klass in base.__mro__:
+            base_fields = {name for _, name in klass.__dict__.get("_fields_", [])}
+            reserved.update(set(vars(klass)) - base_fields)
+            reserved.update(set(getattr(klass, "__slots__", ())) - base_fields)
+    for field_name in field_names:
+        if not field_name.isidentifier() or keyword.iskeyword(field_name):
+            raise exceptions.InvalidFieldName(field_name)
+        if field_name in reserved or field_name.startswith("__"):
+            raise exceptions.InvalidFieldName(field_name)
+    if len(set(field_names)) != len(field_names):
+        raise exceptions.InvalidFieldName("duplicate field name")
 
 
 class StructureMeta(type):
-    def __init__(
-        cls, _cls_name: str, _bases: tuple[type, ...], _cls_dict: dict[str, Any]
-    ):
-        super().__init__(cls)
+    def __new__(mcs, cls_name: str, bases: tuple[type, ...], cls_dict: dict[str, Any]):
+        check_field_names(bases, cls_dict)
+        if "__slots__" not in cls_dict:
+            inherited = set()
+            for base in bases:
+                for klass in base.__mro__:
+                    inherited.update(getattr(klass, "__slots__", ()))
+            fields = cls_dict.get("_fields_", [])
+            cls_dict["__slots__"] = tuple(
+                field_name for _, field_name in fields if field_name not in inherited
+            )
+        return super().__new__(mcs, cls_name, bases, cls_dict)
+
+    def __init__(cls, cls_name: str, bases: tuple[type, ...], cls_dict: dict[str, Any]):
+        super().__init__(cls_name, bases, cls_dict)
         fields = getattr(cls, "_fields_", [])
+        struct_size, load_function, save_function = compile_fields(fields)
+        setattr(cls, "_fields_struct_size_", struct_size)
+        setattr(cls, "_load_", staticmethod(load_function))
+        setattr(cls, "_save_", staticmethod(save_function))
 
-        offset = 0
-        for field_format, field_name in fields:
-            if field_format.startswith(("<", ">", "!", "@")):
-                byte_order = field_format[0]
-                field_format = field_format[1:]
-            else:
-                byte_order = ""
-            field_format = byte_order + field_format
-            offset += struct.calcsize(field_format)
-        setattr(cls, "_fields_struct_size_", offset)
+
+class StructureAttribute(MutableMapping):
+    # dict style access to the fields of a structure
+    def __init__(self, structure: "Structure"):
+        self.structure = structure
+
+    def __getitem__(self, key: str) -> Any:
+        try:
+            return getattr(self.structure, key)
+        except AttributeError:
+            raise KeyError(key)
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        setattr(self.structure, key, value)
+
+    def __delitem__(self, key: str) -> None:
+        delattr(self.structure, key)
+
+    def __iter__(self) -> Iterator[str]:
+        for _, field_name in self.structure._fields_:
+            if hasattr(self.structure, field_name):
+                yield field_name
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
 
 
 class Structure(metaclass=StructureMeta):
-    def __init__(self, data: bytes):
+    __slots__ = ("buffer", "offset")
+
+    def __init__(self, data: bytes, offset: int = 0):
         self.buffer = data
-        self.attribute = dict()
+        self.offset = offset
         self.load()
 
+    @property
+    def attribute(self) -> StructureAttribute:
+        return StructureAttribute(self)
+
     def load(self):
-        fields = self._fields_
-        offset = 0
-        for field_format, field_name in fields:
-            field_length = struct.calcsize(field_format)
-            field_data = struct.unpack_from(field_format, self.buffer, offset)
-            if len(field_data) == 1:
-                self.attribute[field_name] = field_data[0]
-            elif len(field_data) == field_length:
-                buffer = bytearray()
-                for item in field_data:
-                    buffer += item
-                self.attribute[field_name] = bytes(buffer)
-            else:
-                self.attribute[field_name] = None
-            offset += struct.calcsize(field_format)
+        self._load_(self, self.buffer, self.offset)
+
+    def save_into(self, buffer: bytearray, offset: int = 0) -> None:
+        if len(buffer) - offset < self._fields_struct_size_:
+            raise exceptions.BufferTooSmall()
+        self._save_(self, buffer, offset)
 
     def save(self):
-        fields = self._fields_
-        binary_data = bytearray()
-        for field_format, field_name in fields:
-            field_data = self.attribute[field_name]
-            field_bytes = struct.pack(field_format, field_data)
-            binary_data += bytearray(field_bytes)
-        self.buffer = bytes(binary_data)
+        buffer = bytearray(self._fields_struct_size_)
+        self.save_into(buffer)
+        self.buffer = buffer
+        self.offset = 0
 
     def get(self, key: str) -> Any:
-        data = self.attribute.get(key, None)
+        data = getattr(self, key, None)
         return data
 
     def set(self, key: str, value: Any) -> None:
-        self.attribute[key] = value
+        setattr(self, key, value)
 
-    def buffer_load(self, buffer: bytes) -> None:
+    def buffer_load(self, buffer: bytes, offset: int = 0) -> None:
         self.buffer = buffer
-        self.attribute.clear()
+        self.offset = offset
         self.load()
 
     def buffer_flush(self) -> None:
         self.save()
 
     @classmethod
-    def from_buffer(cls, buffer: bytes):
-        buffer_len = len(buffer)
+    def from_buffer(cls, buffer: bytes, offset: int = 0):
+        # buffer may be a memoryview, fields are unpacked without copying it
+        buffer_len = len(buffer) - offset
         if buffer_len >= cls._fields_struct_size_:
-            return cls(buffer)
+            return cls(buffer, offset)
         else:
             raise exceptions.BufferTooSmall()
 
@@ -0,0 +1,444 @@
+import random
+import threading
+import time
+import weakref
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import Optional
+from typing import Tuple
+from typing import Type
+
+from serial import Serial
+
+import pych9329.capture as capture
+import pych9329.exceptions as exceptions
+import pych9329.frame_utils as frame_utils
+import pych9329.instrumentation as instrumentation
+
+# Used when the serial object has no usable timeout of its own
+DEFAULT_REPLY_TIMEOUT = 0.5
+# After a corrupted frame the reply is only waited for this many
+# frames of maximum length, then ChecksumError is raised
+CHECKSUM_GRACE_FRAMES = 2
+# A read of a reply may end this much after its deadline,
+# so the port timeout is not reconfigured for every read
+READ_TIMEOUT_SLACK = 0.005
+
+# Data length of the reply to each command, GET_USB_STRING is the longest
+# possible string. Unknown commands assume the maximum frame.
+REPLY_DATA_LENGTHS: Dict[int, int] = {
+    frame_utils.CommandCode.GET_INFO.value[0]: 8,
+    frame_utils.CommandCode.SEND_KB_GENERAL_DATA.value[0]: 1,
+    frame_utils.CommandCode.SEND_KB_MEDIA_DATA.value[0]: 1,
+    frame_utils.CommandCode.SEND_MS_ABS_DATA.value[0]: 1,
+    frame_utils.CommandCode.SEND_MS_REL_DATA.value[0]: 1,
+    frame_utils.CommandCode.SEND_MY_HID_DATA.value[0]: 1,
+    frame_utils.CommandCode.GET_PARA_CFG.value[0]: 50,
+    frame_utils.CommandCode.SET_PARA_CFG.value[0]: 1,
+    frame_utils.CommandCode.GET_USB_STRING.value[0]: 25,
+    frame_utils.CommandCode.SET_USB_STRING.value[0]: 1,
+    frame_utils.CommandCode.SET_DEFAULT_CFG.value[0]: 1,
+    frame_utils.CommandCode.RESET.value[0]: 1,
+}
+# Number of leading request data bytes the reply repeats, a late reply
+# to an earlier request for another USB string is told apart by them
+REPLY_ECHO_LENGTHS: Dict[int, int] = {
+    frame_utils.CommandCode.GET_USB_STRING.value[0]: 1,
+}
+
+# Exception raised for the status byte of an error reply
+STATUS_EXCEPTIONS = {
+    frame_utils.DataFrameStatus.ERROR_TIMEOUT.value: exceptions.ReceiveTimeoutError,
+    frame_utils.DataFrameStatus.ERROR_HEAD.value: exceptions.HeadError,
+    frame_utils.DataFrameStatus.ERROR_CMD.value: exceptions.CommandError,
+    frame_utils.DataFrameStatus.ERROR_SUM.value: exceptions.ChecksumError,
+    frame_utils.DataFrameStatus.ERROR_PARA.value: exceptions.ParameterError,
+    frame_utils.DataFrameStatus.ERROR_OPERATE.value: exceptions.OperateError,
+}
+# Errors a noisy line causes, sending the request again can succeed
+TRANSIENT_ERRORS: Tuple[Type[Exception], ...] = (
+    exceptions.ReplyTimeout,
+    exceptions.ReceiveTimeoutError,
+    exceptions.HeadError,
+    exceptions.ChecksumError,
+)
+
+
+def get_reply_timeout(serial_object: Serial) -> float:
+    timeout = serial_object.timeout
+    if not timeout:
+        return DEFAULT_REPLY_TIMEOUT
+    return timeout
+
+
+def write_packet(serial_object: Serial, packet: bytes) -> None:
+    # write without waiting for the line, used for keyboard and mouse frames
+    if capture.CAPTURE_WRITER is not None:
+        capture.CAPTURE_WRITER.record(serial_object, capture.DIRECTION_OUT, packet)
+    if instrumentation.ENABLED:
+        start_time = time.perf_counter()
+        serial_object.write(packet)
+        instrumentation.record_write(
+            serial_object, packet, time.perf_counter() - start_time
+        )
+        return
+    serial_object.write(packet)
+
+
+def write_frame(serial_object: Serial, packet: bytes) -> None:
+    if capture.CAPTURE_WRITER is not None:
+        capture.CAPTURE_WRITER.record(serial_object, capture.DIRECTION_OUT, packet)
+    if instrumentation.ENABLED:
+        start_time = time.perf_counter()
+        serial_object.write(packet)
+        serial_object.flush()
+        instrumentation.record_write(
+            serial_object, packet, time.perf_counter() - start_time
+        )
+        return
+    serial_object.write(packet)
+    serial_object.flush()
+
+
+def read_packet(serial_object: Serial, size: int) -> bytes:
+    data = serial_object.read(size)
+    if data and capture.CAPTURE_WRITER is not None:
+        capture.CAPTURE_WRITER.record(serial_object, capture.DIRECTION_IN, data)
+    return data
+
+
+def write_paced(
+    serial_object: Serial,
+    buffer: bytes,
+    frame_length: int,
+    frame_interval: float,
+    frames_per_write: int,
+) -> None:
+    # buffer holds frames of equal length, frames_per_write of them are
+    # written at once and every write starts at its own deadline,
+    # so the overall rate is one frame per frame_interval without drift.
+    view = memoryview(buffer)
+    frame_count = len(buffer) // frame_length
+    chunk_length = frame_length * frames_per_write
+    start_time = time.monotonic()
+    for index in range(0, frame_count, frames_per_write):
+        delay = start_time + index * frame_interval - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        offset = index * frame_length
+        chunk = view[offset : offset + chunk_length]
+        if capture.CAPTURE_WRITER is not None:
+            capture.CAPTURE_WRITER.record(serial_object, capture.DIRECTION_OUT, chunk)
+        serial_object.write(chunk)
+    serial_object.flush()
+    if instrumentation.ENABLED:
+        instrumentation.record_write(
+            serial_object,
+            buffer,
+            time.monotonic() - start_time,
+            frame_length,
+        )
+
+
+def send_frames(
+    serial_object: Serial,
+    buffer: bytes,
+    frame_length: int,
+    interval: float = 0.0,
+    frames_per_write: Optional[int] = None,
+) -> None:
+    # Frames can not be delivered faster than the line transfers them,
+    # if interval is longer than that the frames are written one by one.
+    frame_count = len(buffer) // frame_length
+    if frame_count == 0:
+        return
+    wire_time = frame_utils.calc_wire_time(frame_length, serial_object.baudrate)
+    frame_interval = max(wire_time, interval)
+    if frames_per_write is None:
+        if frame_interval > wire_time:
+            frames_per_write = 1
+        else:
+            # the line is the bottleneck, let it pace a single write
+            frames_per_write = frame_count
+    write_paced(serial_object, buffer, frame_length, frame_interval, frames_per_write)
+
+
+def get_reply_wire_time(command: int, baud_rate: int) -> float:
+    data_length = REPLY_DATA_LENGTHS.get(command, frame_utils.MAX_DATA_LENGTH)
+    return frame_utils.calc_wire_time(
+        frame_utils.FRAME_HEADER_SIZE + data_length + 1, baud_rate
+    )
+
+
+class TurnaroundEstimator:
+    # Time the device needs between the end of a request and the start
+    # of its reply, without the time both spend on the line. Estimated
+    # like the TCP retransmission timeout: an EWMA of the samples and of
+    # their deviation, doubled after every timeout.
+    def __init__(
+        self,
+        alpha: float = 0.125,
+        beta: float = 0.25,
+        initial_timeout: float = 0.25,
+        min_timeout: float = 0.05,
+    ):
+        self.alpha = alpha
+        self.beta = beta
+        # used until the first reply has been measured
+        self.initial_timeout = initial_timeout
+        self.min_timeout = min_timeout
+        self.turnaround: Optional[float] = None
+        self.deviation = 0.0
+        self.backoff = 1
+        self.sample_count = 0
+        self.timeout_count = 0
+        self.lock = threading.Lock()
+
+    def add_sample(self, turnaround: float) -> None:
+        turnaround = max(turnaround, 0.0)
+        with self.lock:
+            if self.turnaround is None:
+                self.turnaround = turnaround
+                self.deviation = turnaround / 2
+            else:
+                error = turnaround - self.turnaround
+                self.turnaround += self.alpha * error
+                self.deviation += self.beta * (abs(error) - self.deviation)
+            self.backoff = 1
+            self.sample_count += 1
+
+    def add_timeout(self) -> None:
+        with self.lock:
+            self.backoff = min(self.backoff * 2, 64)
+            self.timeout_count += 1
+
+    def get_turnaround_timeout(self) -> float:
+        with self.lock:
+            if self.turnaround is None:
+                return self.initial_timeout * self.backoff
+            timeout = self.turnaround + 4 * self.deviation
+            return max(timeout, self.min_timeout) * self.backoff
+
+    def get_timeout(self, command: int, request_length: int, baud_rate: int) -> float:
+        # line time of request and reply plus the expected turnaround
+        wire_time = frame_utils.calc_wire_time(request_length, baud_rate)
+        wire_time += get_reply_wire_time(command, baud_rate)
+        return wire_time + self.get_turnaround_timeout()
+
+
+TURNAROUND_ESTIMATORS: "weakref.WeakKeyDictionary[Serial, TurnaroundEstimator]" = (
+    weakref.WeakKeyDictionary()
+)
+TURNAROUND_ESTIMATORS_LOCK = threading.Lock()
+
+
+def get_turnaround_estimator(serial_object: Serial) -> TurnaroundEstimator:
+    # one estimate per port, dropped together with the serial object
+    with TURNAROUND_ESTIMATORS_LOCK:
+        estimator = TURNAROUND_ESTIMATORS.get(serial_object)
+        if estimator is None:
+            estimator = TurnaroundEstimator()
+            TURNAROUND_ESTIMATORS[serial_object] = estimator
+        return estimator
+
+
+def get_request_timeout(serial_object: Serial, packet: bytes) -> float:
+    # adaptive deadline, never longer than the timeout of the port
+    estimator = get_turnaround_estimator(serial_object)
+    timeout = estimator.get_timeout(packet[3], len(packet), serial_object.baudrate)
+    return min(timeout, get_reply_timeout(serial_object))
+
+
+def get_reply_error(
+    data_frame: frame_utils.DataFrame,
+) -> Optional[exceptions.ChipReplyError]:
+    reply_command = data_frame.CMD[0]
+    if not frame_utils.is_error_reply(reply_command):
+        return None
+    status = data_frame.get_data()[:1]
+    exception_class = STATUS_EXCEPTIONS.get(status, exceptions.ChipReplyError)
+    return exception_class(
+        "command 0x%02x failed with status 0x%s"
+        % (frame_utils.get_request_command(reply_command), status.hex())
+    )
+
+
+def check_reply(data_frame: frame_utils.DataFrame) -> frame_utils.DataFrame:
+    error = get_reply_error(data_frame)
+    if error is not None:
+        raise error
+    return data_frame
+
+
+def get_reply_echo(packet: bytes) -> bytes:
+    # the request data the reply to packet has to start with
+    echo_length = REPLY_ECHO_LENGTHS.get(packet[3], 0)
+    return packet[
+        frame_utils.FRAME_HEADER_SIZE : frame_utils.FRAME_HEADER_SIZE + echo_length
+    ]
+
+
+def is_reply_to(data_frame: frame_utils.DataFrame, command: int, echo: bytes) -> bool:
+    reply_command = data_frame.CMD[0]
+    if frame_utils.get_request_command(reply_command) != command:
+        return False
+    # error replies carry only the status
+    if echo and not frame_utils.is_error_reply(reply_command):
+        return data_frame.get_data().startswith(echo)
+    return True
+
+
+def read_reply(
+    serial_object: Serial,
+    command: int,
+    timeout: Optional[float] = None,
+    echo: bytes = b"",
+) -> frame_utils.DataFrame:
+    # Read exactly the bytes the pending frame still needs
+    # (5 byte header, then LEN + 1) until the reply to command arrives.
+    # Replies to other commands, e.g. left over acknowledgements
+    # of keyboard and mouse frames, and successful replies whose data
+    # does not start with echo are skipped.
+    # A corrupted frame may have been the reply, then the wait is cut short
+    # and ChecksumError is raised instead of waiting out the timeout.
+    # Setting the timeout of an open port reconfigures it, so a read is
+    # only given less time when it could otherwise run more than
+    # READ_TIMEOUT_SLACK past the deadline.
+    if timeout is None:
+        timeout = get_reply_timeout(serial_object)
+    deadline = time.monotonic() + timeout
+    decoder = frame_utils.FrameDecoder()
+    corrupted = False
+    serial_timeout = serial_object.timeout
+    read_timeout = serial_timeout
+    try:
+        while True:
+            for data_frame in decoder:
+                if is_reply_to(data_frame, command, echo):
+                    return data_frame
+            if decoder.checksum_errors and not corrupted:
+                corrupted = True
+                grace_time = CHECKSUM_GRACE_FRAMES * frame_utils.calc_wire_time(
+                    frame_utils.FRAME_HEADER_SIZE + frame_utils.MAX_DATA_LENGTH + 1,
+                    serial_object.baudrate,
+                )
+                deadline = min(deadline, time.monotonic() + grace_time)
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                if corrupted:
+                    raise exceptions.ChecksumError("corrupted reply")
+                if instrumentation.ENABLED:
+                    instrumentation.record_error(serial_object, command, "timeout")
+                raise exceptions.ReplyTimeout("reply timeout")
+            if read_timeout is None or read_timeout > remaining + READ_TIMEOUT_SLACK:
+                read_timeout = remaining
+                serial_object.timeout = read_timeout
+            decoder.feed(read_packet(serial_object, decoder.bytes_needed()))
+    finally:
+        if serial_object.timeout != serial_timeout:
+            serial_object.timeout = serial_timeout
+        if instrumentation.ENABLED and decoder.checksum_errors:
+            instrumentation.record_error(
+                serial_object, command, "checksum", decoder.checksum_errors
+            )
+
+
+def request(
+    serial_object: Serial,
+    packet: bytes,
+    timeout: Optional[float] = None,
+    retry_policy: Optional["RetryPolicy"] = None,
+) -> frame_utils.DataFrame:
+    # Without an explicit timeout the reply is waited for as long as the
+    # line and the measured turnaround of the device need, see
+    # TurnaroundEstimator. Error replies are raised as the
+    # ChipReplyError of their status.
+    # A late reply to an earlier request is dropped with the rest of the
+    # input before writing, or skipped by its echo if it arrives later.
+    if retry_policy is not None:
+        return retry_policy.request(serial_object, packet, timeout)
+    command = packet[3]
+    echo = get_reply_echo(packet)
+    estimator = get_turnaround_estimator(serial_object)
+    if timeout is None:
+        timeout = get_request_timeout(serial_object, packet)
+    serial_object.reset_input_buffer()
+    start_time = time.perf_counter()
+    write_frame(serial_object, packet)
+    try:
+        data_frame = read_reply(serial_object, command, timeout, echo)
+    except exceptions.ReplyTimeout:
+        estimator.add_timeout()
+        raise
+    latency = time.perf_counter() - start_time
+    reply_length = frame_utils.FRAME_HEADER_SIZE + data_frame.get_data_length() + 1
+    estimator.add_sample(
+        latency
+        - frame_utils.calc_wire_time(len(packet) + reply_length, serial_object.baudrate)
+    )
+    if instrumentation.ENABLED:
+        instrumentation.record_reply(serial_object, command, data_frame, latency)
+    return check_reply(data_frame)
+
+
+class RetryPolicy:
+    # Repeats a call after transient errors with exponential backoff
+    # and jitter, other errors (e.g. ParameterError) are raised at once.
+    def __init__(
+        self,
+        attempts: int = 3,
+        backoff: float = 0.005,
+        max_backoff: float = 0.1,
+        jitter: float = 0.5,
+        attempt_timeout: Optional[float] = None,
+        retry_on: Tuple[Type[Exception], ...] = TRANSIENT_ERRORS,
+    ):
+        self.attempts = attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        # the delay varies by +- jitter of itself
+        self.jitter = jitter
+        # a lost reply costs attempt_timeout instead of the full timeout
+        self.attempt_timeout = attempt_timeout
+        self.retry_on = retry_on
+        self.retry_count = 0
+
+    def get_delay(self, attempt: int) -> float:
+        delay = min(self.max_backoff, self.backoff * (2**attempt))
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def call(
+        self,
+        function: Callable[..., Any],
+        *args: Any,
+        before_retry: Optional[Callable[[], None]] = None,
+        **kwargs: Any,
+    ) -> Any:
+        attempt = 0
+        while True:
+            try:
+                return function(*args, **kwargs)
+            except self.retry_on:
+                attempt += 1
+                if attempt >= self.attempts:
+                    raise
+            self.retry_count += 1
+            time.sleep(self.get_delay(attempt - 1))
+            if before_retry is not None:
+                before_retry()
+
+    def request(
+        self,
+        serial_object: Serial,
+        packet: bytes,
+        timeout: Optional[float] = None,
+    ) -> frame_utils.DataFrame:
+        if self.attempt_timeout is not None:
+            timeout = self.attempt_timeout
+        # request drops what is left of the failed reply
+        return self.call(request, serial_object, packet, timeout)
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,48 @@
+from typing import Callable
+from typing import Iterator
+
+import pytest
+from serial import Serial
+
+from pych9329.emulator import CH9329Emulator
+
+
+@pytest.fixture
+def create_mock_serial(mocker) -> Callable[..., Serial]:
+    # an unopened port whose write, flush and input reset do nothing
+    # and which never receives anything
+    def create(baudrate: int = 9600) -> Serial:
+        serial_object = Serial(baudrate=baudrate)
+        mocker.patch.object(serial_object, "read", return_value=b"")
+        mocker.patch.object(serial_object, "write", return_value=None)
+        mocker.patch.object(serial_object, "flush", return_value=None)
+        mocker.patch.object(serial_object, "reset_input_buffer", return_value=None)
+        return serial_object
+
+    return create
+
+
+@pytest.fixture
+def mock_serial(create_mock_serial) -> Serial:
+    return create_mock_serial()
+
+
+@pytest.fixture
+def emulator(request) -> Iterator[CH9329Emulator]:
+    # keyword arguments of CH9329Emulator are passed with
+    # @pytest.mark.parametrize("emulator", [{...}], indirect=True)
+    with CH9329Emulator(**getattr(request, "param", {})) as emulator:
+        yield emulator
+
+
+@pytest.fixture
+def emulator_serial(emulator) -> Iterator[Serial]:
+    serial_object = emulator.open_serial()
+    try:
+        yield serial_object
+    finally:
+        serial_object.close()
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,138 @@
+import asyncio
+import os
+import tty
+
+import pytest
+from serial import Serial
+
+from pych9329.async_client import AsyncCH9329
+from pych9329.chip_command import create_get_parameters_frame
+from pych9329.chip_command import create_get_usb_string_frame
+from pych9329.chip_command import parse_usb_string_reply
+from pych9329.exceptions import ReplyTimeout
+
+
+class TestAsyncClient:
+
+    @staticmethod
+    def load_shared_data(shared_datadir, filename) -> bytes:
+        data_path = shared_datadir / filename
+        with open(data_path, "rb") as f:
+            return f.read()
+
+    def test_async_client_request(self, shared_datadir):
+        get_parameters_read_packet_data = self.load_shared_data(
+            shared_datadir, "get_parameters_read_packet.bin"
+        )
+        master_fd, slave_fd = os.openpty()
+        tty.setraw(master_fd)
+        serial_object = Serial(os.ttyname(slave_fd), 9600, timeout=0)
+
+        async def run():
+            loop = asyncio.get_running_loop()
+            device = AsyncCH9329(serial_object)
+
+            def device_side():
+                request = os.read(master_fd, 64)
+                assert request.endswith(b"\x57\xab\x00\x08\x00\x0a")
+                # a stale reply and part of the answer, then the rest
+                os.write(master_fd, b"\x57\xab\x00\x82\x01\x00\x85")
+                os.write(master_fd, get_parameters_read_packet_data[:10])
+                loop.call_later(
+                    0.01, os.write, master_fd, get_parameters_read_packet_data[10:]
+                )
+
+            loop.add_reader(master_fd, device_side)
+            await device.keyboard.press("a")
+            parameters = await device.get_chip_parameters()
+            loop.remove_reader(master_fd)
+            device.close()
+            return parameters
+
+        try:
+            parameters = asyncio.run(run())
+        finally:
+            serial_object.close()
+            os.close(master_fd)
+            os.close(slave_fd)
+        assert parameters.get("serial_baud_rate") == 9600
+        assert parameters.get("usb_pid") == 57641
+
+    @staticmethod
+    def create_usb_string_reply(sub_command: bytes, string_data: bytes) -> bytes:
+        reply_data = sub_command + bytes([len(string_data)]) + string_data
+        reply_packet = b"\x57\xab\x00\x8a" + bytes([len(reply_data)]) + reply_data
+        return reply_packet + bytes([sum(reply_packet) % 256])
+
+    def test_async_client_late_reply(self):
+        master_fd, slave_fd = os.openpty()
+        tty.setraw(master_fd)
+        serial_object = Serial(os.ttyname(slave_fd), 9600, timeout=0)
+        os.set_blocking(serial_object.fileno(), True)
+        replies = [
+            self.create_usb_string_reply(b"\x01", b"WCH UART TO KB-MS_V1.8"),
+            self.create_usb_string_reply(b"\x02", b"2019A152BB40"),
+        ]
+
+        async def run():
+            loop = asyncio.get_running_loop()
+            device = AsyncCH9329(serial_object, timeout=0.02)
+
+            def device_side():
+                os.read(master_fd, 64)
+                # the product string comes after its request timed out
+                loop.call_later(0.05, os.write, master_fd, replies.pop(0))
+
+            loop.add_reader(master_fd, device_side)
+            try:
+                with pytest.raises(ReplyTimeout):
+                    await device.get_product()
+                serial_number = await device.request(
+                    create_get_usb_string_frame(b"\x02"), timeout=0.5
+                )
+            finally:
+                loop.remove_reader(master_fd)
+                device.close()
+            return serial_number
+
+        try:
+            serial_number = asyncio.run(run())
+            # close restores the blocking mode of the port
+            assert os.get_blocking(serial_object.fileno())
+        finally:
+            serial_object.close()
+            os.close(master_fd)
+            os.close(slave_fd)
+        assert parse_usb_string_reply(serial_number, b"\x02") == "2019A152BB40"
+
+    @pytest.mark.parametrize("emulator", [{"simulate_wire_time": False}], indirect=True)
+    def test_async_client_lost_reply(self, emulator_serial):
+        # frames for another address are never answered
+        lost_packets = []
+        for packet in [
+            create_get_parameters_frame(),
+            create_get_usb_string_frame(b"\x02"),
+        ]:
+            packet = bytearray(packet)
+            packet[2] = 0x05
+            packet[-1] = (packet[-1] + 0x05) & 0xFF
+            lost_packets.append(bytes(packet))
+
+        async def run():
+            async with AsyncCH9329(emulator_serial, timeout=0.1) as device:
+                results = []
+                for packet in lost_packets:
+                    with pytest.raises(ReplyTimeout):
+                        await device.request(packet)
+                    # the requests after a lost reply still get theirs
+                    for _ in range(3):
+                        results.append(await device.get_serial_number())
+                        parameters = await device.get_chip_parameters()
+                        results.append(parameters.get("serial_baud_rate"))
+                return results
+
+        assert asyncio.run(run()) == ["2019A152BB40", 9600] * 6
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,45 @@
+import pytest
+
+from pych9329 import baud_rate
+from pych9329.frame_utils import CommandCode
+from pych9329.frame_utils import DataFrameStatus
+
+
+class TestBaudRate:
+
+    def test_wire_time_budget(self):
+        budget = baud_rate.get_wire_time_budget(9600)
+        keyboard_budget = budget["keyboard_general_data"]
+        assert keyboard_budget["frame_length"] == 14
+        assert keyboard_budget["wire_time"] == pytest.approx(0.0145833, rel=1e-4)
+        assert keyboard_budget["frames_per_second"] == pytest.approx(68.57, rel=1e-3)
+
+    @pytest.mark.parametrize("emulator", [{"simulate_wire_time": False}], indirect=True)
+    def test_maximize_baud_rate(self, emulator, emulator_serial):
+        serial_object = emulator_serial
+        serial_object.baudrate = 115200
+        result = baud_rate.maximize_baud_rate(
+            serial_object, candidates=(57600, 19200, 9600), reset_delay=0.02
+        )
+        assert result == 57600
+        assert serial_object.baudrate == 57600
+        assert emulator.baud_rate == 57600
+        assert emulator.line_errors > 0
+
+    @pytest.mark.parametrize("emulator", [{"simulate_wire_time": False}], indirect=True)
+    def test_set_baud_rate_reset_ignored(self, emulator, emulator_serial):
+        # the chip stores the new rate but keeps running at the old one
+        emulator.handlers[CommandCode.RESET.value] = (
+            lambda command, data: emulator.send_status(command, DataFrameStatus.SUCCESS)
+        )
+        serial_object = emulator_serial
+        assert not baud_rate.set_baud_rate(
+            serial_object, 57600, timeout=0.1, reset_delay=0.02
+        )
+        assert serial_object.baudrate == 9600
+        assert emulator.baud_rate == 9600
+        assert emulator.parameters.get("serial_baud_rate") == 9600
+
+
+if __name__ == "__main__":
+    pass
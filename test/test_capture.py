@@ -0,0 +1,51 @@
+import pytest
+
+from pych9329 import capture
+from pych9329 import chip_command
+from pych9329 import keyboard
+from pych9329.exceptions import InvalidCaptureFile
+
+
+class TestCapture:
+
+    @pytest.mark.parametrize("emulator", [{"simulate_wire_time": False}], indirect=True)
+    def test_capture_emulator(self, emulator, emulator_serial, tmp_path):
+        path = str(tmp_path / "traffic.cap")
+        serial_object = emulator_serial
+        with capture.start(path, slot_count=64, slot_size=32):
+            chip_command.get_chip_parameters(serial_object)
+            keyboard.send_text_batch(serial_object, "ab")
+        assert capture.CAPTURE_WRITER is None
+        frames = capture.decode_capture(path)
+        summary = [(frame.direction, frame.data_frame.CMD) for frame in frames]
+        assert summary == [
+            (capture.DIRECTION_OUT, b"\x08"),
+            (capture.DIRECTION_IN, b"\x88"),
+            (capture.DIRECTION_OUT, b"\x02"),
+            (capture.DIRECTION_OUT, b"\x02"),
+            (capture.DIRECTION_OUT, b"\x02"),
+            (capture.DIRECTION_OUT, b"\x02"),
+        ]
+        # the 56 byte reply spans several 12 byte slots
+        assert frames[1].data_frame.verify_checksum()
+        assert frames[1].data_frame.get_data_length() == 50
+        assert frames[1].port == emulator.port
+        timestamps = [frame.timestamp for frame in frames]
+        assert timestamps == sorted(timestamps)
+
+    def test_capture_ring(self, tmp_path):
+        path = str(tmp_path / "traffic.cap")
+        with capture.CaptureWriter(path, slot_count=4, slot_size=34) as writer:
+            for index in range(10):
+                writer.record(None, capture.DIRECTION_OUT, bytes([index]) * 14)
+        records = capture.read_capture(path)
+        # only the newest slots survive
+        assert [record.data[0] for record in records] == [6, 7, 8, 9]
+        assert [record.sequence for record in records] == [7, 8, 9, 10]
+        (tmp_path / "bad.cap").write_bytes(b"\x00" * 10)
+        with pytest.raises(InvalidCaptureFile):
+            capture.read_capture(str(tmp_path / "bad.cap"))
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,81 @@
+import pytest
+from serial import Serial
+
+from pych9329 import chip_command
+from pych9329.channel import CommandChannel
+from pych9329.channel import get_inventory
+from pych9329.exceptions import ProtocolError
+from pych9329.exceptions import ReplyTimeout
+
+
+class TestChannel:
+
+    def test_channel_inventory(self, emulator_serial):
+        serial_object = emulator_serial
+        inventory = get_inventory(serial_object)
+        with CommandChannel(serial_object, window=2) as channel:
+            sub_commands = [b"\x02", b"\x01", b"\x00"]
+            futures = channel.request_many(
+                [
+                    chip_command.create_get_usb_string_frame(sub_command)
+                    for sub_command in sub_commands
+                ]
+            )
+            strings = [
+                chip_command.parse_usb_string_reply(future.result(1.0), sub_command)
+                for future, sub_command in zip(futures, sub_commands)
+            ]
+        assert inventory["parameters"].get("serial_baud_rate") == 9600
+        assert inventory["manufacturer"] == "WWW.WCH.CN"
+        assert inventory["product"] == "WCH UART TO KB-MS_V1.8"
+        assert inventory["serial_number"] == "2019A152BB40"
+        assert strings == ["2019A152BB40", "WCH UART TO KB-MS_V1.8", "WWW.WCH.CN"]
+
+    def test_channel_timeout(self, mocker):
+        serial_object = Serial()
+        mocker.patch.object(serial_object, "write", return_value=None)
+        mocker.patch.object(serial_object, "flush", return_value=None)
+        mocker.patch.object(serial_object, "read", return_value=b"")
+        with CommandChannel(serial_object, window=1, timeout=0.05) as channel:
+            futures = channel.request_many(
+                [
+                    chip_command.create_get_parameters_frame(),
+                    chip_command.create_get_parameters_frame(),
+                ]
+            )
+            for future in futures:
+                with pytest.raises(ProtocolError):
+                    future.result(1.0)
+        # the window of one makes every request a separate write
+        assert serial_object.write.call_count == 2
+
+    @pytest.mark.parametrize("emulator", [{"response_delay": 0.15}], indirect=True)
+    def test_channel_late_reply(self, emulator_serial):
+        with CommandChannel(emulator_serial, timeout=0.1) as channel:
+            with pytest.raises(ReplyTimeout):
+                channel.get_usb_string_info(b"\x00").result(1.0)
+            # the manufacturer arrives while the serial number is waited for
+            future = channel.get_usb_string_info(b"\x02", timeout=1.0)
+            data_frame = future.result(1.0)
+        assert chip_command.parse_usb_string_reply(data_frame, b"\x02") == (
+            "2019A152BB40"
+        )
+
+    @pytest.mark.parametrize("emulator", [{"simulate_wire_time": False}], indirect=True)
+    def test_channel_lost_reply(self, emulator_serial):
+        # a frame for another address is never answered
+        packet = bytearray(chip_command.create_get_parameters_frame())
+        packet[2] = 0x05
+        packet[-1] = (packet[-1] + 0x05) & 0xFF
+        with CommandChannel(emulator_serial, timeout=0.1) as channel:
+            with pytest.raises(ReplyTimeout):
+                channel.request(bytes(packet)).result(1.0)
+            for _ in range(3):
+                parameters = chip_command.parse_parameters_reply(
+                    channel.get_chip_parameters().result(1.0)
+                )
+                assert parameters.get("serial_baud_rate") == 9600
+
+
+if __name__ == "__main__":
+    pass
@@ -1,9 +1,17 @@
+import time
+
+import pytest
 from serial import Serial
 
 from pych9329.chip_command import get_chip_parameters
+from pych9329.chip_command import get_serial_number
 from pych9329.chip_command import send_command_reset
 from pych9329.chip_command import send_command_restore_factory_config
 from pych9329.chip_command import set_chip_parameters
+from pych9329.chip_command import set_usb_string_info
+from pych9329.exceptions import ParameterError
+from pych9329.exceptions import ProtocolError
+from pych9329.transport import RetryPolicy
 
 
 class TestChipCommand:
@@ -51,6 +59,7 @@ class TestChipCommand:
         serial_object.flush = mocker.patch.object(
             serial_object, "flush", return_value=None
         )
+        mocker.patch.object(serial_object, "reset_input_buffer", return_value=None)
         parameters = get_chip_parameters(serial_object)
         serial_object.write.assert_called_once_with(b"\x57\xab\x00\x08\x00\x0a")
         assert parameters.get("serial_baud_rate") == 9600
@@ -63,6 +72,96 @@ class TestChipCommand:
         set_chip_parameters(serial_object, parameters)
         serial_object.write.assert_called_once_with(set_parameters_write_packet_data)
 
+    def test_chip_command_usb_string_info(self, mocker):
+        serial_name = b"2019A152BB40"
+        reply_data = b"\x02" + bytes([len(serial_name)]) + serial_name
+        reply_packet = b"\x57\xab\x00\x8a" + bytes([len(reply_data)]) + reply_data
+        reply_packet += bytes([sum(reply_packet) % 256])
+        # an acknowledgement of a keyboard frame arrives before the reply
+        stream = bytearray(b"\x57\xab\x00\x82\x01\x00\x85" + reply_packet)
+
+        def read(size):
+            chunk = bytes(stream[:size])
+            del stream[:size]
+            return chunk
+
+        serial_object = Serial()
+        serial_object.write = mocker.patch.object(
+            serial_object, "write", return_value=None
+        )
+        serial_object.read = mocker.patch.object(
+            serial_object, "read", side_effect=read
+        )
+        serial_object.flush = mocker.patch.object(
+            serial_object, "flush", return_value=None
+        )
+        mocker.patch.object(serial_object, "reset_input_buffer", return_value=None)
+        assert get_serial_number(serial_object) == "2019A152BB40"
+        serial_object.write.assert_called_once_with(b"\x57\xab\x00\x0a\x01\x02\x0f")
+        assert [c.args[0] for c in serial_object.read.call_args_list] == [5, 2, 5, 15]
+        assert len(stream) == 0
+        # the reply to a product string request is not taken as serial number
+        stream.extend(reply_packet.replace(b"\x8a\x0e\x02", b"\x8a\x0e\x01"))
+        stream[-1] = (stream[-1] - 1) % 256
+        with pytest.raises(ProtocolError):
+            get_serial_number(serial_object)
+
+    @staticmethod
+    def mock_stream_serial(mocker, stream: bytearray) -> Serial:
+        def read(size):
+            chunk = bytes(stream[:size])
+            del stream[:size]
+            return chunk
+
+        serial_object = Serial(timeout=0.5)
+        mocker.patch.object(serial_object, "write", return_value=None)
+        mocker.patch.object(serial_object, "flush", return_value=None)
+        mocker.patch.object(serial_object, "read", side_effect=read)
+        mocker.patch.object(serial_object, "reset_input_buffer", return_value=None)
+        return serial_object
+
+    def test_chip_command_error_reply(self, mocker, shared_datadir):
+        get_parameters_read_packet_data = self.load_shared_data(
+            shared_datadir, "get_parameters_read_packet.bin"
+        )
+        # ERROR_SUM, then a reply corrupted on the line, then the parameters
+        corrupted_packet = bytearray(get_parameters_read_packet_data)
+        corrupted_packet[-1] ^= 0xFF
+        replies = [
+            b"\x57\xab\x00\xc8\x01\xe4\xaf",
+            corrupted_packet,
+            get_parameters_read_packet_data,
+        ]
+        stream = bytearray()
+        serial_object = self.mock_stream_serial(mocker, stream)
+
+        # every request clears the input, then its reply arrives
+        def reset_input_buffer():
+            stream.clear()
+            stream.extend(replies.pop(0))
+
+        serial_object.reset_input_buffer.side_effect = reset_input_buffer
+        retry_policy = RetryPolicy(attempts=3, backoff=0.0)
+        start_time = time.monotonic()
+        parameters = get_chip_parameters(serial_object, retry_policy=retry_policy)
+        # the corrupted reply does not stall until the serial timeout
+        assert time.monotonic() - start_time < 0.5
+        assert parameters.get("serial_baud_rate") == 9600
+        assert retry_policy.retry_count == 2
+        assert serial_object.write.call_count == 3
+
+    def test_chip_command_parameter_error(self, mocker):
+        stream = bytearray(b"\x57\xab\x00\xcb\x01\xe5\xb3" * 3)
+        serial_object = self.mock_stream_serial(mocker, stream)
+        retry_policy = RetryPolicy(attempts=3, backoff=0.0)
+        with pytest.raises(ParameterError):
+            set_usb_string_info(
+                serial_object, b"\x02", "serial", retry_policy=retry_policy
+            )
+        # parameter errors are not retried
+        assert serial_object.write.call_count == 1
+        assert retry_policy.retry_count == 0
+
 
 if __name__ == "__main__":
     pass
@@ -0,0 +1,46 @@
+import time
+
+import pytest
+
+from pych9329 import chip_command
+from pych9329 import keyboard
+from pych9329 import mouse
+from pych9329 import transport
+from pych9329.exceptions import ChecksumError
+
+
+class TestEmulator:
+
+    def test_emulator_chip_command(self, emulator, emulator_serial):
+        serial_object = emulator_serial
+        parameters = chip_command.get_chip_parameters(serial_object)
+        assert parameters.get("serial_baud_rate") == 9600
+        assert chip_command.get_serial_number(serial_object) == "2019A152BB40"
+        assert chip_command.set_product(serial_object, "pych9329")
+        assert chip_command.get_product(serial_object) == "pych9329"
+        emulator.indicator = 0x02
+        result, status = keyboard.receive_indicator_status(serial_object)
+        assert result
+        assert status["caps_lock"]
+        # a frame with a broken checksum is rejected
+        with pytest.raises(ChecksumError):
+            transport.request(serial_object, b"\x57\xab\x00\x08\x00\x00")
+
+    def test_emulator_hid_reports(self, emulator, emulator_serial):
+        serial_object = emulator_serial
+        start_time = time.monotonic()
+        keyboard.press(serial_object, "A")
+        keyboard.release(serial_object)
+        mouse.move(serial_object, 960, 540)
+        serial_object.flush()
+        assert emulator.wait_reports(3)
+        # three frames of 14, 14 and 13 bytes at 9600 baud
+        assert time.monotonic() - start_time >= 0.04
+        assert emulator.get_keyboard_reports() == [(0x02, (0x04,)), (0x00, ())]
+        assert emulator.get_mouse_reports() == [
+            {"relative": False, "button": 0, "x": 2048, "y": 2048, "wheel": 0}
+        ]
+
+
+if __name__ == "__main__":
+    pass
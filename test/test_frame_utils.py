@@ -0,0 +1,60 @@
+import pytest
+
+import pych9329.exceptions as exceptions
+from pych9329.frame_utils import DataFrame
+from pych9329.frame_utils import FrameDecoder
+from pych9329.frame_utils import FrameEncoder
+
+
+class TestFrameUtils:
+
+    def test_frame_encoder_encode(self):
+        encoder = FrameEncoder(b"\x02", 8)
+        data = b"\x02\x00\x04\x00\x00\x00\x00\x00"
+        data_frame = DataFrame(b"\x57\xab", b"\x00", b"\x02")
+        data_frame.set_data(data)
+        assert encoder.encode(data) == data_frame.create_frame()
+        assert encoder.encode(bytes(8)) == b"\x57\xab\x00\x02\x08" + bytes(8) + b"\x0c"
+        with pytest.raises(exceptions.InvalidDataLength):
+            encoder.encode(b"\x00")
+
+    def test_frame_encoder_encode_into(self):
+        encoder = FrameEncoder(b"\x05", 5)
+        buffer = bytearray(encoder.frame_length * 2)
+        offset = encoder.encode_into(buffer, 0, b"\x01\x00\x01\xff\x00")
+        offset = encoder.encode_into(buffer, offset, b"\x01\x00\x00\x00\x00")
+        assert offset == len(buffer)
+        assert bytes(buffer) == (
+            encoder.encode(b"\x01\x00\x01\xff\x00")
+            + encoder.encode(b"\x01\x00\x00\x00\x00")
+        )
+        with pytest.raises(exceptions.BufferTooSmall):
+            encoder.encode_into(buffer, offset, b"\x01\x00\x00\x00\x00")
+
+    def test_frame_decoder_stream(self):
+        status_frame = b"\x57\xab\x00\x82\x01\x00\x85"
+        info_frame = b"\x57\xab\x00\x81\x08\x30\x01\x00" + bytes(5) + b"\xbc"
+        bad_frame = b"\x57\xab\x00\x82\x01\x00\x00"
+        stream = b"\xff\x57" + bad_frame + status_frame + info_frame + status_frame
+        decoder = FrameDecoder()
+        frames = []
+        for index in range(0, len(stream), 3):
+            frames.extend(decoder.decode(stream[index : index + 3]))
+        assert [f.CMD for f in frames] == [b"\x82", b"\x81", b"\x82"]
+        assert frames[1].get_data() == b"\x30\x01\x00" + bytes(5)
+        assert frames[0].create_frame() == status_frame
+        assert decoder.checksum_errors == 1
+        assert decoder.bytes_needed() == 5
+
+    def test_frame_decoder_bytes_needed(self):
+        decoder = FrameDecoder()
+        decoder.feed(b"\x57\xab\x00\x88")
+        assert decoder.next_frame() is None
+        assert decoder.bytes_needed() == 1
+        decoder.feed(b"\x32")
+        assert decoder.next_frame() is None
+        assert decoder.bytes_needed() == 51
+
+
+if __name__ == "__main__":
+    pass
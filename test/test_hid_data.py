@@ -0,0 +1,63 @@
+import asyncio
+import gc
+import os
+import time
+
+import pytest
+
+from pych9329 import hid_data
+from pych9329.frame_utils import CommandCode
+
+
+class TestHIDData:
+
+    def test_create_hid_data_frames(self):
+        buffer = hid_data.create_hid_data_frames(bytes(range(100)))
+        assert len(buffer) == 70 + 42
+        assert buffer[:5] == b"\x57\xab\x00\x06\x40"
+        assert buffer[70:75] == b"\x57\xab\x00\x06\x24"
+        assert buffer[75:111] == bytes(range(64, 100))
+
+    def test_hid_data_channel(self, emulator, emulator_serial):
+        payload = os.urandom(1000)
+        serial_object = emulator_serial
+        with hid_data.HIDDataChannel(serial_object, window=2) as channel:
+            assert channel.write(payload) == len(payload)
+            channel.flush()
+            emulator.send_hid_data(payload[:100])
+            received = bytearray()
+            deadline = time.monotonic() + 1.0
+            while len(received) < 100 and time.monotonic() < deadline:
+                received += channel.read(100 - len(received)) or b""
+            assert len(received) == 100
+            statistics = channel.get_statistics()
+
+            async def read_async():
+                emulator.send_hid_data(b"async")
+                async for chunk in channel:
+                    return chunk
+
+            assert asyncio.run(read_async()) == b"async"
+        reports = emulator.get_reports(CommandCode.SEND_MY_HID_DATA.value)
+        assert len(reports) == 16
+        assert b"".join(report.data for report in reports) == payload
+        assert bytes(received) == payload[:100]
+        assert statistics["frames_sent"] == 16
+        assert statistics["bytes_received"] == 100
+        assert statistics["error_count"] == 0
+        assert statistics["send_throughput"] > 0
+        assert statistics["receive_throughput"] > 0
+
+    def test_hid_data_channel_init_error(self, mocker):
+        close = mocker.spy(hid_data.HIDDataChannel, "close")
+        serial_object = mocker.Mock(spec=["timeout"], timeout=0.5)
+        with pytest.raises(ValueError):
+            hid_data.HIDDataChannel(serial_object, window=-1)
+        gc.collect()
+        # closing the half built channel from __del__ does not fail
+        assert close.call_count == 1
+        assert close.spy_exception is None
+
+
+if __name__ == "__main__":
+    pass
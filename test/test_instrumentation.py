@@ -0,0 +1,91 @@
+import asyncio
+
+import pytest
+
+from pych9329 import chip_command
+from pych9329 import hid_data
+from pych9329 import instrumentation
+from pych9329 import keyboard
+from pych9329 import mouse
+from pych9329.async_client import AsyncCH9329
+from pych9329.channel import CommandChannel
+
+
+class TestInstrumentation:
+
+    @pytest.mark.parametrize("emulator", [{"simulate_wire_time": False}], indirect=True)
+    def test_instrumentation_snapshot(self, emulator, emulator_serial):
+        instrumentation.reset()
+        instrumentation.enable()
+        try:
+            serial_object = emulator_serial
+            chip_command.get_chip_parameters(serial_object)
+            chip_command.set_product(serial_object, "x" * 20)
+            keyboard.send_text_batch(serial_object, "ab")
+            mouse.move(serial_object, 10, 10)
+            snapshot = instrumentation.snapshot()
+        finally:
+            instrumentation.disable()
+            instrumentation.reset()
+        device = snapshot[emulator.port]
+        parameters = device["0x08"]
+        assert parameters["frames_out"] == 1
+        assert parameters["bytes_out"] == 6
+        assert parameters["frames_in"] == 1
+        assert parameters["bytes_in"] == 56
+        assert parameters["latency_count"] == 1
+        assert sum(count for _, count in parameters["latency_histogram"]) == 1
+        assert device["0x0b"]["status_counts"] == {"SUCCESS": 1}
+        assert device["0x02"]["frames_out"] == 4
+        assert device["0x02"]["bytes_out"] == 56
+        assert device["0x04"]["frames_out"] == 1
+        assert snapshot[instrumentation.ENCODE_DEVICE]["0x04"]["encode_count"] == 1
+
+    @pytest.mark.parametrize("emulator", [{"simulate_wire_time": False}], indirect=True)
+    def test_instrumentation_pipelined(self, emulator, emulator_serial):
+        # pipelined writes are counted per frame and command
+        async def run():
+            async with AsyncCH9329(emulator_serial) as device:
+                await device.get_chip_parameters()
+                await device.get_serial_number()
+
+        instrumentation.reset()
+        instrumentation.enable()
+        try:
+            serial_object = emulator_serial
+            with CommandChannel(serial_object) as channel:
+                futures = channel.request_many(
+                    [
+                        chip_command.create_get_parameters_frame(),
+                        chip_command.create_get_usb_string_frame(b"\x00"),
+                        chip_command.create_get_usb_string_frame(b"\x01"),
+                    ]
+                )
+                for future in futures:
+                    future.result()
+            asyncio.run(run())
+            with hid_data.HIDDataChannel(serial_object) as channel:
+                channel.write(bytes(100))
+            snapshot = instrumentation.snapshot()
+        finally:
+            instrumentation.disable()
+            instrumentation.reset()
+        device = snapshot[emulator.port]
+        assert device["0x08"]["frames_out"] == 2
+        assert device["0x08"]["bytes_out"] == 12
+        assert device["0x08"]["latency_count"] == 2
+        assert device["0x0a"]["frames_out"] == 3
+        assert device["0x0a"]["bytes_out"] == 21
+        assert device["0x0a"]["frames_in"] == 3
+        assert device["0x06"]["frames_out"] == 2
+        assert device["0x06"]["bytes_out"] == 112
+        assert device["0x06"]["status_counts"] == {"SUCCESS": 2}
+
+    def test_instrumentation_disabled(self):
+        instrumentation.reset()
+        mouse.create_absolute_data_frame(10, 10)
+        assert instrumentation.snapshot() == {}
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,106 @@
+import pytest
+
+from pych9329 import keyboard
+from pych9329.exceptions import InvalidKey
+from pych9329.exceptions import TooManyKeys
+
+
+class TestKeyboard:
+
+    def test_keyboard_frame_cache(self):
+        press_frame = keyboard.get_press_frame("a", 0x01)
+        assert keyboard.get_press_frame("a", 0x01) is press_frame
+        assert keyboard.get_press_frame("a", 0x02) != press_frame
+        assert keyboard.get_press_frame("a") == b"\x57\xab\x00\x02\x08" + (
+            b"\x00\x00\x04\x00\x00\x00\x00\x00\x10"
+        )
+        trigger_frame = keyboard.get_trigger_frame(("a", "b"), ("ctrl",))
+        assert keyboard.get_trigger_frame(("a", "b"), ("ctrl",)) is trigger_frame
+        assert keyboard.get_trigger_frame(("a", "b"), ("alt",)) != trigger_frame
+        assert trigger_frame[5:7] == b"\x01\x00"
+        assert keyboard.get_trigger_frame(("a", "b"), ("alt",))[5:7] == b"\x04\x00"
+
+    def test_keyboard_send_text_batch(self, mock_serial):
+        serial_object = mock_serial
+        keyboard.send_text_batch(serial_object, "aB")
+        serial_object.write.assert_called_once()
+        release_frame = b"\x57\xab\x00\x02\x08" + bytes(8) + b"\x0c"
+        assert bytes(serial_object.write.call_args.args[0]) == (
+            b"\x57\xab\x00\x02\x08\x00\x00\x04"
+            + bytes(5)
+            + b"\x10"
+            + release_frame
+            + b"\x57\xab\x00\x02\x08\x02\x00\x05"
+            + bytes(5)
+            + b"\x13"
+            + release_frame
+        )
+
+    def test_keyboard_send_text_batch_paced(self, mock_serial):
+        serial_object = mock_serial
+        keyboard.send_text_batch(serial_object, "abc", upload_interval=20)
+        writes = [bytes(c.args[0]) for c in serial_object.write.call_args_list]
+        assert len(writes) == 6
+        assert b"".join(writes) == keyboard.create_text_frames("abc")
+
+    def test_keyboard_send_text_batch_rollover(self, mock_serial):
+        serial_object = mock_serial
+        keyboard.send_text_batch(serial_object, "abbCD", rollover=True)
+        press = keyboard.get_press_frame
+        release = keyboard.RELEASE_FRAME
+        assert bytes(serial_object.write.call_args.args[0]) == (
+            press("a")
+            + press("b")
+            + release
+            + press("b")
+            + release
+            + press("C")
+            + press("D")
+            + release
+        )
+
+    def test_keyboard_state(self, mock_serial):
+        serial_object = mock_serial
+        state = keyboard.KeyboardState(serial_object)
+        assert state.key_down("ctrl", "a")
+        assert state.key_down("b")
+        # already held, the report does not change
+        assert not state.key_down("a")
+        assert state.key_up("a")
+        assert state.is_pressed("b")
+        assert not state.is_pressed("a")
+        assert state.key_down("C")
+        assert state.release_all()
+        assert not state.release_all()
+        writes = [bytes(c.args[0])[5:13] for c in serial_object.write.call_args_list]
+        assert writes == [
+            b"\x01\x00\x04" + bytes(5),
+            b"\x01\x00\x04\x05" + bytes(4),
+            b"\x01\x00\x00\x05" + bytes(4),
+            # "C" takes the free slot and needs shift
+            b"\x03\x00\x06\x05" + bytes(4),
+            bytes(8),
+        ]
+        assert state.sent_count == 5
+        assert state.suppressed_count == 2
+
+    def test_keyboard_state_too_many_keys(self, mock_serial):
+        serial_object = mock_serial
+        state = keyboard.KeyboardState(serial_object)
+        assert state.set_keys(["a", "b"], ["ctrl"])
+        report = state.get_report()
+        with pytest.raises(TooManyKeys):
+            state.set_keys(["c", "d", "e", "f", "g", "h", "i"], ["alt"])
+        with pytest.raises(TooManyKeys):
+            state.key_down("c", "d", "e", "f", "g")
+        with pytest.raises(InvalidKey):
+            state.key_down("c", "no_such_key")
+        with pytest.raises(InvalidKey):
+            state.key_up("a", "no_such_key")
+        # nothing changed and nothing was sent
+        assert state.get_report() == report
+        assert serial_object.write.call_count == 1
+
+
+if __name__ == "__main__":
+    pass
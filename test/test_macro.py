@@ -0,0 +1,73 @@
+import time
+
+import pytest
+
+from pych9329 import keyboard
+from pych9329 import mouse
+from pych9329.exceptions import InvalidDelay
+from pych9329.exceptions import InvalidMacroFile
+from pych9329.macro import MacroBuilder
+from pych9329.macro import MacroPlayer
+from pych9329.macro import MacroRecorder
+
+
+class TestMacro:
+
+    def test_macro_builder_player(self, mock_serial, tmp_path):
+        path = str(tmp_path / "test.macro")
+        builder = MacroBuilder()
+        builder.text("ab").delay(0.02).mouse_move(960, 540).mouse_click("left", 0.01)
+        builder.save(path)
+        serial_object = mock_serial
+        with MacroPlayer.from_file(path) as player:
+            assert player.frame_count == 7
+            assert player.duration == pytest.approx(0.03)
+            start_time = time.monotonic()
+            player.play(serial_object)
+            assert time.monotonic() - start_time >= 0.03
+        writes = [bytes(c.args[0]) for c in serial_object.write.call_args_list]
+        # frames without a delay between them are written at once
+        assert writes == [
+            bytes(keyboard.create_text_frames("ab")),
+            mouse.create_absolute_data_frame(960, 540)
+            + mouse.create_relative_data_frame(0, 0, "left"),
+            mouse.create_relative_data_frame(0, 0, "null"),
+        ]
+
+    def test_macro_recorder(self, tmp_path):
+        path = str(tmp_path / "test.macro")
+        recorder = MacroRecorder(real_time=False)
+        keyboard.press(recorder, "a")
+        recorder.delay(0.05)
+        keyboard.release(recorder)
+        mouse.move(recorder, 100, 100, relative_mode=True)
+        recorder.save(path)
+        with MacroPlayer.from_file(path) as player:
+            frames = player.get_frames()
+        assert frames == [
+            (0.0, keyboard.get_press_frame("a")),
+            (
+                0.05,
+                keyboard.RELEASE_FRAME + mouse.create_relative_data_frame(100, 100),
+            ),
+        ]
+
+    def test_macro_invalid_file(self, tmp_path):
+        path = tmp_path / "test.macro"
+        path.write_bytes(b"")
+        with pytest.raises(InvalidMacroFile):
+            MacroPlayer.from_file(str(path))
+        path.write_bytes(MacroBuilder().key_release().to_bytes()[:-1])
+        with pytest.raises(InvalidMacroFile):
+            MacroPlayer.from_file(str(path))
+
+    def test_macro_invalid_delay(self):
+        with pytest.raises(InvalidDelay):
+            MacroBuilder().delay(-0.1)
+        builder = MacroBuilder().delay(3600).key_release().delay(7200)
+        with pytest.raises(InvalidDelay):
+            builder.key_release()
+
+
+if __name__ == "__main__":
+    pass
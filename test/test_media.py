@@ -0,0 +1,48 @@
+import pytest
+
+from pych9329 import media
+from pych9329.exceptions import InvalidKey
+
+
+class TestMedia:
+
+    def test_media_frames(self):
+        assert media.get_press_frame("volume_up") == bytes.fromhex(
+            "57ab000304020100000c"
+        )
+        assert media.get_release_frame("mute") == bytes.fromhex("57ab000304020000000b")
+        assert media.get_press_frame("power") == bytes.fromhex("57ab000302010109")
+        assert media.get_trigger_frame(("mute", "www_home", "calculator")) == (
+            bytes.fromhex("57ab000304020408041b")
+        )
+        with pytest.raises(InvalidKey):
+            media.get_trigger_frame(("power", "mute"))
+        with pytest.raises(InvalidKey):
+            media.get_press_frame("volume")
+
+    def test_media_click(self, mock_serial):
+        serial_object = mock_serial
+        media.click(serial_object, "sleep", 0.0, 0.0)
+        frames = [c.args[0] for c in serial_object.write.call_args_list]
+        assert frames == [
+            media.PRESS_FRAMES["sleep"],
+            media.RELEASE_FRAMES[b"\x01"],
+        ]
+
+    @pytest.mark.parametrize("emulator", [{"simulate_wire_time": False}], indirect=True)
+    def test_media_emulator(self, emulator, emulator_serial):
+        serial_object = emulator_serial
+        media.trigger(serial_object, ["play_pause"])
+        media.release_all(serial_object)
+        serial_object.flush()
+        assert emulator.wait_reports(3)
+        assert [report.data for report in emulator.get_reports()] == [
+            b"\x02\x08\x00\x00",
+            b"\x01\x00",
+            b"\x02\x00\x00\x00",
+        ]
+        assert emulator.error_count == 0
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,36 @@
+import pytest
+
+from pych9329 import mouse
+
+
+class TestMouse:
+
+    @pytest.mark.parametrize("use_numpy", [True, False])
+    def test_mouse_move_path(self, mocker, mock_serial, use_numpy):
+        if use_numpy:
+            pytest.importorskip("numpy")
+        else:
+            mocker.patch.object(mouse, "numpy", None)
+        serial_object = mock_serial
+        mouse.move_path(serial_object, [(0, 0), (960, 540), (5000, -1)])
+        serial_object.write.assert_called_once()
+        assert bytes(serial_object.write.call_args.args[0]) == (
+            mouse.create_absolute_data_frame(0, 0)
+            + mouse.create_absolute_data_frame(960, 540)
+            + mouse.create_absolute_data_frame(1920, 0)
+        )
+
+    def test_mouse_move_relative(self, mock_serial):
+        steps = mouse.split_relative_move(300, -128)
+        assert steps == [(100, -43), (100, -43), (100, -42)]
+        assert mouse.split_relative_move(0, 0) == [(0, 0)]
+        serial_object = mock_serial
+        mouse.move(serial_object, 1000, 5, relative_mode=True)
+        serial_object.write.assert_called_once()
+        frames = bytes(serial_object.write.call_args.args[0])
+        assert len(frames) == 8 * 11
+        assert frames[:11] == mouse.create_relative_data_frame(125, 0)
+
+
+if __name__ == "__main__":
+    pass
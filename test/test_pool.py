@@ -0,0 +1,61 @@
+import threading
+
+from serial import Serial
+
+from pych9329 import keyboard
+from pych9329 import mouse
+from pych9329.exceptions import DeviceBusy
+from pych9329.pool import DevicePool
+
+
+class TestPool:
+
+    def test_pool_broadcast(self, create_mock_serial):
+        serial_list = []
+        with DevicePool() as pool:
+            for index in range(3):
+                serial_object = create_mock_serial()
+                if index == 2:
+                    serial_object.flush.side_effect = OSError
+                serial_list.append(serial_object)
+                pool.add("device%d" % index, serial_object)
+            frame = keyboard.get_trigger_frame(("delete",), ("ctrl", "alt"))
+            result = pool.gather(pool.broadcast(frame), 1.0)
+            assert sorted(result.completed) == ["device0", "device1"]
+            assert isinstance(result.failed["device2"], OSError)
+            assert not result.success
+            result = pool.gather(
+                pool.broadcast_call(mouse.move, 100, 100, names=["device1"]), 1.0
+            )
+            assert result.success
+            assert list(result.completed) == ["device1"]
+        serial_list[0].write.assert_called_once_with(frame)
+        assert serial_list[1].write.call_count == 2
+
+    def test_pool_queue_full(self):
+        running_event = threading.Event()
+        block_event = threading.Event()
+
+        def block(serial_object):
+            running_event.set()
+            block_event.wait(5.0)
+
+        with DevicePool(queue_size=1) as pool:
+            pool.add("slow", Serial())
+            pool.add("fast", Serial())
+            try:
+                pool.submit("slow", block)
+                assert running_event.wait(1.0)
+                filler = pool.submit("slow", lambda serial_object: None)
+                assert not filler.done()
+                futures = pool.broadcast_call(lambda serial_object: serial_object)
+                assert isinstance(futures["slow"].exception(1.0), DeviceBusy)
+                assert futures["fast"].result(1.0) is pool.get_serial("fast")
+                assert not filler.done()
+            finally:
+                block_event.set()
+            assert filler.result(1.0) is None
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,44 @@
+import time
+
+from pych9329 import keyboard
+from pych9329.scheduler import FrameScheduler
+
+
+class TestScheduler:
+
+    def test_scheduler_send_text(self, mock_serial):
+        serial_object = mock_serial
+        with FrameScheduler() as scheduler:
+            start_time = time.monotonic()
+            keyboard.send_text(serial_object, "ab", 0.01, 0.01, scheduler=scheduler)
+            # returns before anything but the first report is due
+            assert time.monotonic() - start_time < 0.01
+            assert scheduler.wait_idle(1.0)
+            statistics = scheduler.get_statistics()
+        frames = [c.args[0] for c in serial_object.write.call_args_list]
+        assert frames == [
+            keyboard.get_press_frame("a"),
+            keyboard.RELEASE_FRAME,
+            keyboard.get_press_frame("b"),
+            keyboard.RELEASE_FRAME,
+        ]
+        assert statistics["sent_count"] == 4
+        assert statistics["error_count"] == 0
+        assert time.monotonic() - start_time >= 0.02
+
+    def test_scheduler_write_error(self, mock_serial):
+        serial_object = mock_serial
+        serial_object.write.side_effect = [None, OSError("unplugged")]
+        with FrameScheduler() as scheduler:
+            scheduler.schedule_after(serial_object, keyboard.RELEASE_FRAME)
+            scheduler.schedule_after(serial_object, keyboard.RELEASE_FRAME, 0.01)
+            assert scheduler.wait_idle(1.0)
+            statistics = scheduler.get_statistics()
+        assert statistics["sent_count"] == 1
+        assert statistics["error_count"] == 1
+        assert isinstance(scheduler.last_error, OSError)
+        assert len(scheduler.lateness_samples) == 1
+
+
+if __name__ == "__main__":
+    pass
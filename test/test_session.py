@@ -0,0 +1,31 @@
+import time
+
+import pytest
+
+from pych9329.session import CH9329Session
+
+
+class TestSession:
+
+    @pytest.mark.parametrize("emulator", [{"simulate_wire_time": False}], indirect=True)
+    def test_session_cache(self, emulator, emulator_serial):
+        serial_object = emulator_serial
+        session = CH9329Session(serial_object, ttl=0.05)
+        parameters = session.get_chip_parameters()
+        assert session.get_chip_parameters() is parameters
+        assert session.get_product() == "WCH UART TO KB-MS_V1.8"
+        assert session.set_product("pych9329")
+        # served from the cache updated by set_product
+        assert session.get_product() == "pych9329"
+        assert session.get_statistics()["hit_count"] == 2
+        assert session.get_statistics()["miss_count"] == 2
+        frame_count = emulator.received_frames
+        time.sleep(0.06)
+        assert session.get_product() == "pych9329"
+        session.invalidate()
+        assert session.get_chip_parameters() is not parameters
+        assert emulator.received_frames == frame_count + 2
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,61 @@
+import pytest
+
+from pych9329.chip_command import ChipParameter
+from pych9329.exceptions import InvalidFieldName
+from pych9329.struct_utils import Structure
+
+
+class ExampleStruct(Structure):
+    _fields_ = [
+        ("4c", "magic"),
+        ("<H", "width"),
+        (">H", "height"),
+        ("c", "flag"),
+    ]
+
+
+class TestStructUtils:
+
+    @staticmethod
+    def load_shared_data(shared_datadir, filename) -> bytes:
+        data_path = shared_datadir / filename
+        with open(data_path, "rb") as f:
+            return f.read()
+
+    def test_structure_load_save(self):
+        data = b"CH93\x80\x07\x04\x38\x01"
+        example = ExampleStruct.from_buffer(memoryview(data))
+        assert ExampleStruct._fields_struct_size_ == 9
+        assert example.get("magic") == b"CH93"
+        assert example.get("width") == 1920
+        assert example.get("height") == 1080
+        assert example.attribute["flag"] == b"\x01"
+        assert not hasattr(example, "__dict__")
+        example.set("width", 1280)
+        example.save()
+        assert example.buffer == b"CH93\x00\x05\x04\x38\x01"
+
+    def test_structure_chip_parameter(self, shared_datadir):
+        packet = self.load_shared_data(shared_datadir, "get_parameters_read_packet.bin")
+        parameters = ChipParameter.from_buffer(packet, 5)
+        assert parameters.get("serial_baud_rate") == 9600
+        parameters.attribute["serial_baud_rate"] = 57600
+        buffer = bytearray(5 + ChipParameter._fields_struct_size_)
+        parameters.save_into(buffer, 5)
+        assert buffer[5:] == packet[5:8] + b"\x00\x00\xe1\x00" + packet[12:55]
+
+    def test_structure_field_names(self):
+        for field_name in ["buffer", "offset", "attribute", "save", "get", "1x"]:
+            with pytest.raises(InvalidFieldName):
+                type("BadStruct", (Structure,), {"_fields_": [("B", field_name)]})
+
+        # a subclass may extend the fields of its base
+        class ExtendedStruct(ExampleStruct):
+            _fields_ = ExampleStruct._fields_ + [("B", "depth")]
+
+        extended = ExtendedStruct(b"CH93\x80\x07\x04\x38\x01\x18")
+        assert extended.get("depth") == 24
+
+
+if __name__ == "__main__":
+    pass
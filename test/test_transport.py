@@ -0,0 +1,87 @@
+import time
+
+import pytest
+
+from pych9329 import chip_command
+from pych9329 import transport
+from pych9329.exceptions import ReplyTimeout
+
+
+class TestTransport:
+
+    def test_turnaround_estimator(self):
+        estimator = transport.TurnaroundEstimator(min_timeout=0.001)
+        # GET_PARA_CFG, 6 byte request and 56 byte reply at 9600 baud
+        assert estimator.get_timeout(0x08, 6, 9600) == pytest.approx(0.25 + 0.0645833)
+        for _ in range(50):
+            estimator.add_sample(0.004)
+        assert estimator.get_turnaround_timeout() == pytest.approx(0.004, abs=1e-4)
+        assert estimator.get_timeout(0x08, 6, 115200) == pytest.approx(
+            0.004 + 0.0053819, abs=1e-4
+        )
+        estimator.add_timeout()
+        assert estimator.get_turnaround_timeout() == pytest.approx(0.008, abs=2e-4)
+
+    @pytest.mark.parametrize("emulator", [{"simulate_wire_time": False}], indirect=True)
+    def test_adaptive_timeout(self, emulator_serial):
+        serial_object = emulator_serial
+        serial_object.timeout = 1.0
+        for _ in range(5):
+            chip_command.get_chip_parameters(serial_object)
+        estimator = transport.get_turnaround_estimator(serial_object)
+        assert estimator.sample_count == 5
+        # a frame for another address is never answered
+        packet = bytearray(chip_command.create_get_parameters_frame())
+        packet[2] = 0x05
+        packet[-1] = (packet[-1] + 0x05) & 0xFF
+        start_time = time.monotonic()
+        with pytest.raises(ReplyTimeout):
+            transport.request(serial_object, bytes(packet))
+        assert time.monotonic() - start_time < 0.5
+        assert estimator.timeout_count == 1
+
+    @pytest.mark.parametrize("emulator", [{"response_delay": 0.06}], indirect=True)
+    def test_late_reply(self, emulator_serial):
+        # the product string arrives after its request timed out,
+        # while the serial number is already being waited for
+        serial_object = emulator_serial
+        serial_object.timeout = 1.0
+        with pytest.raises(ReplyTimeout):
+            chip_command.get_usb_string_info(serial_object, b"\x01", timeout=0.02)
+        assert chip_command.get_serial_number(serial_object) == "2019A152BB40"
+        # and a late reply already received is dropped before writing
+        with pytest.raises(ReplyTimeout):
+            chip_command.get_usb_string_info(serial_object, b"\x01", timeout=0.02)
+        time.sleep(0.1)
+        assert chip_command.get_serial_number(serial_object) == "2019A152BB40"
+
+    def test_read_reply_deadline(self, mock_serial):
+        # a stale acknowledgement arrives late in the wait,
+        # reading on after it must not outlast the deadline
+        start_time = time.monotonic()
+        events = [(start_time + 0.3, b"\x57\xab\x00\x82\x01\x00\x85")]
+        stream = bytearray()
+
+        def read(size):
+            read_deadline = time.monotonic() + mock_serial.timeout
+            while len(stream) < size:
+                if events and events[0][0] <= time.monotonic():
+                    stream.extend(events.pop(0)[1])
+                    continue
+                if time.monotonic() >= read_deadline:
+                    break
+                time.sleep(0.001)
+            chunk = bytes(stream[:size])
+            del stream[:size]
+            return chunk
+
+        mock_serial.read.side_effect = read
+        mock_serial.timeout = 0.4
+        with pytest.raises(ReplyTimeout):
+            transport.read_reply(mock_serial, 0x08, 0.4)
+        assert time.monotonic() - start_time < 0.45
+        assert mock_serial.timeout == 0.4
+
+
+if __name__ == "__main__":
+    pass